@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# Benchmark of the parsers of the profiler for the five types of input: zeek (json), zeek-tabs, suricata, argus and nfdump.
+# It does not need Redis: it only parses generated lines with the parser that define_type() of the profiler would create.
+# The dns, http and ssl lines of Zeek and suricata are also parsed with most of their optional fields missing,
+# which is common in real logs. The argus and nfdump lines are also parsed line by line, without the vectorized path.
+# Usage: ./benchmarks/benchmark_parsers.py [amount of lines of each format]
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from slips.core.parsers import parsers
+from slips.core.timestamps import get_parser
+
+# Format of the times of each type of input
+time_formats = {'zeek': 'unixtimestamp', 'zeek-tabs': 'unixtimestamp', 'suricata': '%Y-%m-%dT%H:%M:%S.%f%z', 'argus': '%Y/%m/%d %H:%M:%S.%f', 'nfdump': '%Y-%m-%d %H:%M:%S'}
+separators = {'zeek': None, 'zeek-tabs': '\t', 'suricata': None, 'argus': ',', 'nfdump': ','}
+zeek_tabs_fields = {
+    'conn': (('ts', 'time'), ('uid', 'string'), ('id.orig_h', 'addr'), ('id.orig_p', 'port'), ('id.resp_h', 'addr'), ('id.resp_p', 'port'), ('proto', 'enum'), ('service', 'string'), ('duration', 'interval'), ('orig_bytes', 'count'), ('resp_bytes', 'count'), ('conn_state', 'string'), ('history', 'string'), ('orig_pkts', 'count'), ('resp_pkts', 'count')),
+    'dns': (('ts', 'time'), ('uid', 'string'), ('id.orig_h', 'addr'), ('id.orig_p', 'port'), ('id.resp_h', 'addr'), ('id.resp_p', 'port'), ('query', 'string'), ('qclass_name', 'string'), ('qtype_name', 'string'), ('rcode_name', 'string'), ('answers', 'vector[string]'), ('TTLs', 'vector[interval]')),
+}
+
+
+def random_ip() -> str:
+    return '10.0.{}.{}'.format(random.randint(0, 255), random.randint(1, 254))
+
+
+def zeek_lines(amount: int, complete: bool) -> list:
+    lines = []
+    for number in range(amount):
+        line = {'ts': 1538080852.403669 + number, 'uid': 'C{}'.format(number), 'id.orig_h': random_ip(), 'id.orig_p': 50000, 'id.resp_h': random_ip(), 'id.resp_p': 53}
+        kind = number % 4
+        if kind == 0:
+            line.update({'type': './zeek_files/conn', 'proto': 'udp', 'service': 'dns', 'duration': 0.008364, 'orig_bytes': 30, 'resp_bytes': 94, 'conn_state': 'SF', 'history': 'Dd', 'orig_pkts': 1, 'resp_pkts': 1})
+        elif kind == 1:
+            line.update({'type': './zeek_files/dns', 'query': 'example.com'})
+            if complete:
+                line.update({'qclass_name': 'C_INTERNET', 'qtype_name': 'A', 'rcode_name': 'NOERROR', 'answers': ['1.1.1.1'], 'TTLs': [300.0]})
+        elif kind == 2:
+            line.update({'type': './zeek_files/http', 'method': 'GET', 'host': 'example.com'})
+            if complete:
+                line.update({'uri': '/', 'version': '1.1', 'user_agent': 'curl', 'request_body_len': 0, 'response_body_len': 512, 'status_code': 200, 'status_msg': 'OK', 'resp_mime_types': ['text/html'], 'resp_fuids': ['F1']})
+        else:
+            line.update({'type': './zeek_files/ssl', 'server_name': 'example.com'})
+            if complete:
+                line.update({'version': 'TLSv12', 'cipher': 'TLS_AES_128_GCM_SHA256', 'resumed': False, 'established': True, 'subject': 'CN=example.com', 'issuer': 'CN=CA', 'validation_status': 'ok', 'curve': 'x25519'})
+        lines.append(line)
+    return lines
+
+
+def zeek_tabs_lines(amount: int, complete: bool) -> list:
+    lines = []
+    for path, fields in zeek_tabs_fields.items():
+        lines.extend(['#separator \\x09', '#set_separator\t,', '#empty_field\t(empty)', '#unset_field\t-', '#path\t' + path, '#fields\t' + '\t'.join(name for (name, _) in fields), '#types\t' + '\t'.join(field_type for (_, field_type) in fields)])
+    for number in range(amount):
+        common = ['{:.6f}'.format(1538080852.403669 + number), 'C{}'.format(number), random_ip(), '50000', random_ip(), '53']
+        if number % 2 == 0:
+            values = common + ['udp', 'dns', '0.008364', '30', '94', 'SF', 'Dd', '1', '1', 'conn']
+        elif complete:
+            values = common + ['example.com', 'C_INTERNET', 'A', 'NOERROR', '1.1.1.1', '300.000000', 'dns']
+        else:
+            values = common + ['example.com', '-', '-', '-', '-', '-', 'dns']
+        lines.append('\t'.join(values))
+    return lines
+
+
+def suricata_lines(amount: int, complete: bool) -> list:
+    lines = []
+    for number in range(amount):
+        common = '"timestamp":"2019-01-01T10:00:{:02d}.{:06d}+0000","flow_id":{},"src_ip":"{}","src_port":50000,"dest_ip":"{}","dest_port":80,"proto":"TCP"'.format(number % 60, number % 1000000, number, random_ip(), random_ip())
+        kind = number % 4
+        if kind == 0:
+            lines.append('{' + common + ',"event_type":"flow","app_proto":"http","flow":{"pkts_toserver":3,"pkts_toclient":2,"bytes_toserver":100,"bytes_toclient":50,"start":"2019-01-01T10:00:00.000000+0000","end":"2019-01-01T10:00:01.000000+0000","state":"established"}}')
+        elif kind == 1:
+            http = '"hostname":"example.com","url":"/","http_user_agent":"curl","http_method":"GET","protocol":"HTTP/1.1","status":200,"length":512' if complete else '"hostname":"example.com"'
+            lines.append('{' + common + ',"event_type":"http","http":{' + http + '}}')
+        elif kind == 2:
+            dns = '"type":"answer","rrname":"example.com","rrtype":"A","rdata":"1.1.1.1","ttl":300' if complete else '"type":"query","rrname":"example.com"'
+            lines.append('{' + common + ',"event_type":"dns","dns":{' + dns + '}}')
+        else:
+            # Discarded before decoding the json
+            lines.append('{' + common + ',"event_type":"stats","stats":{"uptime":10}}')
+    return lines
+
+
+def argus_lines(amount: int, complete: bool) -> list:
+    lines = ['StartTime,Dur,Proto,SrcAddr,Sport,Dir,DstAddr,Dport,State,sTos,dTos,TotPkts,TotBytes,SrcBytes,Label']
+    for number in range(amount):
+        lines.append('2011/08/10 09:{:02d}:{:02d}.{:06d},3550.182373,udp,{},39678,  <->,{},13363,CON,0,0,12,875,413,flow=Background'.format(number // 60 % 60, number % 60, number % 1000000, random_ip(), random_ip()))
+    return lines
+
+
+def nfdump_lines(amount: int, complete: bool) -> list:
+    lines = []
+    for number in range(amount):
+        start = '2019-01-01 10:{:02d}:{:02d}'.format(number // 60 % 60, number % 60)
+        lines.append(','.join([start, start, '1.000', random_ip(), random_ip(), '50000', '80', 'TCP', '.AP.SF', '0', '0', '5', '500', '3', '300'] + ['0'] * 7 + ['1'] + ['0'] * 20))
+    return lines
+
+
+generators = {'zeek': zeek_lines, 'zeek-tabs': zeek_tabs_lines, 'suricata': suricata_lines, 'argus': argus_lines, 'nfdump': nfdump_lines}
+
+
+def benchmark(input_type: str, lines: list, vectorized=True, repetitions=3) -> float:
+    """ Return the best time to parse all the lines, with a new parser each time """
+    best = None
+    for _ in range(repetitions):
+        parser = parsers[input_type](get_parser(time_formats[input_type]), separators[input_type])
+        if not vectorized:
+            parser.vectorized_min_lines = len(lines) + 1
+        start = time.perf_counter()
+        parser.parse_lines(lines)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    random.seed(1)
+    print('{:<10} {:<16} {:>10} {:>10} {:>14}'.format('Input', 'Optional fields', 'Lines', 'Seconds', 'Lines/second'))
+    for input_type, generate in generators.items():
+        for complete in (True, False):
+            if not complete and input_type in ('argus', 'nfdump'):
+                # Their lines have all the columns
+                continue
+            lines = generate(amount, complete)
+            elapsed = benchmark(input_type, lines)
+            print('{:<10} {:<16} {:>10} {:>10.3f} {:>14.0f}'.format(input_type, 'all' if complete else 'mostly missing', len(lines), elapsed, len(lines) / elapsed))
+            if input_type in ('argus', 'nfdump'):
+                elapsed = benchmark(input_type, lines, vectorized=False)
+                print('{:<10} {:<16} {:>10} {:>10.3f} {:>14.0f}'.format(input_type, 'all, by line', len(lines), elapsed, len(lines) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
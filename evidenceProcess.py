@@ -1,7 +1,7 @@
 import multiprocessing
 import time
 from slips.core.database import __database__
-import json
+from slips.core import codec
 from datetime import datetime
 from datetime import timedelta
 import configparser
@@ -110,7 +110,7 @@ class EvidenceProcess(multiprocessing.Process):
                         continue
                     evidence = __database__.getEvidenceForTW(profileid, twid)
                     if evidence:
-                        evidence = json.loads(evidence)
+                        evidence = codec.loads(evidence)
                         # The accumulated threat level is for all the types of evidence for this profile
                         accumulated_threat_level = 0.0
                         ip = profileid.split(self.separator)[1]
@@ -2,6 +2,7 @@
 # Zeek log files to read
 
 import os
+import threading
 from watchdog.events import RegexMatchingEventHandler
 import redis
 from slips.core.database import __database__
@@ -9,15 +10,122 @@ from slips.core.database import __database__
 class FileEventHandler(RegexMatchingEventHandler):
     REGEX = [r".*\.log$"]
 
-    def __init__(self, config):
+    def __init__(self, config, new_files_queue=None):
         super().__init__(self.REGEX)
         self.config = config
+        # Queue where the names of the new files are put, so the reader in this same process knows about them without asking the DB
+        self.new_files_queue = new_files_queue
+        # Files that were written, removed or moved since the reader last asked. The reader waits on data_available
+        # instead of checking the files all the time
+        self.changed_files = set()
+        self.changed_lock = threading.Lock()
+        self.data_available = threading.Event()
         # Start the DB
         __database__.start(self.config)
 
     def on_created(self, event):
         self.process(event)
+        self.mark_changed(event.src_path)
+
+    def on_modified(self, event):
+        self.mark_changed(event.src_path)
+
+    def on_deleted(self, event):
+        self.mark_changed(event.src_path)
+
+    def on_moved(self, event):
+        # Zeek rotates the logs by moving them. The reader of the old file has to notice it
+        self.mark_changed(event.src_path)
 
     def process(self, event):
         filename, ext = os.path.splitext(event.src_path)
         __database__.add_zeek_file(filename)
+        if self.new_files_queue is not None:
+            self.new_files_queue.put(filename)
+
+    def mark_changed(self, path):
+        """ Remember that this file changed and wake up the reader """
+        filename, ext = os.path.splitext(path)
+        with self.changed_lock:
+            self.changed_files.add(filename)
+            self.data_available.set()
+
+    def get_changed_files(self) -> set:
+        """ Return the names (without extension) of the files that changed since the last call """
+        with self.changed_lock:
+            changed_files = self.changed_files
+            self.changed_files = set()
+            self.data_available.clear()
+        return changed_files
+
+    def wait(self, timeout) -> bool:
+        """ Block until some file changes or the timeout in seconds passes. Returns False on timeout """
+        return self.data_available.wait(timeout)
+
+
+class TailedFile(object):
+    """
+    A Zeek log file that is read while Zeek is still writing it.
+    We keep the inode and the offset of the file, so we notice when Zeek rotates the log (a new file
+    with the same name), truncates it or removes it.
+    """
+    def __init__(self, filename):
+        # Name of the file without the .log extension. It is also the type of the lines
+        self.filename = filename
+        self.path = filename + '.log'
+        # The separator and the #path from the header of the log, if it is in TSV format
+        self.separator = '\t'
+        self.zeek_path = os.path.basename(filename)
+        self.open()
+
+    def open(self):
+        self.file_handler = open(self.path, 'rb')
+        self.inode = os.fstat(self.file_handler.fileno()).st_ino
+        self.offset = 0
+        # Start of a line that Zeek did not finish writing yet
+        self.partial = b''
+
+    def readline(self):
+        """ Return the next complete line of the file, or None if there is no complete line now """
+        line = self.file_handler.readline()
+        if not line:
+            return None
+        self.offset += len(line)
+        if line[-1:] != b'\n':
+            # Zeek is still writing this line. Keep it until the rest arrives
+            self.partial += line
+            return None
+        if self.partial:
+            line = self.partial + line
+            self.partial = b''
+        return line.decode('utf-8', 'replace')
+
+    def seek(self, offset):
+        """ Continue reading from this byte of the file. It must be the start of a line """
+        self.file_handler.seek(offset)
+        self.offset = offset
+        self.partial = b''
+
+    def check_rotation(self) -> bool:
+        """
+        Check if the file in the path is still the file we have open, and reopen it if not.
+        Call it only after reading all the lines of the open file, so no line of a rotated log is lost.
+        Returns False if the file does not exist anymore.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if stat.st_ino != self.inode:
+            # Zeek rotated the log. Read the new file from the start
+            self.file_handler.close()
+            self.open()
+        elif stat.st_size < self.offset:
+            # The file was truncated
+            self.file_handler.seek(0)
+            self.offset = 0
+            self.partial = b''
+        return True
+
+    def close(self):
+        self.file_handler.close()
@@ -0,0 +1,80 @@
+# Tests of the reading of the Zeek logs while Zeek writes them.
+# Run them with: python -m pytest filemonitor_test.py
+
+import os
+
+from filemonitor import TailedFile
+
+
+def read_lines(tailed_file) -> list:
+    lines = []
+    while True:
+        line = tailed_file.readline()
+        if line is None:
+            return lines
+        lines.append(line)
+
+
+def test_partial_lines_are_kept_until_they_are_complete(tmp_path):
+    filename = str(tmp_path / 'conn')
+    with open(filename + '.log', 'w') as log:
+        log.write('line1\nline2 start')
+    tailed_file = TailedFile(filename)
+    assert tailed_file.zeek_path == 'conn'
+    assert read_lines(tailed_file) == ['line1\n']
+    with open(filename + '.log', 'a') as log:
+        log.write(' end\nline3\n')
+    assert read_lines(tailed_file) == ['line2 start end\n', 'line3\n']
+    assert tailed_file.offset == os.path.getsize(filename + '.log')
+    # Continue from a checkpoint
+    tailed_file.seek(len('line1\n'))
+    assert read_lines(tailed_file) == ['line2 start end\n', 'line3\n']
+    tailed_file.close()
+
+
+def test_rotated_logs_are_read_from_the_start(tmp_path):
+    filename = str(tmp_path / 'dns')
+    with open(filename + '.log', 'w') as log:
+        log.write('old1\n')
+    tailed_file = TailedFile(filename)
+    old_inode = tailed_file.inode
+    with open(filename + '.log', 'a') as log:
+        log.write('old2\n')
+    # Zeek moves the log and starts a new one with the same name
+    os.rename(filename + '.log', filename + '.2019-04-04.log')
+    with open(filename + '.log', 'w') as log:
+        log.write('new1\n')
+    # The lines written to the old file before the rotation are not lost
+    assert read_lines(tailed_file) == ['old1\n', 'old2\n']
+    assert tailed_file.check_rotation()
+    assert tailed_file.inode != old_inode
+    assert read_lines(tailed_file) == ['new1\n']
+    tailed_file.close()
+
+
+def test_truncated_logs_are_read_from_the_start(tmp_path):
+    filename = str(tmp_path / 'http')
+    with open(filename + '.log', 'w') as log:
+        log.write('a long line 1\na long line 2\n')
+    tailed_file = TailedFile(filename)
+    assert len(read_lines(tailed_file)) == 2
+    with open(filename + '.log', 'w') as log:
+        log.write('short\n')
+    assert tailed_file.check_rotation()
+    assert tailed_file.offset == 0
+    assert read_lines(tailed_file) == ['short\n']
+    # Nothing changed
+    assert tailed_file.check_rotation()
+    assert read_lines(tailed_file) == []
+    tailed_file.close()
+
+
+def test_removed_logs(tmp_path):
+    filename = str(tmp_path / 'ssl')
+    with open(filename + '.log', 'w') as log:
+        log.write('line\n')
+    tailed_file = TailedFile(filename)
+    os.remove(filename + '.log')
+    assert read_lines(tailed_file) == ['line\n']
+    assert not tailed_file.check_rotation()
+    tailed_file.close()
@@ -3,29 +3,41 @@ import sys
 import os
 from datetime import datetime
 from watchdog.observers import Observer
-from filemonitor import FileEventHandler
+from filemonitor import FileEventHandler, TailedFile
 from slips.core.database import __database__
+from slips.common.sharding import FlowRouter
+from slips.common.replay import FlowTime
 import configparser
 import time
-import json
+from slips.core import codec
 import traceback
+import threading
+import mmap
+import heapq
+import queue
+import subprocess
+import concurrent.futures
+import collections
 
 # Input Process
 class InputProcess(multiprocessing.Process):
     """ A class process to run the process of the flows """
-    def __init__(self, outputqueue, profilerqueue, input_type, input_information, config, packet_filter):
+    def __init__(self, outputqueue, profilerqueues, input_type, input_information, config, packet_filter, debug, resume=False, replay=None):
         multiprocessing.Process.__init__(self)
         self.outputqueue = outputqueue
-        self.profilerqueue = profilerqueue
+        # One queue for each profiler process. Each profiler owns a part of the profiles
+        self.profilerqueues = profilerqueues
         self.config = config
         # Start the DB
         __database__.start(self.config)
         self.input_type = input_type
         self.input_information = input_information
         self.zeek_folder = './zeek_files'
-        self.nfdump_output_file = 'nfdump_output.txt'
-        self.nfdump_timeout = None
         self.name = 'input'
+        # The debug level. Used to avoid formatting text for each line that will never be printed
+        self.debug = debug
+        # Size in bytes of the blocks of lines read from the flow files
+        self.file_block_size = 1024 * 1024
         # Read the configuration
         self.read_configuration()
         # If we were given something from command line, has preference over the configuration file
@@ -33,6 +45,26 @@ class InputProcess(multiprocessing.Process):
             self.packet_filter = "'" + packet_filter + "'"
         self.event_handler = None
         self.event_observer = None
+        # Seconds to wait before trying to read again the Zeek files that had no new lines
+        self.zeek_retry_time = 0.1
+        # Continue reading the input from the checkpoints stored in the DB by a previous run
+        self.resume = resume
+        # Position of the last line sent from each file, stored in the checkpoints. Path: (inode, offset, timestamp)
+        self.file_positions = {}
+        # When resuming, the offset in each file up to which each profiler processed the lines. Path: (inode, offsets)
+        self.processed_offsets = {}
+        self.last_checkpoint_time = time.time()
+        # ReplayClock that decides when each flow is sent, to replay the input at a controlled pace. None to read as fast as possible
+        self.replay = replay
+        self.replay_flow_time = FlowTime()
+        # Seconds between the reports of the rate and the lag of the replay
+        self.replay_report_time = 5
+        self.last_replay_report = time.time()
+        # With more than one profiler, each flow is sent to the profilers that own its profiles
+        if len(self.profilerqueues) > 1:
+            self.router = FlowRouter(len(self.profilerqueues))
+        else:
+            self.router = None
 
     def read_configuration(self):
         """ Read the configuration file for what we need """
@@ -42,6 +74,37 @@ class InputProcess(multiprocessing.Process):
         except (configparser.NoOptionError, configparser.NoSectionError, NameError):
             # There is a conf, but there is no option, or no section or no configuration file specified
             self.packet_filter = 'ip or not ip'
+        # Get the maximum amount of lines sent together to the profiler in one batch
+        try:
+            self.batch_size = int(self.config.get('parameters', 'input_batch_size'))
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.batch_size = 100
+        # Limit the batch size to be >= 1. A size of 1 means no batching
+        if self.batch_size < 1:
+            self.batch_size = 1
+        # Get the maximum time in seconds that a line can wait in an incomplete batch
+        try:
+            self.batch_linger = float(self.config.get('parameters', 'input_batch_linger'))
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.batch_linger = 0.5
+        if self.batch_linger <= 0:
+            self.batch_linger = 0.5
+        # Get the amount of nfdump processes that read the files of a nfcapd folder at the same time
+        try:
+            self.nfdump_workers = int(self.config.get('parameters', 'nfdump_workers'))
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.nfdump_workers = 4
+        if self.nfdump_workers < 1:
+            self.nfdump_workers = 1
+        # Get the seconds between the checkpoints of the position in the input files
+        try:
+            self.checkpoint_interval = float(self.config.get('parameters', 'input_checkpoint_interval'))
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.checkpoint_interval = 10
 
     def print(self, text, verbose=1, debug=0):
         """ 
@@ -59,203 +122,569 @@ class InputProcess(multiprocessing.Process):
         vd_text = str(int(verbose) * 10 + int(debug))
         self.outputqueue.put(vd_text + '|' + self.name + '|[' + self.name + '] ' + str(text))
 
-    def read_nfdump_file(self) -> int:
+    def start_batching(self):
         """
-        A binary file generated by nfcapd can read by nfdump.
-        The task for this function is watch the nfdump file and if any new line is there, read it.
+        Prepare the batching of lines sent to the profilers.
+        The lines are not sent one by one, but in lists of up to self.batch_size lines. A batch that is
+        not complete is sent anyway after self.batch_linger seconds, so slow inputs (like an interface) are not delayed.
+        There is one batch for each profiler.
         """
-        file_handler = None
-        next_line = None
-        last_updated_file_time = datetime.now()
-        lines = 0
-        while True:
-            if not file_handler:
-                # We will open here because we do not know when nfdump will open the file.
-                try:
-                    file_handler = open(self.nfdump_output_file, 'r')
-                except FileNotFoundError:
-                    # Tryto wait for nfdump to generate output file.
-                    time.sleep(1)
-                    self.print('The output file for nfdump is still not created.', 0, 1)
+        self.batches = [[] for profilerqueue in self.profilerqueues]
+        self.batch_start_times = [0] * len(self.profilerqueues)
+        self.sent_batches = 0
+        self.sent_batch_lines = 0
+        # The batches are shared with the thread that sends the incomplete batches
+        self.batch_lock = threading.Lock()
+        self.batch_flusher_stop = threading.Event()
+        self.batch_flusher = threading.Thread(target=self.flush_stale_batches, daemon=True)
+        self.batch_flusher.start()
+
+    def flush_stale_batches(self):
+        """ Thread function. Send the batches that have been waiting for more than the linger time """
+        while not self.batch_flusher_stop.wait(self.batch_linger):
+            with self.batch_lock:
+                now = time.time()
+                for shard, batch in enumerate(self.batches):
+                    if batch and now - self.batch_start_times[shard] >= self.batch_linger:
+                        self.flush_batch(shard)
+
+    def stop_batching(self):
+        """ Send what is left in the batches and stop the thread that sends the incomplete batches """
+        self.batch_flusher_stop.set()
+        with self.batch_lock:
+            for shard in range(len(self.batches)):
+                self.flush_batch(shard)
+        if self.sent_batches:
+            self.print('Sent {} lines in {} batches. Average batch size: {:.1f} lines.'.format(self.sent_batch_lines, self.sent_batches, self.sent_batch_lines / self.sent_batches), 0, 2)
+
+    def send_line(self, line, processed_shards=()):
+        """
+        Add a line to the batch of each profiler that should receive it. Send the batches that are full.
+        processed_shards are the profilers that already processed this line before resuming
+        """
+        if self.debug >= 3:
+            self.print('	> Sent Line: {}'.format(line), 0, 3)
+        if self.router:
+            shards = self.router.route(line)
+        else:
+            shards = (0,)
+        if processed_shards:
+            shards = [shard for shard in shards if shard not in processed_shards]
+        with self.batch_lock:
+            for shard in shards:
+                batch = self.batches[shard]
+                if not batch:
+                    self.batch_start_times[shard] = time.time()
+                batch.append(line)
+                if len(batch) >= self.batch_size:
+                    self.flush_batch(shard)
+
+    def flush_batch(self, shard=0):
+        """ Send the current batch of one profiler. The caller must hold the batch lock """
+        batch = self.batches[shard]
+        if not batch:
+            return
+        self.profilerqueues[shard].put(batch)
+        self.print('Sent a batch of {} lines to the profiler {}.'.format(len(batch), shard), 0, 4)
+        self.sent_batches += 1
+        self.sent_batch_lines += len(batch)
+        self.batches[shard] = []
+
+    def send_block(self, block: bytes):
+        """ Send a block of complete lines as bytes to the profiler. The profiler splits it in lines """
+        if self.router:
+            # The lines of the block belong to different profilers, so send them one by one
+            for line in block.decode('utf-8', 'replace').splitlines():
+                if line:
+                    self.send_line(line)
+            return
+        if self.debug >= 3:
+            for line in block.decode('utf-8', 'replace').splitlines():
+                self.print('	> Sent Line: {}'.format(line), 0, 3)
+        with self.batch_lock:
+            # Keep the order with the lines that are still in the batch
+            self.flush_batch()
+            self.profilerqueues[0].put(block)
+
+    def send_to_profilers(self, message: str):
+        """ Send a message, like 'stop', to all the profilers """
+        for profilerqueue in self.profilerqueues:
+            profilerqueue.put(message)
+
+    def send_checkpoint(self):
+        """
+        Send to the profilers the position of the last line sent from each file.
+        Each profiler stores it in the DB when it has processed all the lines before it, so a run with --resume
+        can continue from there without losing flows.
+        """
+        files = {}
+        for path, (inode, offset, timestamp) in self.file_positions.items():
+            files[path] = {'inode': inode, 'offset': offset, 'ts': timestamp}
+        with self.batch_lock:
+            # The checkpoint goes after all the lines sent before it
+            for shard in range(len(self.batches)):
+                self.flush_batch(shard)
+            for shard, profilerqueue in enumerate(self.profilerqueues):
+                shard_files = files
+                if self.processed_offsets:
+                    # A profiler that is still ahead of us since resuming keeps its own position
+                    shard_files = dict(files)
+                    for path, (inode, processed_offsets) in self.processed_offsets.items():
+                        if path in files and files[path]['inode'] == inode and processed_offsets[shard] > files[path]['offset']:
+                            shard_files[path] = dict(files[path], offset=processed_offsets[shard])
+                profilerqueue.put(('checkpoint', {'input': self.input_information, 'files': shard_files}))
+        self.last_checkpoint_time = time.time()
+        self.print('Sent a checkpoint of {} files.'.format(len(files)), 0, 4)
+
+    def load_checkpoint(self) -> dict:
+        """
+        Read the checkpoints stored by the profilers in a previous run and return where to continue each file.
+        Each profiler may have processed a different amount of lines, so we continue from the smallest position of each file.
+        Returns a dict {path: (inode, offset, timestamp, offsets processed by each profiler or None)}
+        """
+        checkpoints = {worker: checkpoint for (worker, checkpoint) in __database__.get_input_checkpoints().items() if checkpoint['input'] == self.input_information}
+        # If the previous run had the same profilers, each profiler owns the same IPs now. Then the lines between the
+        # smallest and the largest position are only sent to the profilers that did not process them yet
+        same_profilers = len(self.profilerqueues) > 1 and sorted(checkpoints) == list(range(len(self.profilerqueues)))
+        positions = {}
+        if checkpoints:
+            for path in next(iter(checkpoints.values()))['files']:
+                # The position of the file in each checkpoint. If some profiler does not know the file, we start it again
+                file_positions = [checkpoints[worker]['files'].get(path) for worker in sorted(checkpoints)]
+                if None in file_positions or len(set(position['inode'] for position in file_positions)) > 1:
                     continue
+                position = min(file_positions, key=lambda position: position['offset'])
+                processed_offsets = [position['offset'] for position in file_positions] if same_profilers else None
+                positions[path] = (position['inode'], position['offset'], position['ts'], processed_offsets)
+        # The checkpoints from now on are from this run, that may have a different amount of profilers
+        __database__.del_input_checkpoints()
+        files = {path: {'inode': inode, 'offset': offset, 'ts': timestamp} for (path, (inode, offset, timestamp, processed_offsets)) in positions.items()}
+        for worker in range(len(self.profilerqueues)):
+            __database__.set_input_checkpoint(worker, {'input': self.input_information, 'files': files})
+        if positions:
+            self.print('Resuming the input from the checkpoints of {} files.'.format(len(positions)), 1, 0)
+        else:
+            self.print('There is no checkpoint of the input {}. Reading it from the start.'.format(self.input_information), 1, 0)
+        return positions
+
+    def get_resume_offset(self, path, inode, size) -> int:
+        """ Return the byte of the file where we should continue reading it. 0 if the file changed since the checkpoint """
+        try:
+            (checkpoint_inode, offset, timestamp, processed_offsets) = self.resume_positions[path]
+        except KeyError:
+            return 0
+        if checkpoint_inode != inode or offset > size:
+            # It is a different file, or it was truncated
+            self.print('The file {} changed since the checkpoint. Reading it from the start.'.format(path), 1, 0)
+            return 0
+        self.file_positions[path] = (inode, offset, timestamp)
+        if processed_offsets and max(processed_offsets) > offset:
+            self.processed_offsets[path] = (inode, processed_offsets)
+        return offset
+
+    def get_processed_shards(self, path, inode, offset) -> list:
+        """
+        Return the profilers that already processed the line of a file that ends in this byte, in the run that we resume.
+        The line should not be sent to them again
+        """
+        (processed_inode, processed_offsets) = self.processed_offsets[path]
+        if inode != processed_inode:
+            # Zeek rotated the file
+            del self.processed_offsets[path]
+            return []
+        processed_shards = [shard for (shard, processed_offset) in enumerate(processed_offsets) if offset <= processed_offset]
+        if not processed_shards:
+            # We passed the position of all the profilers
+            del self.processed_offsets[path]
+        return processed_shards
+
+    def replay_line(self, line, flow_time=None):
+        """
+        Send a line when the replay clock says, with the time of the flow shifted to now if we were asked.
+        flow_time is the time of the flow in seconds, if we already know it.
+        """
+        if flow_time is None:
+            flow_time = self.replay_flow_time.get_time(line)
+        if flow_time is None:
+            # Headers and lines without time are sent as soon as they come
+            self.send_line(line)
+            return
+        due_time = self.replay.wait(flow_time)
+        if self.replay.shift_time:
+            line = self.replay_flow_time.set_time(line, due_time)
+        self.send_line(line)
+        now = time.time()
+        if now - self.last_replay_report >= self.replay_report_time:
+            self.last_replay_report = now
+            self.print('Replay: {}. Batches waiting for the profilers: {}'.format(self.replay.report(), self.get_queued_batches()), 1, 0)
+
+    def get_queued_batches(self):
+        """ Amount of batches in the queues of the profilers that they did not read yet. It shows if the profilers fall behind """
+        try:
+            return sum(profilerqueue.qsize() for profilerqueue in self.profilerqueues)
+        except NotImplementedError:
+            # qsize() does not work in macos
+            return 'unknown'
 
-            if next_line is None:
-                # Try to read next line from input file.
-                nfdump_line = file_handler.readline()
-                if nfdump_line:
-                    # We have something to read.
-                    # Is this line a valid line?
-                    try:
-                        # The first item of nfdump output is timestamp.
-                        # So the first letter of timestamp should be digit.
-                        ts = nfdump_line.split(',')[0]
-                        if not ts[0].isdigit():
-                            # The first letter is not digit -> not valid line.
-                            # TODO: What is this valid line check?? explain
-                            continue
-                    except IndexError:
-                        # There is no first item in  the line.
-                        continue
-
-                    # We have a new line.
-                    last_updated_file_time = datetime.now()
-                    next_line = nfdump_line
-                else:
-                    # There is no new line.
-                    if nfdump_line is None:
-                        # Verify that we didn't have any new lines in the last TIMEOUT seconds.
-                        now = datetime.now()
-                        diff = now - last_updated_file_time
-                        diff = diff.seconds
-                        if diff >= self.nfdump_timeout:
-                            # Stop the reading of the file.
-                            break
-
-                    # No new line. Continue.
-                    continue
+    def replay_file(self, filename) -> int:
+        """ Send the lines of a flow file at the pace of the replay clock """
+        lines = 0
+        with open(filename, 'r', errors='replace') as file_stream:
+            for line in file_stream:
+                line = line.rstrip('\r\n')
+                if line:
+                    self.replay_line(line)
+                    lines += 1
+        return lines
+
+    def read_file_blocks(self, filename) -> int:
+        """
+        Read a flow file and send it to the profiler in blocks of complete lines.
+        The file is mapped in memory and cut in ranges of about self.file_block_size bytes that end in a new line.
+        Each range is sent as bytes, so we do not create a python string for each line here.
+        """
+        lines = 0
+        with open(filename, 'rb') as file_stream:
+            try:
+                file_map = mmap.mmap(file_stream.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # An empty file can not be mapped
+                return lines
+            with file_map:
+                if hasattr(file_map, 'madvise'):
+                    # We only read the file forward
+                    file_map.madvise(mmap.MADV_SEQUENTIAL)
+                size = len(file_map)
+                inode = os.fstat(file_stream.fileno()).st_ino
+                start = 0
+                if self.resume:
+                    start = self.get_resume_offset(filename, inode, size)
+                    if start:
+                        # The profiler needs the header of the file (the columns of argus or the #fields of Zeek) to parse the lines
+                        # The header lines are the first lines that do not start like a flow (a digit of the time, or json)
+                        header_end = 0
+                        while header_end < start and file_map[header_end:header_end + 1] not in b'0123456789{':
+                            header_end = file_map.find(b'\n', header_end, start) + 1
+                            if not header_end:
+                                break
+                        if header_end:
+                            self.send_block(file_map[:header_end])
+                while start < size:
+                    end = start + self.file_block_size
+                    if end >= size:
+                        end = size
+                    else:
+                        # Finish the block in the end of the line
+                        end = file_map.find(b'\n', end) + 1
+                        if end == 0:
+                            end = size
+                    block = file_map[start:end]
+                    lines += block.count(b'\n')
+                    if block[-1:] != b'\n':
+                        # The last line of the file has no new line
+                        lines += 1
+                    if filename in self.processed_offsets:
+                        # Some profilers already processed some of these lines before resuming. Send them one by one
+                        line_end = start
+                        for line in block.splitlines(keepends=True):
+                            line_end += len(line)
+                            line = line.decode('utf-8', 'replace').rstrip('\r\n')
+                            if line and filename in self.processed_offsets:
+                                self.send_line(line, self.get_processed_shards(filename, inode, line_end))
+                            elif line:
+                                self.send_line(line)
+                    else:
+                        self.send_block(block)
+                    start = end
+                    self.file_positions[filename] = (inode, end, None)
+                    if self.checkpoint_interval and time.time() - self.last_checkpoint_time >= self.checkpoint_interval:
+                        self.send_checkpoint()
+        return lines
+
+    def run_nfdump(self, filename):
+        """ Start nfdump reading a binary nfcapd file and writing the flows as csv to its stdout """
+        # -q removes the header and the summary at the end, so every line is a flow
+        command = ['nfdump', '-b', '-N', '-q', '-o', 'csv', '-r', filename]
+        return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
-            self.print("	> Sent Line: {}".format(next_line), 0, 3)
-            self.profilerqueue.put(next_line)
-            # print('sending new line: {}'.format(next_line))
-            next_line = None
+    def read_nfdump_output(self, filename):
+        """
+        Generator of the flows of a binary nfcapd file.
+        The flows are read from the stdout of nfdump as they are produced. The end of the stream is the end of nfdump.
+        """
+        nfdump_process = self.run_nfdump(filename)
+        for nfdump_line in nfdump_process.stdout:
+            # The first item of nfdump output is the timestamp, so the first letter should be a digit.
+            # Other lines, like the summary of older nfdump versions, are ignored
+            if not nfdump_line[:1].isdigit():
+                continue
+            yield nfdump_line.decode('utf-8', 'replace').rstrip('\r\n')
+        nfdump_process.stdout.close()
+        error = nfdump_process.stderr.read().decode('utf-8', 'replace').strip()
+        nfdump_process.stderr.close()
+        if nfdump_process.wait() != 0:
+            self.print('Error running nfdump on {}. Return code: {}. {}'.format(filename, nfdump_process.returncode, error), 0, 1)
+
+    def decode_nfdump_file(self, filename) -> list:
+        """ Thread function. Read all the flows of a binary nfcapd file """
+        return list(self.read_nfdump_output(filename))
+
+    def read_nfdump_file(self, filename) -> int:
+        """ Send the flows of a binary nfcapd file to the profiler while nfdump reads it """
+        lines = 0
+        for nfdump_line in self.read_nfdump_output(filename):
+            self.send_line(nfdump_line)
             lines += 1
+        return lines
 
-        file_handler.close()
+    def read_nfdump_folder(self, folder) -> int:
+        """
+        Send the flows of all the nfcapd files of a folder to the profiler.
+        Several nfdump processes decode the files at the same time, but the flows are sent in the order of the files.
+        The names of the nfcapd files have the date, so this is also the order of time.
+        """
+        filenames = []
+        for file in sorted(os.listdir(folder)):
+            filename = os.path.join(folder, file)
+            # nfcapd.current is the file that nfcapd is still writing
+            if file.startswith('.') or 'current' in file or not os.path.isfile(filename):
+                continue
+            filenames.append(filename)
+        lines = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.nfdump_workers) as executor:
+            # Only decode a few files ahead of the one we are sending, so we don't keep all of them in memory
+            pending = collections.deque()
+            for filename in filenames:
+                pending.append(executor.submit(self.decode_nfdump_file, filename))
+                if len(pending) > self.nfdump_workers:
+                    lines += self.send_lines(pending.popleft().result())
+            while pending:
+                lines += self.send_lines(pending.popleft().result())
         return lines
 
+    def send_lines(self, lines) -> int:
+        """ Send a list of lines to the profiler. Returns the amount of lines sent """
+        for line in lines:
+            self.send_line(line)
+        return len(lines)
+
+    def is_ignored_zeek_file(self, filename) -> bool:
+        """ Ignore the Zeek files that do not contain data. """
+        return 'capture_loss' in filename or 'loaded_scripts' in filename or 'packet_filter' in filename or 'stats' in filename or 'weird' in filename or 'reporter' in filename
+
+    def read_zeek_line(self, tailed_file):
+        """
+        Read the next line with data from one Zeek file.
+        Returns a tuple (timestamp, line) or None if there are no new lines in the file now.
+        """
+        while True:
+            zeek_line = tailed_file.readline()
+            # Did the file ended?
+            if not zeek_line:
+                # We reached the end of the file. Wait for more data to come
+                return None
+            try:
+                # Convert from json to dict
+                line = codec.loads(zeek_line)
+                # All bro files have a field 'ts' with the timestamp.
+                # So we are safe here not checking the type of line
+                timestamp = line['ts']
+                # Add the type of file to the dict so later we know how to parse it
+                line['type'] = tailed_file.filename
+            except codec.JSONDecodeError:
+                # It is not JSON format. It is tab format line.
+                line = zeek_line
+                if not line:
+                    continue
+                if line[0] == '#':
+                    self.send_zeek_header(tailed_file, line)
+                    continue
+                # Add the #path of the log as the last column, so the profiler knows which log the line is from
+                line = line.rstrip('\r\n') + tailed_file.separator + tailed_file.zeek_path
+                timestamp = line.split(tailed_file.separator, 1)[0]
+            try:
+                timestamp = float(timestamp)
+            except (TypeError, ValueError):
+                # We can not order a line without a time. Send it as soon as possible
+                timestamp = 0.0
+            return timestamp, line
+
+    def send_zeek_header(self, tailed_file, line):
+        """
+        Send a header line of a Zeek log in TSV format. The profiler needs the header to parse the lines of
+        this log, so it is sent before the lines of the log. Remember the #path to add it to each line
+        """
+        if line.startswith('#separator'):
+            tailed_file.separator = line.rstrip('\r\n').split(' ', 1)[1].encode('utf-8').decode('unicode_escape')
+        elif line.startswith('#path'):
+            tailed_file.zeek_path = line.rstrip('\r\n').split(tailed_file.separator, 1)[1]
+        if not line.startswith('#close'):
+            self.send_line(line)
+
+    def resume_zeek_file(self, tailed_file):
+        """ Continue reading a Zeek log from its checkpoint. The header of the log is sent again """
+        offset = self.get_resume_offset(tailed_file.path, tailed_file.inode, os.fstat(tailed_file.file_handler.fileno()).st_size)
+        if not offset:
+            return
+        while tailed_file.offset < offset:
+            line = tailed_file.readline()
+            if not line or line[0] != '#':
+                break
+            self.send_zeek_header(tailed_file, line)
+        tailed_file.seek(offset)
+
+    def read_next_zeek_line(self, tailed_file):
+        """
+        Read the next line with data from one Zeek file.
+        If there are no more lines, check if the file was rotated, truncated or removed.
+        Returns the same as read_zeek_line(), or False if the file does not exist anymore.
+        """
+        head = self.read_zeek_line(tailed_file)
+        if head:
+            return head
+        if not tailed_file.check_rotation():
+            return False
+        # The file may have been reopened
+        return self.read_zeek_line(tailed_file)
+
+    def get_new_zeek_files(self, open_files: dict, waiting_files: set):
+        """
+        Open the Zeek files that we were notified about since the last call.
+        New files are put in self.new_zeek_files by the FileEventHandler (or by us when reading a folder).
+        """
+        while True:
+            try:
+                filename = self.new_zeek_files.get_nowait()
+            except queue.Empty:
+                return
+            if filename in open_files or self.is_ignored_zeek_file(filename):
+                continue
+            try:
+                open_files[filename] = TailedFile(filename)
+            except FileNotFoundError:
+                # The file was removed before we could read it
+                continue
+            if self.resume:
+                self.resume_zeek_file(open_files[filename])
+            waiting_files.add(filename)
+
     def read_zeek_files(self) -> int:
-        # Get the zeek files in the folder now
-        zeek_files = __database__.get_all_zeek_file()
-        open_file_handlers = {}
-        time_last_lines = {}
+        """
+        Read all the Zeek log files and send their lines to the profiler, ordered by timestamp.
+
+        This is a k-way merge of the files. A min-heap holds the timestamp of the next line (the head) of
+        each file. The oldest head is sent and replaced by the next line of the same file, so each line
+        costs O(log k) for k files.
+        Files without new lines wait in waiting_files. When Zeek is running, the FileEventHandler tells us
+        which files changed and we wait on it when there is nothing to send. When reading a folder there are
+        no events, so the waiting files are read again when the heap is empty or after self.zeek_retry_time seconds.
+        """
+        open_files = {}
+        # Heap of (timestamp, filename) for the head of each file. The head itself is in cache_lines
+        heads = []
         cache_lines = {}
+        # (inode, offset, timestamp) of the end of the head of each file, for the checkpoints
+        head_positions = {}
+        # Files that have no line in the heap because we reached their end
+        waiting_files = set()
         # Try to keep track of when was the last update so we stop this reading
-        last_updated_file_time = datetime.now()
+        last_updated_file_time = time.time()
+        last_retry_time = 0
+        # If no event arrives in this time, read all the waiting files anyway, in case we missed some event
+        zeek_poll_time = 5
         lines = 0
 
         while True:
-            # Do...
-             
-            # Go to all the files generated by Zeek and read them
-            # print('zeek files: {}'.format(zeek_files))
-            for filename in zeek_files:
-                # Update which files we know about
-                try:
-                    file_handler = open_file_handlers[filename]
-                    # We already opened this file
-                    # self.print('Old File {}'.format(filename))
-                except KeyError:
-                    # First time we opened this file.
-                    # Ignore the files that do not contain data.
-                    if 'capture_loss' in filename or 'loaded_scripts' in filename or 'packet_filter' in filename or 'stats' in filename or 'weird' in filename or 'reporter' in filename:
-                        continue
-                    file_handler = open(filename + '.log', 'r')
-                    open_file_handlers[filename] = file_handler
-                    # self.print('New File {}'.format(filename))
-
-                # Only read the next line if the previous line was sent
-                try:
-                    temp = cache_lines[filename]
-                    # We have still something to send, do not read the next line from this file
-                except KeyError:
-                    # We don't have any waiting line for this file, so proceed
-                    zeek_line = file_handler.readline()
-                    # self.print('Reading from file {}, the line {}'.format(filename, zeek_line))
-                    # self.print('File {}, read line: {}'.format(filename, zeek_line))
-                    # Did the file ended?
-                    if not zeek_line:
-                        # We reached the end of one of the files that we were reading. Wait for more data to come
-                        continue
-
+            # Open the new files created since the last time
+            self.get_new_zeek_files(open_files, waiting_files)
+
+            # Try again to read the files that had no new lines
+            now = time.time()
+            retry_files = ()
+            if waiting_files and self.event_handler:
+                if self.event_handler.data_available.is_set():
+                    # Only the files that changed
+                    retry_files = waiting_files & self.event_handler.get_changed_files()
+                    last_retry_time = now
+                elif now - last_retry_time >= zeek_poll_time:
+                    retry_files = list(waiting_files)
+                    last_retry_time = now
+            elif waiting_files and (not heads or now - last_retry_time >= self.zeek_retry_time):
+                retry_files = list(waiting_files)
+                last_retry_time = now
+            for filename in retry_files:
+                head = self.read_next_zeek_line(open_files[filename])
+                if head:
+                    (timestamp, cache_lines[filename]) = head
+                    head_positions[filename] = (open_files[filename].inode, open_files[filename].offset, timestamp)
+                    heapq.heappush(heads, (timestamp, filename))
+                    waiting_files.discard(filename)
                     # Since we actually read something form any file, update the last time of read
-                    last_updated_file_time = datetime.now()
-                    try:
-                        # Convert from json to dict
-                        line = json.loads(zeek_line)
-                        # All bro files have a field 'ts' with the timestamp.
-                        # So we are safe here not checking the type of line
-                        timestamp = line['ts']
-                        # Add the type of file to the dict so later we know how to parse it
-                        line['type'] = filename
-                    except json.decoder.JSONDecodeError:
-                        # It is not JSON format. It is tab format line.
-                        line = zeek_line
-                        # Ignore comments at the beginning of the file.
-                        try:
-                            if line[0] == '#':
-                                continue
-                        except IndexError:
-                            continue
-                        # Slow approach.
-                        timestamp = line.split('\t')[0]
-                        # Faster approach, but we do not know if
-                        # line = line.rstrip()
-                        # line = line + '\t' + str(filename)
-
-                    time_last_lines[filename] = timestamp
-
-                    # self.print('File {}. TS: {}'.format(filename, timestamp))
-                    # Store the line in the cache
-                    # self.print('Adding cache and time of {}'.format(filename))
-                    cache_lines[filename] = line
-
-            # Out of the for that check each Zeek file one by one
-            # self.print('Out of the for.')
-            # self.print('Cached lines: {}'.format(str(cache_lines)))
-
-            # If we don't have any cached lines to send, it may mean that new lines are not arriving. Check
-            if not cache_lines:
-                # Verify that we didn't have any new lines in the last 10 seconds. Seems enough for any network to have ANY traffic
-                now = datetime.now()
-                diff = now - last_updated_file_time
-                diff = diff.seconds
-                if diff >= self.bro_timeout:
-                    # It has been 10 seconds without any file being updated. So stop the while
-                    # Get out and sto Zeek
+                    last_updated_file_time = now
+                elif head is False:
+                    # The log went away. Close it. If Zeek creates it again, it is a new file
+                    self.print('Closing file {}'.format(filename), 3, 0)
+                    open_files.pop(filename).close()
+                    waiting_files.discard(filename)
+
+            if not heads:
+                # We don't have any lines to send, it may mean that new lines are not arriving. Check
+                # Verify that we didn't have any new lines in the last seconds. Seems enough for any network to have ANY traffic
+                remaining_time = self.bro_timeout - (now - last_updated_file_time)
+                if remaining_time <= 0:
+                    # It has been too long without any file being updated. So stop the while
                     break
-
-            # Now read lines in order. The line with the smallest timestamp first
-            file_sorted_time_last_lines = sorted(time_last_lines, key=time_last_lines.get)
-            # self.print('Sorted times: {}'.format(str(file_sorted_time_last_lines)))
-            try:
-                key = file_sorted_time_last_lines[0]
-            except IndexError:
-                # No more sorted keys. Just loop waiting for more lines
-                # It may happened that we check all the files in the folder, and there is still no file for us.
-                # To cover this case, just refresh the list of files
-                # self.print('Getting new files...')
-                # print(cache_lines)
-                zeek_files = __database__.get_all_zeek_file()
-                time.sleep(1)
+                # Wait for more lines or more files
+                if self.event_handler:
+                    self.event_handler.wait(min(remaining_time, zeek_poll_time))
+                else:
+                    time.sleep(self.zeek_retry_time)
                 continue
 
-            # Description??
-            line_to_send = cache_lines[key]
-            # self.print('Line to send from file {}. {}'.format(key, line_to_send))
-            # SENT
-            self.print("	> Sent Line: {}".format(line_to_send), 0, 3)
-            self.profilerqueue.put(line_to_send)
+            # Send the line with the smallest timestamp first
+            (timestamp, filename) = heapq.heappop(heads)
+            path = open_files[filename].path
+            position = head_positions.pop(filename)
+            if self.replay:
+                self.replay_line(cache_lines.pop(filename), timestamp or None)
+            elif path in self.processed_offsets:
+                self.send_line(cache_lines.pop(filename), self.get_processed_shards(path, position[0], position[1]))
+            else:
+                self.send_line(cache_lines.pop(filename))
+            self.file_positions[path] = position
             # Count the read lines
             lines += 1
-            # Delete this line from the cache and the time list
-            # self.print('Deleting cache and time of {}'.format(key))
-            del cache_lines[key]
-            del time_last_lines[key]
-
-            # Get the new list of files. Since new files may have been created by Zeek while we were processing them.
-            zeek_files = __database__.get_all_zeek_file()
+            if self.checkpoint_interval and now - self.last_checkpoint_time >= self.checkpoint_interval:
+                self.send_checkpoint()
+
+            # Replace the head of this file with its next line
+            head = self.read_next_zeek_line(open_files[filename])
+            if head:
+                (timestamp, cache_lines[filename]) = head
+                head_positions[filename] = (open_files[filename].inode, open_files[filename].offset, timestamp)
+                heapq.heappush(heads, (timestamp, filename))
+                last_updated_file_time = time.time()
+            elif head is False:
+                self.print('Closing file {}'.format(filename), 3, 0)
+                open_files.pop(filename).close()
+            else:
+                waiting_files.add(filename)
 
         # We reach here after the break produced if no zeek files are being updated.
         # No more files to read. Close the files
-        for file in open_file_handlers:
+        for file in open_files:
             self.print('Closing file {}'.format(file), 3, 0)
-            open_file_handlers[file].close()
+            open_files[file].close()
         return lines
 
     def run(self):
         try:
             # Process the file that was given
             lines = 0
+            # The lines are sent to the profiler in batches
+            self.start_batching()
+            # Zeek files that we were told about and still did not open. Filled by the FileEventHandler
+            self.new_zeek_files = queue.Queue()
             if self.input_type == 'file':
                 """ 
                 Path to the flow input file to read. It can be a Argus binetflow flow,
@@ -269,27 +698,33 @@ class InputProcess(multiprocessing.Process):
                     sys.stdin = os.fdopen(0, 'r')
                     file_stream = sys.stdin
                     for line in file_stream:
-                        self.print('	> Sent Line: {}'.format(line.replace('\n', '')), 0, 3)
-                        self.profilerqueue.put(line)
+                        if self.replay:
+                            self.replay_line(line.rstrip('\r\n'))
+                        else:
+                            self.send_line(line)
                         lines += 1
 
                 # If we were given a filename, manage the input from a file instead
                 elif self.input_information:
+                    if self.resume:
+                        self.resume_positions = self.load_checkpoint()
+                    else:
+                        __database__.del_input_checkpoints()
                     try:
                         # Try read a file.
-                        file_stream = open(self.input_information)
-                        for line in file_stream:
-                            self.print('	> Sent Line: {}'.format(line.replace('\n', '')), 0, 3)
-                            self.profilerqueue.put(line)
-                            lines += 1
+                        if self.replay:
+                            lines = self.replay_file(self.input_information)
+                        else:
+                            lines = self.read_file_blocks(self.input_information)
                     except IsADirectoryError:
-                        # Add all log files to database.
+                        # Add all log files to database and to the files to read.
                         for file in os.listdir(self.input_information):
                             # Remove .log extension and add file name to database.
                             extension = file[-4:]
                             if extension == '.log':
                                 file_name_without_extension = file[:-4]
                                 __database__.add_zeek_file(self.input_information + '/' + file_name_without_extension)
+                                self.new_zeek_files.put(self.input_information + '/' + file_name_without_extension)
 
                         # We want to stop bro if no new line is coming.
                         self.bro_timeout = 1
@@ -297,24 +732,31 @@ class InputProcess(multiprocessing.Process):
                         lines = self.read_zeek_files()
 
 
-                self.profilerqueue.put("stop")
+                if self.replay:
+                    self.print('Replay finished. {}'.format(self.replay.summary()), 1, 0)
+                # Store where we finished, so a run with --resume does not read the input again
+                if self.file_positions:
+                    self.send_checkpoint()
+                # Send the last incomplete batch before the stop, so the profiler receives all the lines
+                self.stop_batching()
+                self.send_to_profilers("stop")
                 self.outputqueue.put("01|input|[In] No more input. Stopping input process. Sent {} lines ({}).".format(lines, datetime.now().strftime('%Y-%m-%d--%H:%M:%S')))
 
                 self.outputqueue.close()
-                self.profilerqueue.close()
+                for profilerqueue in self.profilerqueues:
+                    profilerqueue.close()
 
                 return True
             # Process the binary nfdump file.
             elif self.input_type == 'nfdump':
-                # Its not good to read the nfdump file to disk.
-                command = 'nfdump -b -N -o csv -r ' + self.input_information + ' >  ' + self.nfdump_output_file
-                os.system(command)
-                self.nfdump_timeout = 10
-                lines = self.read_nfdump_file()
+                # The output of nfdump is read directly from its stdout, without writing it to disk
+                if os.path.isdir(self.input_information):
+                    lines = self.read_nfdump_folder(self.input_information)
+                else:
+                    lines = self.read_nfdump_file(self.input_information)
+                self.stop_batching()
+                self.send_to_profilers("stop")
                 self.print("We read everything. No more input. Stopping input process. Sent {} lines".format(lines))
-                # Delete the nfdump file
-                command = "rm " + self.nfdump_output_file + "2>&1 > /dev/null &"
-                os.system(command)
 
             # Process the pcap files
             elif self.input_type == 'pcap' or self.input_type == 'interface':
@@ -326,7 +768,8 @@ class InputProcess(multiprocessing.Process):
                 # some process to tell us which files to read in real time when they appear
                 # Get the file eventhandler
                 # We have to set event_handler and event_observer before running zeek.
-                self.event_handler = FileEventHandler(self.config)
+                # The handler tells us directly about the new files, so we don't need to ask the DB
+                self.event_handler = FileEventHandler(self.config, self.new_zeek_files)
                 # Create an observer
                 self.event_observer = Observer()
                 # Schedule the observer with the callback on the file handler
@@ -370,6 +813,8 @@ class InputProcess(multiprocessing.Process):
                 time.sleep(3)
 
                 lines = self.read_zeek_files()
+                self.stop_batching()
+                self.send_to_profilers("stop")
                 self.print("We read everything. No more input. Stopping input process. Sent {} lines".format(lines))
 
                 # Stop the observer
@@ -0,0 +1,218 @@
+# Tests of the input process: the batches sent to the profilers, the merge of the Zeek logs and the checkpoints.
+# They do not need a redis server, the few calls to the DB are replaced.
+# Run them with: python -m pytest inputProcess_test.py
+
+import configparser
+import json
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+from inputProcess import InputProcess
+from slips.common.sharding import get_shard
+from slips.core.database import __database__
+
+
+@pytest.fixture
+def make_input(monkeypatch):
+    """ Return a function that creates an InputProcess with these profilers and options of the conf """
+    monkeypatch.setattr(__database__, 'start', lambda config: None)
+    # The checkpoints stored by the profilers
+    checkpoints = {}
+    monkeypatch.setattr(__database__, 'get_input_checkpoints', lambda: dict(checkpoints))
+    monkeypatch.setattr(__database__, 'set_input_checkpoint', checkpoints.__setitem__)
+    monkeypatch.setattr(__database__, 'del_input_checkpoints', checkpoints.clear)
+
+    def make_input(profilers=1, input_information='', **options):
+        config = configparser.ConfigParser()
+        config.read_dict({'parameters': options})
+        input_process = InputProcess(queue.Queue(), [queue.Queue() for _ in range(profilers)], 'file', input_information, config, None, 0)
+        input_process.start_batching()
+        input_process.stored_checkpoints = checkpoints
+        return input_process
+    return make_input
+
+
+def received(profilerqueue) -> list:
+    """ The batches in the queue of a profiler """
+    batches = []
+    while not profilerqueue.empty():
+        batches.append(profilerqueue.get())
+    return batches
+
+
+def test_lines_are_sent_in_batches(make_input):
+    input_process = make_input(input_batch_size=3)
+    for number in range(7):
+        input_process.send_line('line{}'.format(number))
+    assert received(input_process.profilerqueues[0]) == [['line0', 'line1', 'line2'], ['line3', 'line4', 'line5']]
+    input_process.stop_batching()
+    assert received(input_process.profilerqueues[0]) == [['line6']]
+    assert (input_process.sent_batches, input_process.sent_batch_lines) == (3, 7)
+
+
+def test_incomplete_batches_are_sent_after_the_linger_time(make_input):
+    input_process = make_input(input_batch_size=100, input_batch_linger=0.05)
+    input_process.send_line('line0')
+    time.sleep(0.3)
+    assert received(input_process.profilerqueues[0]) == [['line0']]
+    input_process.stop_batching()
+    assert received(input_process.profilerqueues[0]) == []
+
+
+def test_blocks_keep_the_order_with_the_batched_lines(make_input):
+    input_process = make_input(input_batch_size=10)
+    input_process.send_line('header')
+    input_process.send_block(b'line1\nline2\n')
+    input_process.send_to_profilers('stop')
+    assert received(input_process.profilerqueues[0]) == [['header'], b'line1\nline2\n', 'stop']
+
+
+def test_each_profiler_receives_the_flows_of_its_ips(make_input):
+    input_process = make_input(profilers=4, input_batch_size=1000)
+    ips = ['10.0.0.{}'.format(number) for number in range(1, 20)] + ['2001:db8::{:x}'.format(number) for number in range(1, 20)]
+    lines = [{'type': 'conn', 'ts': 1.0, 'id.orig_h': saddr, 'id.resp_h': daddr} for saddr in ips for daddr in ips[::7]]
+    for line in lines:
+        input_process.send_line(line)
+    # Lines that are not flows go to every profiler
+    input_process.send_line('#fields\tts\tuid')
+    input_process.stop_batching()
+    for shard, profilerqueue in enumerate(input_process.profilerqueues):
+        (batch,) = received(profilerqueue)
+        assert batch[-1] == '#fields\tts\tuid'
+        assert batch[:-1] == [line for line in lines if shard in (get_shard(line['id.orig_h'], 4), get_shard(line['id.resp_h'], 4))]
+
+
+def read_zeek_folder(input_process, folder, files) -> list:
+    """ Merge the Zeek logs of the folder and return the lines sent """
+    input_process.new_zeek_files = queue.Queue()
+    for file in files:
+        input_process.new_zeek_files.put(str(folder / file))
+    input_process.bro_timeout = 0.3
+    input_process.zeek_retry_time = 0.01
+    lines = input_process.read_zeek_files()
+    input_process.stop_batching()
+    sent = [line for batch in received(input_process.profilerqueues[0]) for line in batch]
+    assert lines == len([line for line in sent if type(line) == dict or line[0] != '#'])
+    return sent
+
+
+def test_zeek_logs_are_merged_in_order_of_time(make_input, tmp_path):
+    (tmp_path / 'conn.log').write_text(''.join(json.dumps({'ts': ts, 'uid': 'C{}'.format(ts)}) + '\n' for ts in (1.0, 4.0, 5.0, 9.0)))
+    (tmp_path / 'http.log').write_text(''.join(json.dumps({'ts': ts, 'uid': 'H{}'.format(ts)}) + '\n' for ts in (2.0, 3.0, 10.0)))
+    header = ['#separator \\x09\n', '#path\tdns\n', '#fields\tts\tuid\n', '#types\ttime\tstring\n']
+    (tmp_path / 'dns.log').write_text(''.join(header) + '4.5\tD1\n6.0\tD2\n#close\t2019-04-04-16-23-00\n')
+    # Logs without flows are not read
+    (tmp_path / 'stats.log').write_text(json.dumps({'ts': 0.5}) + '\n')
+    sent = read_zeek_folder(make_input(input_batch_size=1000), tmp_path, ['conn', 'http', 'dns', 'stats'])
+    # The header of the TSV log is sent before its lines, without the #close
+    headers = [line for line in sent if type(line) == str and line[0] == '#']
+    assert headers == header
+    flows = [line for line in sent if line not in headers]
+    # The TSV lines have the #path of their log in the last column
+    assert [line['uid'] if type(line) == dict else line for line in flows] == ['C1.0', 'H2.0', 'H3.0', 'C4.0', '4.5\tD1\tdns', 'C5.0', '6.0\tD2\tdns', 'C9.0', 'H10.0']
+    assert {line['type'] for line in flows if type(line) == dict} == {str(tmp_path / 'conn'), str(tmp_path / 'http')}
+
+
+def test_zeek_lines_that_arrive_later_are_read(make_input, tmp_path):
+    (tmp_path / 'conn.log').write_text(json.dumps({'ts': 1.0}) + '\n' + '{"ts": 2.0, "uid"')
+    input_process = make_input(input_batch_size=1000)
+
+    def finish_line():
+        # Zeek finishes writing the line while we wait for it
+        time.sleep(0.1)
+        with open(str(tmp_path / 'conn.log'), 'a') as log:
+            log.write(': "C2"}\n')
+    writer = threading.Thread(target=finish_line)
+    writer.start()
+    sent = read_zeek_folder(input_process, tmp_path, ['conn'])
+    writer.join()
+    assert [line['ts'] for line in sent] == [1.0, 2.0]
+    assert sent[1]['uid'] == 'C2'
+
+
+def write_argus_file(path, amount: int) -> list:
+    """ Write an argus file with flows between IPs of two profilers. Returns the end of each line in the file """
+    (saddr, daddr) = ('10.0.0.1', next('10.0.0.{}'.format(number) for number in range(2, 255) if get_shard('10.0.0.{}'.format(number), 2) != get_shard('10.0.0.1', 2)))
+    lines = ['StartTime,Dur,Proto,SrcAddr,Sport,Dir,DstAddr,Dport,State,sTos,dTos,TotPkts,TotBytes,SrcBytes,Label\n']
+    lines += ['2019/04/04 16:23:{:02d}.325010,0.02,udp,{},48427,  <->,{},53,CON,0,0,2,142,63,\n'.format(number, saddr, daddr) for number in range(amount)]
+    path.write_text(''.join(lines))
+    ends = []
+    for line in lines:
+        ends.append((ends[-1] if ends else 0) + len(line))
+    return ends
+
+
+def test_load_checkpoint_continues_from_the_smallest_position(make_input, tmp_path):
+    input_process = make_input(profilers=2, input_information=str(tmp_path))
+    input_process.stored_checkpoints.update({
+        0: {'input': str(tmp_path), 'files': {'a': {'inode': 1, 'offset': 100, 'ts': 5.0}, 'b': {'inode': 2, 'offset': 10, 'ts': None}, 'c': {'inode': 3, 'offset': 10, 'ts': None}}},
+        1: {'input': str(tmp_path), 'files': {'a': {'inode': 1, 'offset': 50, 'ts': 4.0}, 'b': {'inode': 2, 'offset': 20, 'ts': None}, 'c': {'inode': 4, 'offset': 10, 'ts': None}}},
+        # The checkpoint of other input is ignored
+        2: {'input': 'other', 'files': {}},
+    })
+    # The file c was rotated, so it is read again
+    assert input_process.load_checkpoint() == {'a': (1, 50, 4.0, [100, 50]), 'b': (2, 10, None, [10, 20])}
+    # The checkpoints of the previous run are replaced by the positions where we continue
+    assert sorted(input_process.stored_checkpoints) == [0, 1]
+    assert input_process.stored_checkpoints[1]['files'] == {'a': {'inode': 1, 'offset': 50, 'ts': 4.0}, 'b': {'inode': 2, 'offset': 10, 'ts': None}}
+    input_process.stop_batching()
+
+
+def test_resume_a_file_from_its_checkpoint(make_input, tmp_path):
+    path = tmp_path / 'flows.binetflow'
+    ends = write_argus_file(path, 6)
+    inode = os.stat(str(path)).st_ino
+    input_process = make_input(input_information=str(path), input_checkpoint_interval=0)
+    input_process.stored_checkpoints[0] = {'input': str(path), 'files': {str(path): {'inode': inode, 'offset': ends[3], 'ts': None}}}
+    input_process.resume = True
+    input_process.resume_positions = input_process.load_checkpoint()
+    input_process.read_file_blocks(str(path))
+    input_process.send_checkpoint()
+    input_process.stop_batching()
+    lines = path.read_bytes().splitlines(keepends=True)
+    # The header is sent again, and then the lines after the checkpoint
+    (header, rest, checkpoint) = received(input_process.profilerqueues[0])
+    assert (header, rest) == (lines[0], b''.join(lines[4:]))
+    assert checkpoint == ('checkpoint', {'input': str(path), 'files': {str(path): {'inode': inode, 'offset': ends[-1], 'ts': None}}})
+
+
+def test_resume_with_profilers_at_different_positions(make_input, tmp_path):
+    """ Each profiler only receives the lines that it did not process before """
+    path = tmp_path / 'flows.binetflow'
+    ends = write_argus_file(path, 6)
+    inode = os.stat(str(path)).st_ino
+    input_process = make_input(profilers=2, input_information=str(path), input_checkpoint_interval=0)
+    for (worker, line) in ((0, 2), (1, 4)):
+        input_process.stored_checkpoints[worker] = {'input': str(path), 'files': {str(path): {'inode': inode, 'offset': ends[line], 'ts': None}}}
+    input_process.resume = True
+    input_process.resume_positions = input_process.load_checkpoint()
+    # Before reaching the position of every profiler, the checkpoint of each one keeps its own position
+    input_process.get_resume_offset(str(path), inode, ends[-1])
+    input_process.send_checkpoint()
+    input_process.read_file_blocks(str(path))
+    input_process.send_checkpoint()
+    input_process.stop_batching()
+    lines = path.read_text().splitlines()
+    for (shard, first_line) in ((0, 3), (1, 5)):
+        batches = received(input_process.profilerqueues[shard])
+        (first_checkpoint, last_checkpoint) = (batches.pop(0), batches.pop())
+        assert first_checkpoint[1]['files'][str(path)]['offset'] == ends[first_line - 1]
+        assert [line for batch in batches for line in batch] == [lines[0]] + lines[first_line:]
+        assert last_checkpoint[1]['files'][str(path)]['offset'] == ends[-1]
+
+
+def test_changed_files_are_read_from_the_start(make_input, tmp_path):
+    path = tmp_path / 'flows.binetflow'
+    ends = write_argus_file(path, 3)
+    input_process = make_input(input_information=str(path))
+    input_process.resume_positions = {str(path): (os.stat(str(path)).st_ino + 1, ends[1], None, None)}
+    assert input_process.get_resume_offset(str(path), os.stat(str(path)).st_ino, ends[-1]) == 0
+    # Truncated
+    input_process.resume_positions = {str(path): (os.stat(str(path)).st_ino, ends[-1] + 1, None, None)}
+    assert input_process.get_resume_offset(str(path), os.stat(str(path)).st_ino, ends[-1]) == 0
+    assert input_process.get_resume_offset('unknown', 1, 100) == 0
+    input_process.stop_batching()
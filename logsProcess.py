@@ -13,7 +13,7 @@ import time
 from slips.core.database import __database__
 import configparser
 import pprint
-import json
+from slips.core import codec
 
 def timing(f):
     """ Function to measure the time another function takes. It should be used as decorator: @timing"""
@@ -58,6 +58,12 @@ class LogsProcess(multiprocessing.Process):
         except (configparser.NoOptionError, configparser.NoSectionError, NameError):
             # There is a conf, but there is no option, or no section or no configuration file specified
             self.report_time = 5
+        # Get the folder for the log files. By default it is named with the current date and time when slips starts
+        try:
+            self.mainfoldername = self.config.get('parameters', 'output_folder')
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.mainfoldername = None
         self.outputqueue.put('01|logs|Logs Process configured to report every: {} seconds'.format(self.report_time))
 
     def print(self, text, verbose=1, debug=0):
@@ -79,7 +85,8 @@ class LogsProcess(multiprocessing.Process):
         try:
             # Create our main output folder. The current datetime with microseconds
             # TODO. Do not create the folder if there is no data? (not sure how to)
-            self.mainfoldername = datetime.now().strftime('%Y-%m-%d--%H:%M:%S')
+            if not self.mainfoldername:
+                self.mainfoldername = datetime.now().strftime('%Y-%m-%d--%H:%M:%S')
             if not os.path.exists(self.mainfoldername):
                     os.makedirs(self.mainfoldername)
                     self.print('Using the folder {} for storing results.'.format(self.mainfoldername))
@@ -264,7 +271,7 @@ class LogsProcess(multiprocessing.Process):
                 # 2. Info about the evidence so far for this TW.
                 evidence = __database__.getEvidenceForTW(profileid, twid)
                 if evidence:
-                    evidence = json.loads(evidence)
+                    evidence = codec.loads(evidence)
                     self.addDataToFile(profilefolder + '/' + twlog, 'Evidence of detections in this TW:', file_mode='a+', data_type='text')
                     self.outputqueue.put('03|logs|\t\t[Logs] Evidence of detections in this TW:')
                     for data in evidence:
@@ -277,7 +284,7 @@ class LogsProcess(multiprocessing.Process):
                     # Add dstips to log file
                     self.addDataToFile(profilefolder + '/' + twlog, 'DstIP:', file_mode='a+', data_type='text')
                     self.outputqueue.put('03|logs|\t\t[Logs] DstIP:')
-                    data = json.loads(dstips)
+                    data = codec.loads(dstips)
                     # Better printing of data
                     for key in data:
                         ip_info = __database__.getIPData(key)
@@ -294,7 +301,7 @@ class LogsProcess(multiprocessing.Process):
                     # Add srcips
                     self.addDataToFile(profilefolder + '/' + twlog, 'SrcIP:', file_mode='a+', data_type='text')
                     self.outputqueue.put('03|logs|\t\t[Logs] SrcIP:')
-                    data = json.loads(srcips)
+                    data = codec.loads(srcips)
                     for key in data:
                         ip_info = __database__.getIPData(key)
                         if ip_info:
@@ -310,7 +317,7 @@ class LogsProcess(multiprocessing.Process):
                     # Add tuples
                     self.addDataToFile(profilefolder + '/' + twlog, 'OutTuples:', file_mode='a+', data_type='text')
                     self.outputqueue.put('03|logs|\t\t[Logs] OutTuples:')
-                    data = json.loads(out_tuples)
+                    data = codec.loads(out_tuples)
                     for key in data:
                         self.addDataToFile(profilefolder + '/' + twlog, '\t{} ({})'.format(key, data[key]), file_mode='a+', data_type='text')
                         self.outputqueue.put('03|logs|\t\t\t[Logs] {} ({})'.format(key, data[key]))
@@ -322,7 +329,7 @@ class LogsProcess(multiprocessing.Process):
                     # Add in tuples
                     self.addDataToFile(profilefolder + '/' + twlog, 'InTuples:', file_mode='a+', data_type='text')
                     self.outputqueue.put('03|logs|\t\t[Logs] InTuples:')
-                    data = json.loads(in_tuples)
+                    data = codec.loads(in_tuples)
                     for key in data:
                         self.addDataToFile(profilefolder + '/' + twlog, '\t{} ({})'.format(key, data[key]), file_mode='a+', data_type='text')
                         self.outputqueue.put('03|logs|\t\t\t[Logs] {} ({})'.format(key, data[key]))
@@ -352,7 +359,7 @@ class LogsProcess(multiprocessing.Process):
                 # 8. Info about the evidence so far for this TW.
                 evidence = __database__.getEvidenceForTW(profileid, twid)
                 if evidence:
-                    evidence = json.loads(evidence)
+                    evidence = codec.loads(evidence)
                     self.addDataToFile(profilefolder + '/' + twlog, 'Evidence of detections in this TW:', file_mode='a+', data_type='text')
                     for key in evidence:
                         self.addDataToFile(profilefolder + '/' + twlog, '\tEvidence Description: {}. Confidence: {}. Threat Level: {} (key:{})'.format(evidence[key][2], evidence[key][0], evidence[key][1], key), file_mode='a+', data_type='text')
@@ -10,7 +10,7 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 import pickle
 import pandas as pd
-import json
+from slips.core import codec
 import platform
 
 
@@ -121,17 +121,13 @@ class Module(Module, multiprocessing.Process):
                 elif message['channel'] == 'new_flow' and message['data'] != 1:
                     mdata = message['data']
                     # Convert from json to dict
-                    mdata = json.loads(mdata)
+                    mdata = codec.loads(mdata)
                     profileid = mdata['profileid']
                     twid = mdata['twid']
-                    # Get flow as a json
+                    # Get flow as a dict {uid: flow}
                     json_flow = mdata['flow']
-                    # Convert flow to a dict
-                    self.flow = json.loads(json_flow)
-                    # The dict has an empty key, just get the real flow from inside
-                    self.flow = list(self.flow.values())[0]
-                    # Reconvert
-                    self.flow = json.loads(self.flow)
+                    # The dict has the uid as key, just get the real flow from inside
+                    self.flow = list(json_flow.values())[0]
                     self.print('Flow received: {}'.format(self.flow))
                     # First process the flow to convert to pandas
                     if self.mode == 'train':
@@ -294,7 +290,7 @@ class Module(Module, multiprocessing.Process):
         list_flows = []
         for flowdict in flows:
             for flow in flowdict:
-                dict_flow = json.loads(flowdict[flow])
+                dict_flow = codec.loads(flowdict[flow])
                 list_flows.append(dict_flow)
         # Convert the list to a pandas dataframe
         df_flows = pd.DataFrame(list_flows)
@@ -311,7 +307,7 @@ class Module(Module, multiprocessing.Process):
         # Forget the timestamp that is the only key of the dict and get the content
         # json_flow = self.flow[list(self.flow.keys())[0]]
         # Convert flow to a dict
-        # dict_flow = json.loads(json_flow)
+        # dict_flow = codec.loads(json_flow)
         # Convert the flow to a pandas dataframe
         # raw_flow = pd.DataFrame(dict_flow, index=[0])
         raw_flow = pd.DataFrame(self.flow, index=[0])
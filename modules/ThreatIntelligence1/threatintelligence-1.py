@@ -9,7 +9,7 @@ import time
 import ipaddress
 import os
 import configparser
-import json
+from slips.core import codec
 import ast
 from progress_bar import ProgressBar
 from modules.ThreatIntelligence1.update_ip_manager import UpdateIPManager
@@ -168,7 +168,7 @@ class Module(Module, multiprocessing.Process):
                 ip_location[profileid] = str({twid})
         elif not ip_location:
             ip_location = {}
-        data = json.dumps(ip_location)
+        data = codec.dumps(ip_location)
         __database__.add_malicious_ip(ip, data)
 
     def set_evidence(self, ip, ip_description = '', profileid = '', twid = '' ):
@@ -913,6 +913,14 @@ tree.on('select',function(node){
       timewindow = color.unstyle(node.name);
   
       redis_outtuples_timewindow.hgetall("profile_"+ip+"_"+timewindow, (err,reply)=>{
+      // Each out tuple is a field of its own hash. Put them together as slips stored them before
+      redis_outtuples_timewindow.hgetall("profile_"+ip+"_"+timewindow+"_OutTuples", (err,tuples_reply)=>{
+        var tuples = {};
+        for (var tuple_key in tuples_reply) {
+          tuples[tuple_key] = JSON.parse(tuples_reply[tuple_key]);
+        }
+        reply = reply || {};
+        reply["OutTuples"] = JSON.stringify(tuples);
         var ips = [];
         timeline_reply_global = reply;
         map.innerMap.draw(null);
@@ -931,7 +939,7 @@ tree.on('select',function(node){
         setMap(ips)
       screen.render();  
       }
-      });})
+      });})})
     
 
       //get the timeline of a selected ip
@@ -1,10 +1,15 @@
 from slips.common.abstracts import Module
 import multiprocessing
 from slips.core.database import __database__
+from slips.core import codec
+from slips.common.twtracker import loads_tw_modified
 import time
 import json
 import platform
 
+# Seconds of flow time between the checks of a TW while it receives flows. It is always checked when it is closed
+check_interval = 5
+
 # Port Scan Detector Process
 class PortScanProcess(Module, multiprocessing.Process):
     """ 
@@ -26,10 +31,13 @@ class PortScanProcess(Module, multiprocessing.Process):
         # Get from the database the separator used to separate the IP and the word profile
         self.fieldseparator = __database__.getFieldSeparator()
         # To which channels do you wnat to subscribe? When a message arrives on the channel the module will wakeup
-        self.c1 = __database__.subscribe('tw_modified')
+        self.c1 = __database__.subscribe('tw_modified', 'tw_closed')
         # We need to know that after a detection, if we receive another flow that does not modify the count for the detection, we are not
         # re-detecting again only becase the threshold was overcomed last time.
+        # (profileid, twid): {key of the detection: amount of the last detection}. Removed when the TW is closed
         self.cache_det_thresholds = {}
+        # (profileid, twid): time of the flow of the last check of the TW while it is receiving flows
+        self.last_checks = {}
         # Set the timeout based on the platform. This is because the pyredis lib does not have officially recognized the timeout=None as it works in only macos and timeout=-1 as it only works in linux
         if platform.system() == 'Darwin':
             # macos
@@ -57,159 +65,184 @@ class PortScanProcess(Module, multiprocessing.Process):
         vd_text = str(int(verbose) * 10 + int(debug))
         self.outputqueue.put(vd_text + '|' + self.name + '|[' + self.name + '] ' + str(text))
 
+    def check_portscans(self, profileid, twid):
+        """
+        Check the ports and IPs that the profile contacted in the TW, and set the evidence of the new port scans.
+        A scan is detected again each time that it reaches 3 more dst IPs or dst ports, so the counts of the last
+        detections of the TW are kept in the cache
+        """
+        cache = self.cache_det_thresholds.setdefault((profileid, twid), {})
+        # Start of the port scan detection
+        self.print('Running the detection of portscans in profile {} TW {}'.format(profileid, twid), 6, 0)
+        # For port scan detection, we will measure different things:
+        # 1. Vertical port scan:
+        # - 1 srcip sends not established flows to > 3 dst ports in the same dst ip. Any number of packets
+        # 2. Horizontal port scan:
+        # - 1 srcip sends not established flows to the same dst ports in > 3 dst ip. 
+        # 3. Too many connections???:
+        # - 1 srcip sends not established flows to the same dst ports, > 3 pkts, to the same dst ip
+        # 4. Slow port scan. Same as the others but distributed in multiple time windows
+
+        # Remember that in slips all these port scans can happen for traffic going IN to an IP or going OUT from the IP.
+
+
+        # Get the list of dports that we connected as client using TCP not established
+        direction = 'Dst'
+        state = 'NotEstablished'
+        protocol = 'TCP'
+        role = 'Client'
+        type_data = 'Ports'
+        data = __database__.getDataFromProfileTW(profileid, twid, direction, state, protocol, role, type_data)
+        # For each port, see if the amount is over the threshold
+        for dport in data.keys():
+            """
+            ###
+            # PortScan Type 3. Direction OUT
+            # Considering all the flows in this TW, for all the Dst IP, get the sum of all the pkts send to each dst port TCP No tEstablished
+            totalpkts = int(data[dport]['totalpkt'])
+            # If for each port, more than X amount of packets were sent, report an evidence
+            if totalpkts > 3:
+                # Type of evidence
+                type_evidence = 'PortScanType3'
+                # Key
+                key = 'dport' + ':' + dport + ':' + type_evidence
+                # Description
+                description = 'Too Many Not Estab TCP to same port {} from IP: {}. Amount: {}'.format(dport, profileid.split('_')[1], totalpkts)
+                # Threat level
+                threat_level = 50
+                # Confidence. By counting how much we are over the threshold. 
+                if totalpkts >= 10:
+                    # 10 pkts or more, receive the max confidence
+                    confidence = 1
+                else:
+                    # Between 3 and 10 pkts compute a kind of linear grow
+                    confidence = totalpkts / 10.0
+                __database__.setEvidence(profileid, twid, type_evidence, threat_level, confidence)
+                self.print('Too Many Not Estab TCP to same port {} from IP: {}. Amount: {}'.format(dport, profileid.split('_')[1], totalpkts),6,0)
+
+            """
+            ### PortScan Type 2. Direction OUT
+            dstips = data[dport]['dstips']
+            amount_of_dips = len(dstips)
+            # If we contacted more than 3 dst IPs on this port with not established connections.. we have evidence
+            #self.print('Horizontal Portscan check. Amount of dips: {}. Threshold=3'.format(amount_of_dips), 3, 0)
+
+            # Type of evidence
+            type_evidence = 'PortScanType2'
+            # Key
+            key = 'dport' + ':' + dport + ':' + type_evidence
+            # Threat level
+            threat_level = 50
+            # Compute the confidence
+            pkts_sent = 0
+            # We detect a scan every Threshold. So we detect when there is 3, 6, 9, 12, etc. dips per port.
+            # The idea is that after X dips we detect a connection. And then we 'reset' the counter until we see again X more. 
+            # The TW is not checked after every flow, so the amount can pass a multiple of 3 between two checks
+            prev_amount_dips = cache.get(key, 0)
+            #self.print('Key: {}. Prev dips: {}, Current: {}'.format(key, prev_amount_dips, amount_of_dips))
+            if amount_of_dips // 3 > prev_amount_dips // 3:
+                for dip in dstips:
+                    # Get the total amount of pkts sent to the same port to all IPs
+                    pkts_sent += dstips[dip]
+                if pkts_sent > 10:
+                    confidence = 1
+                else:
+                    # Between 3 and 10 pkts compute a kind of linear grow
+                    confidence = pkts_sent / 10.0
+                # Description
+                description = 'New horizontal port scan detected to port {}. Not Estab TCP from IP: {}. Tot pkts sent all IPs: {}'.format(dport, profileid.split(self.fieldseparator)[1], pkts_sent, confidence)
+                __database__.setEvidence(key, threat_level, confidence, description, profileid=profileid, twid=twid)
+                self.print(description, 3, 0)
+                # Store in our local cache how many dips were there:
+                cache[key] = amount_of_dips
+
+        # Get the list of dstips that we connected as client using TCP not established, and their ports
+
+        direction = 'Dst'
+        state = 'NotEstablished'
+        protocol = 'TCP'
+        role = 'Client'
+        type_data = 'IPs'
+        data = __database__.getDataFromProfileTW(profileid, twid, direction, state, protocol, role, type_data)
+
+        # For each dstip, see if the amount of ports connections is over the threshold
+        for dstip in data.keys():
+            ### PortScan Type 1. Direction OUT
+            # dstports is a dict
+            dstports = data[dstip]['dstports']
+            amount_of_dports = len(dstports)
+            #self.print('Vertical Portscan check. Amount of dports: {}. Threshold=3'.format(amount_of_dports), 3, 0)
+            # Type of evidence
+            type_evidence = 'PortScanType1'
+            # Key
+            key = 'dstip' + ':' + dstip + ':' + type_evidence
+            # Threat level
+            threat_level = 50
+            # We detect a scan every Threshold. So we detect when there is 3, 6, 9, 12, etc. dports per dip.
+            # The idea is that after X dips we detect a connection. And then we 'reset' the counter until we see again X more. 
+            prev_amount_dports = cache.get(key, 0)
+            #self.print('Key: {}, Prev dports: {}, Current: {}'.format(key, prev_amount_dports, amount_of_dports))
+            if amount_of_dports // 3 > prev_amount_dports // 3:
+                # Compute the confidence
+                pkts_sent = 0
+                for dport in dstports:
+                    # Get the total amount of pkts sent to the same port to all IPs
+                    pkts_sent += dstports[dport]
+                if pkts_sent > 10:
+                    confidence = 1
+                else:
+                    # Between 3 and 10 pkts compute a kind of linear grow
+                    confidence = pkts_sent / 10.0
+                # Description
+                description = 'New vertical port scan detected to IP {} from {}. Total {} dst ports. Not Estab TCP. Tot pkts sent all ports: {}'.format(dstip, profileid.split(self.fieldseparator)[1], amount_of_dports, pkts_sent, confidence)
+                __database__.setEvidence(key, threat_level, confidence, description, profileid=profileid, twid=twid)
+                self.print(description, 3, 0)
+                # Store in our local cache how many dips were there:
+                cache[key] = amount_of_dports
+
+    def handle_message(self, message):
+        """ Check the TW of a message of tw_modified or tw_closed """
+        if message['channel'] == 'tw_modified':
+            # Get the profileid, twid and the time of the flow that modified the TW
+            (profileid, twid, flowtime) = loads_tw_modified(message['data'])
+            if flowtime is None:
+                # Not modified by a flow, so the ports and IPs of the TW did not change
+                return
+            # Each flow modifies its TW several times. While the TW receives flows, only check it every
+            # check_interval seconds of the time of the flows, so reading a file is checked as often as the
+            # live traffic. The final check of all the TW is done when it is closed
+            last_check = self.last_checks.get((profileid, twid))
+            if last_check is not None and abs(flowtime - last_check) < check_interval:
+                return
+            self.last_checks[(profileid, twid)] = flowtime
+            self.check_portscans(profileid, twid)
+        elif message['channel'] == 'tw_closed':
+            # The TW will not receive more flows. Check it for the last time and forget it
+            summary = codec.loads(message['data'])
+            profileid = summary['profileid']
+            twid = summary['twid']
+            self.last_checks.pop((profileid, twid), None)
+            # The scans are only in the flows with traffic between the IPs
+            if summary['conn_flows']:
+                self.check_portscans(profileid, twid)
+            self.cache_det_thresholds.pop((profileid, twid), None)
+
     def run(self):
         try:
             while True:
-                # Wait for a message from the channel that a TW was modified
+                # Wait for a message from the channels that a TW was modified or closed
                 message = self.c1.get_message(timeout=self.timeout)
                 #print('Message received from channel {} with data {}'.format(message['channel'], message['data']))
                 if message['data'] == 'stop_process':
                     return True
-                elif message['channel'] == 'tw_modified':
-                    # Get the profileid and twid
-                    try:
-                        profileid = message['data'].split(':')[0]
-                        twid = message['data'].split(':')[1]
-
-                        # Start of the port scan detection
-                        self.print('Running the detection of portscans in profile {} TW {}'.format(profileid, twid), 6, 0)
-                        # For port scan detection, we will measure different things:
-                        # 1. Vertical port scan:
-                        # - 1 srcip sends not established flows to > 3 dst ports in the same dst ip. Any number of packets
-                        # 2. Horizontal port scan:
-                        # - 1 srcip sends not established flows to the same dst ports in > 3 dst ip. 
-                        # 3. Too many connections???:
-                        # - 1 srcip sends not established flows to the same dst ports, > 3 pkts, to the same dst ip
-                        # 4. Slow port scan. Same as the others but distributed in multiple time windows
-
-                        # Remember that in slips all these port scans can happen for traffic going IN to an IP or going OUT from the IP.
-
-
-                        # Get the list of dports that we connected as client using TCP not established
-                        direction = 'Dst'
-                        state = 'NotEstablished'
-                        protocol = 'TCP'
-                        role = 'Client'
-                        type_data = 'Ports'
-                        data = __database__.getDataFromProfileTW(profileid, twid, direction, state, protocol, role, type_data)
-                        # For each port, see if the amount is over the threshold
-                        for dport in data.keys():
-                            """
-                            ###
-                            # PortScan Type 3. Direction OUT
-                            # Considering all the flows in this TW, for all the Dst IP, get the sum of all the pkts send to each dst port TCP No tEstablished
-                            totalpkts = int(data[dport]['totalpkt'])
-                            # If for each port, more than X amount of packets were sent, report an evidence
-                            if totalpkts > 3:
-                                # Type of evidence
-                                type_evidence = 'PortScanType3'
-                                # Key
-                                key = 'dport' + ':' + dport + ':' + type_evidence
-                                # Description
-                                description = 'Too Many Not Estab TCP to same port {} from IP: {}. Amount: {}'.format(dport, profileid.split('_')[1], totalpkts)
-                                # Threat level
-                                threat_level = 50
-                                # Confidence. By counting how much we are over the threshold. 
-                                if totalpkts >= 10:
-                                    # 10 pkts or more, receive the max confidence
-                                    confidence = 1
-                                else:
-                                    # Between 3 and 10 pkts compute a kind of linear grow
-                                    confidence = totalpkts / 10.0
-                                __database__.setEvidence(profileid, twid, type_evidence, threat_level, confidence)
-                                self.print('Too Many Not Estab TCP to same port {} from IP: {}. Amount: {}'.format(dport, profileid.split('_')[1], totalpkts),6,0)
-
-                            """
-                            ### PortScan Type 2. Direction OUT
-                            dstips = data[dport]['dstips']
-                            amount_of_dips = len(dstips)
-                            # If we contacted more than 3 dst IPs on this port with not established connections.. we have evidence
-                            #self.print('Horizontal Portscan check. Amount of dips: {}. Threshold=3'.format(amount_of_dips), 3, 0)
-
-                            # Type of evidence
-                            type_evidence = 'PortScanType2'
-                            # Key
-                            key = 'dport' + ':' + dport + ':' + type_evidence
-                            # Threat level
-                            threat_level = 50
-                            # Compute the confidence
-                            pkts_sent = 0
-                            # We detect a scan every Threshold. So we detect when there is 3, 6, 9, 12, etc. dips per port.
-                            # The idea is that after X dips we detect a connection. And then we 'reset' the counter until we see again X more. 
-                            cache_key = profileid + ':' + twid + ':' + key
-                            try:
-                                prev_amount_dips = self.cache_det_thresholds[cache_key] 
-                            except KeyError:
-                                prev_amount_dips = 0
-                            #self.print('Key: {}. Prev dips: {}, Current: {}'.format(cache_key, prev_amount_dips, amount_of_dips))
-                            if amount_of_dips % 3 == 0 and prev_amount_dips < amount_of_dips:
-                                for dip in dstips:
-                                    # Get the total amount of pkts sent to the same port to all IPs
-                                    pkts_sent += dstips[dip]
-                                if pkts_sent > 10:
-                                    confidence = 1
-                                else:
-                                    # Between 3 and 10 pkts compute a kind of linear grow
-                                    confidence = pkts_sent / 10.0
-                                # Description
-                                description = 'New horizontal port scan detected to port {}. Not Estab TCP from IP: {}. Tot pkts sent all IPs: {}'.format(dport, profileid.split(self.fieldseparator)[1], pkts_sent, confidence)
-                                __database__.setEvidence(key, threat_level, confidence, description, profileid=profileid, twid=twid)
-                                self.print(description, 3, 0)
-                                # Store in our local cache how many dips were there:
-                                self.cache_det_thresholds[cache_key] = amount_of_dips
-
-                        # Get the list of dstips that we connected as client using TCP not established, and their ports
-
-                        direction = 'Dst'
-                        state = 'NotEstablished'
-                        protocol = 'TCP'
-                        role = 'Client'
-                        type_data = 'IPs'
-                        data = __database__.getDataFromProfileTW(profileid, twid, direction, state, protocol, role, type_data)
-
-                        # For each dstip, see if the amount of ports connections is over the threshold
-                        for dstip in data.keys():
-                            ### PortScan Type 1. Direction OUT
-                            # dstports is a dict
-                            dstports = data[dstip]['dstports']
-                            amount_of_dports = len(dstports)
-                            #self.print('Vertical Portscan check. Amount of dports: {}. Threshold=3'.format(amount_of_dports), 3, 0)
-                            # Type of evidence
-                            type_evidence = 'PortScanType1'
-                            # Key
-                            key = 'dstip' + ':' + dstip + ':' + type_evidence
-                            # Threat level
-                            threat_level = 50
-                            # We detect a scan every Threshold. So we detect when there is 3, 6, 9, 12, etc. dports per dip.
-                            # The idea is that after X dips we detect a connection. And then we 'reset' the counter until we see again X more. 
-                            cache_key = profileid + ':' + twid + ':' + key
-                            try:
-                                prev_amount_dports = self.cache_det_thresholds[cache_key]
-                            except KeyError:
-                                prev_amount_dports = 0
-                            #self.print('Key: {}, Prev dports: {}, Current: {}'.format(cache_key, prev_amount_dports, amount_of_dports))
-                            if amount_of_dports % 3 == 0 and prev_amount_dports < amount_of_dports:
-                                # Compute the confidence
-                                pkts_sent = 0
-                                for dport in dstports:
-                                    # Get the total amount of pkts sent to the same port to all IPs
-                                    pkts_sent += dstports[dport]
-                                if pkts_sent > 10:
-                                    confidence = 1
-                                else:
-                                    # Between 3 and 10 pkts compute a kind of linear grow
-                                    confidence = pkts_sent / 10.0
-                                # Description
-                                description = 'New vertical port scan detected to IP {} from {}. Total {} dst ports. Not Estab TCP. Tot pkts sent all ports: {}'.format(dstip, profileid.split(self.fieldseparator)[1], amount_of_dports, pkts_sent, confidence)
-                                __database__.setEvidence(key, threat_level, confidence, description, profileid=profileid, twid=twid)
-                                self.print(description, 3, 0)
-                                # Store in our local cache how many dips were there:
-                                self.cache_det_thresholds[cache_key] = amount_of_dports
-
-                    except AttributeError:
-                        # When the channel is created the data '1' is sent
-                        continue
-
+                elif message['type'] != 'message':
+                    # When the channel is created the data '1' is sent
+                    continue
+                try:
+                    self.handle_message(message)
+                except Exception as inst:
+                    # A message that we can not process must not stop the module
+                    self.print('Error processing the message {} of the channel {}: {}'.format(message['data'], message['channel'], inst), 0, 1)
 
         except KeyboardInterrupt:
             self.print('Stopping the process', 0, 1)
@@ -37,8 +37,10 @@ class Module(Module, multiprocessing.Process):
         # To which channels do you wnat to subscribe? When a message arrives on the channel the module will wakeup
         # The options change, so the last list is on the slips/core/database.py file. However common options are:
         # - new_ip
-        # - tw_modified
+        # - tw_modified: the data is the json of the profileid, the twid and the time of the flow that modified it. Read it with slips.common.twtracker.loads_tw_modified
+        # - tw_closed: a TW will not receive more flows. The data is the json of its summary counters
         # - evidence_added
+        # To receive the messages of several channels in order, subscribe to all of them at once: subscribe('tw_modified', 'tw_closed')
         self.c1 = __database__.subscribe('new_ip')
         # Set the timeout based on the platform. This is because the pyredis lib does not have officially recognized the timeout=None as it works in only macos and timeout=-1 as it only works in linux
         if platform.system() == 'Darwin':
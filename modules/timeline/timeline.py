@@ -6,7 +6,7 @@ import platform
 
 # Your imports
 import time
-import json
+from slips.core import codec
 import configparser
 from datetime import datetime
 
@@ -107,7 +107,7 @@ class Module(Module, multiprocessing.Process):
         try:
             # Convert the common fields to something that can be interpreted
             uid = next(iter(flow))
-            flow_dict = json.loads(flow[uid])
+            flow_dict = flow[uid]
             
             dur = flow_dict['dur']
             stime = flow_dict['ts']
@@ -245,7 +245,7 @@ class Module(Module, multiprocessing.Process):
             # Now process the alternative flows
             alt_activity = ''
             if alt_flow_json:
-                alt_flow = json.loads(alt_flow_json)
+                alt_flow = codec.loads(alt_flow_json)
                 self.print('Received an altflow of type {}: {}'.format(alt_flow['type'], alt_flow), 5,0)
                 if 'dns' in alt_flow['type']:
                     alt_activity = '	- Query: {}, Query Class: {}, Type: {}, Response Code: {}, Answers: {}\n'.format(alt_flow['query'], alt_flow['qclass_name'], alt_flow['qtype_name'], alt_flow['rcode_name'], alt_flow['answers'])
@@ -309,14 +309,12 @@ class Module(Module, multiprocessing.Process):
                 elif message['channel'] == 'new_flow' and message['data'] != 1:
                     mdata = message['data']
                     # Convert from json to dict
-                    mdata = json.loads(mdata)
+                    mdata = codec.loads(mdata)
                     profileid = mdata['profileid']
                     twid = mdata['twid']
-                    # Get flow as a json
+                    # Get flow as a dict {uid: flow}
                     flow = mdata['flow']
                     timestamp = mdata['stime']
-                    # Convert flow to a dict
-                    flow = json.loads(flow)
                     # Process the flow
                     return_value = self.process_flow(profileid, twid, flow, timestamp)
                     # This is to try to kill the timeline when the user press CTRL-C.
@@ -8,6 +8,7 @@ import platform
 
 # Your imports
 import json
+from slips.core import codec
 import urllib3
 import certifi
 import time
@@ -200,7 +201,7 @@ class VirusTotalModule(Module, multiprocessing.Process):
             time.sleep(sleep_time)
             response = self.http.request("GET", self.url, fields=params)
 
-        data = json.loads(response.data)
+        data = codec.loads(response.data)
 
         # optionally, save data to file
         if save_data:
@@ -1,19 +1,35 @@
 import multiprocessing
-import json
+from slips.core import codec
 from datetime import datetime
 from datetime import timedelta
 import sys
 from collections import OrderedDict
 import configparser
 from slips.core.database import __database__
+from slips.core.parsers import SuricataEventFilter, parsers
+from slips.core.flows import ConnFlow
+from slips.core.timestamps import TimestampParser, detect_time_format
+from slips.common.sharding import get_shard
+from slips.common.ipclassifier import IPClassifier, read_home_networks
+from slips.common.tuplecache import TupleCache
+from slips.common.reorder import ReorderBuffer
+from slips.common.twtracker import TimeWindowTracker
+import queue
 import time
-import ipaddress
 import traceback
 from typing import Tuple, Dict, Set, Callable
 import os
 import binascii
 import base64
 
+# With the aligned time windows, when more TWs than this are registered in memory, we start again
+max_registered_tws = 100000
+# When more profiles than this are known in memory, we start again
+max_known_profiles = 100000
+# Types of flows that are added to the profiles
+profiled_flow_types = {'conn', 'flow', 'argus', 'dns', 'http', 'ssl'}
+# Letters of the stratosphere model, by periodicity. In each one the letter is chosen by the size and then the duration
+letters = {-1: '123456789', 1: 'abcdefghi', 2: 'ABCDEFGHI', 3: 'rstuvwxyz', 4: 'RSTUVWXYZ'}
 
 def timing(f):
     """ Function to measure the time another function takes."""
@@ -28,18 +44,45 @@ def timing(f):
 # Profiler Process
 class ProfilerProcess(multiprocessing.Process):
     """ A class to create the profiles for IPs and the rest of data """
-    def __init__(self, inputqueue, outputqueue, config, width):
-        self.name = 'Profiler'
+    def __init__(self, inputqueue, outputqueue, config, width, profiler_id=0, profilers=1, debug=0):
         multiprocessing.Process.__init__(self)
+        # When there are several profilers, each one owns the profiles of the IPs that get_shard() assigns to its id
+        self.profiler_id = profiler_id
+        self.profilers = profilers
+        if self.profilers > 1:
+            self.name = 'Profiler-' + str(self.profiler_id)
+        else:
+            self.name = 'Profiler'
         self.inputqueue = inputqueue
         self.outputqueue = outputqueue
         self.config = config
         self.width = width
+        # The lines received are only printed with debug >= 3
+        self.debug = debug
         self.columns_defined = False
         self.timeformat = None
+        # Converts the times of the flows in self.timeformat to seconds
+        self.time_parser = None
         self.input_type = False
+        # Parser of the type of input, created from the parsers registry when we know the type
+        self.parser = None
+        self.separator = None
+        # The last flow parsed
+        self.flow = None
+        # With the aligned time windows, the TWs that we already added to the DB, as (profileid, index of the TW)
+        self.registered_tws = set()
+        # The profiles that we know are already in the DB, so we only add them to the DB the first time we see them
+        self.known_profiles = set()
         # Read the configuration
         self.read_configuration()
+        # Parses the IPs of the flows and checks if they are in the home net
+        self.ip_classifier = IPClassifier(self.home_net)
+        # The last tuples used, so the letters are computed without reading them from the DB
+        self.tuple_cache = TupleCache(__database__.getTupleFromProfileTW, max_letters=self.max_tuple_letters)
+        # Puts the flows in order of time before adding them to the profiles. None if it is disabled
+        self.reorder_buffer = ReorderBuffer(self.reorder_delay, self.reorder_size) if self.reorder_delay > 0 else None
+        # The TWs of our profiles that can still receive flows, to publish when they are closed
+        self.tw_tracker = TimeWindowTracker(self.tw_close_grace)
         # Start the DB
         __database__.start(self.config)
         # Set the database output queue
@@ -56,18 +99,20 @@ class ProfilerProcess(multiprocessing.Process):
          text: text to print. Can include format like 'Test {}'.format('here')
         
         If not specified, the minimum verbosity level required is 1, and the minimum debugging level is 0
+        The debugging texts over our debug level would never be printed, so they are not sent to the output process
         """
-
+        if not verbose and debug > self.debug:
+            return
         vd_text = str(int(verbose) * 10 + int(debug))
         self.outputqueue.put(vd_text + '|' + self.name + '|[' + self.name + '] ' + str(text))
 
     def read_configuration(self):
         """ Read the configuration file for what we need """
-        # Get the home net if we have one from the config
+        # Get the home networks if we have them from the config. It is False if there are none
         try:
-            self.home_net = ipaddress.ip_network(self.config.get('parameters', 'home_network'))
-        except (configparser.NoOptionError, configparser.NoSectionError, NameError):
-            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.home_net = read_home_networks(self.config)
+        except ValueError as inst:
+            self.print('Wrong home_network in the configuration: {}. Not using a home network.'.format(inst), 0, 1)
             self.home_net = False
 
         # Get the time window width, if it was not specified as a parameter
@@ -91,12 +136,49 @@ class ProfilerProcess(multiprocessing.Process):
             self.width = 300.0
         else:
             self.width = 300.0
+        # Aligned time windows: the TWs are the same intervals of time for all the profiles
+        try:
+            self.aligned_tws = self.config.get('parameters', 'aligned_time_windows') == 'yes'
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.aligned_tws = False
+        try:
+            self.tw_epoch = float(self.config.get('parameters', 'time_windows_epoch'))
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.tw_epoch = 0.0
         # Report the time window width
         if self.width == 9999999999:
             self.outputqueue.put("10|profiler|Time Windows Width used: Only 1 time windows. Dates in the names of files are 100 years in the past.".format(self.width))
         else:
             self.outputqueue.put("10|profiler|Time Windows Width used: {} seconds.".format(self.width))
 
+        # Maximum amount of letters of a tuple in a TW. 0 is no limit
+        try:
+            self.max_tuple_letters = int(self.config.get('parameters', 'max_tuple_letters'))
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.max_tuple_letters = 1000
+
+        # Seconds that the flows can arrive late and still be added to the profiles in order of time. 0 disables the buffer
+        try:
+            self.reorder_delay = float(self.config.get('parameters', 'reorder_buffer_seconds'))
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.reorder_delay = 5.0
+        # Maximum amount of flows waiting in the reorder buffer
+        try:
+            self.reorder_size = int(self.config.get('parameters', 'reorder_buffer_size'))
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.reorder_size = 100000
+        # Seconds after the end of a TW that we still wait for its flows before we publish that it is closed
+        try:
+            self.tw_close_grace = float(self.config.get('parameters', 'tw_close_grace_seconds'))
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.tw_close_grace = 60.0
+
         # Get the format of the time in the flows
         try:
             self.timeformat = self.config.get('timestamp', 'format')
@@ -126,14 +208,22 @@ class ProfilerProcess(multiprocessing.Process):
         Heuristic detection: dict (zeek from pcap of int), json (suricata), or csv (argus), or TAB separated (conn.log only from zeek)?
         Bro actually gives us json, but it was already coverted into a dict 
         in inputProcess
-        Outputs can be: zeek, suricata, argus, zeek-tabs
+        Outputs can be: zeek, suricata, argus, zeek-tabs, nfdump
+        When we know the type, its parser is created from the parsers registry
         """
         try:
             if type(line) == dict:
                 self.input_type = 'zeek'
+            elif line.startswith('#separator') or line.startswith('#fields'):
+                # The header of a Zeek log in TSV format
+                self.separator = '	'
+                self.input_type = 'zeek-tabs'
+            elif line.startswith('{') and SuricataEventFilter.get_event_type(line):
+                # Only suricata has event_type, so there is no need to decode the json
+                self.input_type = 'suricata'
             else:
                 try:
-                    data = json.loads(line)
+                    data = codec.loads(line)
                     if data['event_type'] == 'flow':
                         self.input_type = 'suricata'
                 except ValueError:
@@ -157,1024 +247,45 @@ class ProfilerProcess(multiprocessing.Process):
             self.print(str(type(inst)), 0, 1)
             self.print(str(inst), 0, 1)
             sys.exit(1)
-
-    def define_columns(self, line):
-        """ Define the columns for Argus and Zeek-tabs from the line received """
-        # These are the indexes for later fast processing
-        self.column_idx = {}
-        self.column_idx['starttime'] = False
-        self.column_idx['endtime'] = False
-        self.column_idx['dur'] = False
-        self.column_idx['proto'] = False
-        self.column_idx['appproto'] = False
-        self.column_idx['saddr'] = False
-        self.column_idx['sport'] = False
-        self.column_idx['dir'] = False
-        self.column_idx['daddr'] = False
-        self.column_idx['dport'] = False
-        self.column_idx['state'] = False
-        self.column_idx['pkts'] = False
-        self.column_idx['spkts'] = False
-        self.column_idx['dpkts'] = False
-        self.column_idx['bytes'] = False
-        self.column_idx['sbytes'] = False
-        self.column_idx['dbytes'] = False  
-
-        try:
-            nline = line.strip().split(self.separator)
-            for field in nline:
-                if 'time' in field.lower():
-                    self.column_idx['starttime'] = nline.index(field)
-                elif 'dur' in field.lower():
-                    self.column_idx['dur'] = nline.index(field)
-                elif 'proto' in field.lower():
-                    self.column_idx['proto'] = nline.index(field)
-                elif 'srca' in field.lower():
-                    self.column_idx['saddr'] = nline.index(field)
-                elif 'sport' in field.lower():
-                    self.column_idx['sport'] = nline.index(field)
-                elif 'dir' in field.lower():
-                    self.column_idx['dir'] = nline.index(field)
-                elif 'dsta' in field.lower():
-                    self.column_idx['daddr'] = nline.index(field)
-                elif 'dport' in field.lower():
-                    self.column_idx['dport'] = nline.index(field)
-                elif 'state' in field.lower():
-                    self.column_idx['state'] = nline.index(field)
-                elif 'totpkts' in field.lower():
-                    self.column_idx['pkts'] = nline.index(field)
-                elif 'totbytes' in field.lower():
-                    self.column_idx['bytes'] = nline.index(field)
-            # Some of the fields were not found probably, 
-            # so just delete them from the index if their value is False. 
-            # If not we will believe that we have data on them
-            # We need a temp dict because we can not change the size of dict while analyzing it
-            temp_dict = {}
-            for i in self.column_idx:
-                if type(self.column_idx[i]) == bool and self.column_idx[i] == False:
-                    continue
-                temp_dict[i] = self.column_idx[i]
-            self.column_idx = temp_dict
-        except Exception as inst:
-            self.print('\tProblem in define_columns()', 0, 1)
-            self.print(str(type(inst)), 0, 1)
-            self.print(str(inst), 0, 1)
-            sys.exit(1)
+        if self.input_type:
+            self.parser = parsers[self.input_type](self.get_time, self.separator)
 
     def define_time_format(self, time: str) -> str:
-        time_format: str = None
-        try:
-            # Try unix timestamp in seconds.
-            datetime.fromtimestamp(float(time))
-            time_format = 'unixtimestamp'
-        except ValueError:
-            try:
-                # Try the default time format for suricata.
-                datetime.strptime(time, '%Y-%m-%dT%H:%M:%S.%f%z')
-                time_format = '%Y-%m-%dT%H:%M:%S.%f%z'
-            except ValueError:
-                # Let's try the classic time format "'%Y-%m-%d %H:%M:%S.%f'"
-                try:
-                    datetime.strptime(time, '%Y-%m-%d %H:%M:%S.%f')
-                    time_format = '%Y-%m-%d %H:%M:%S.%f'
-                except ValueError:
-                    try:
-                        datetime.strptime(time, '%Y-%m-%d %H:%M:%S')
-                        time_format = '%Y-%m-%d %H:%M:%S'
-                    except ValueError:
-                        try:
-                            datetime.strptime(time, '%Y/%m/%d %H:%M:%S.%f')
-                            time_format = '%Y/%m/%d %H:%M:%S.%f'
-                        except ValueError:
-                            # We did not find the right time format.
-                            self.outputqueue.put("01|profiler|[Profile] We did not find right time format. Please set the time format in the configuration file.")
+        time_format = detect_time_format(time)
+        if time_format is None:
+            # We did not find the right time format.
+            self.outputqueue.put("01|profiler|[Profile] We did not find right time format. Please set the time format in the configuration file.")
         return time_format
 
-    def get_time(self, time: str) -> datetime:
+    def get_time(self, time: str) -> float:
         """
-        Take time in string and return datetime object.
+        Take time in string and return the seconds since the epoch.
         The format of time can be completely different. It can be seconds, or dates with specific formats.
         If user does not define the time format in configuration file, we have to try most frequent cases of time formats.
+        Returns None if the time is not valid
         """
 
         if not self.timeformat:
             # The time format was not defined from configuration file neither from last flows.
             self.timeformat = self.define_time_format(time)
 
-        defined_datetime: datetime = None
         if self.timeformat:
-            if self.timeformat == 'unixtimestamp':
-                # The format of time is in seconds.
-                defined_datetime = datetime.fromtimestamp(float(time))
-            else:
-                try:
-                    # The format of time is a complete date.
-                    defined_datetime = datetime.strptime(time, self.timeformat)
-                except ValueError:
-                    defined_datetime = None
+            if self.time_parser is None or self.time_parser.time_format != self.timeformat:
+                self.time_parser = TimestampParser(self.timeformat)
+            try:
+                return self.time_parser.parse(time)
+            except (ValueError, TypeError):
+                # There is suricata issue with invalid timestamp for examaple: "1900-01-00T00:00:08.511802+0000"
+                return None
         else:
             # We do not know the time format so we can not read it.
             self.outputqueue.put(
                 "01|profiler|[Profile] We did not find right time format. Please set the time format in the configuration file.")
+        return None
 
-        # if defined_datetime is None and self.timeformat:
-            # There is suricata issue with invalid timestamp for examaple: "1900-01-00T00:00:08.511802+0000"
-            # pass
-        return defined_datetime
-
-    def process_zeek_tabs_input(self, line: str) -> None:
-        """
-        Process the tab line from zeek.
-        """
-        line: str = line.rstrip()
-        line: list = line.split('\t')
-
-        # Generic fields in Zeek
-        self.column_values: dict = {}
-        # We need to set it to empty at the beginning so any new flow has the key 'type'
-        self.column_values['type'] = ''
-        try:
-            self.column_values['starttime'] = self.get_time(line[0])
-        except IndexError:
-            self.column_values['starttime'] = ''
-        try:
-            self.column_values['uid'] = line[1]
-        except IndexError:
-            self.column_values['uid'] = False
-        try:
-            self.column_values['saddr'] = line[2]
-        except IndexError:
-            self.column_values['saddr'] = ''
-        try:
-            self.column_values['daddr'] = line[4]
-        except IndexError:
-            self.column_values['daddr'] = ''
-
-        if 'conn' in line[-1]:
-            self.column_values['type'] = 'conn'
-            try:
-                self.column_values['dur'] = float(line[8])
-            except (IndexError, ValueError):
-                self.column_values['dur'] = 0
-            self.column_values['endtime'] = self.column_values['starttime'] + timedelta(
-                seconds=self.column_values['dur'])
-            self.column_values['proto'] = line[6]
-            try:
-                self.column_values['appproto'] = line[7]
-            except IndexError:
-                # no service recognized
-                self.column_values['appproto'] = ''
-            try:
-                self.column_values['sport'] = line[3]
-            except IndexError:
-                self.column_values['sport'] = ''
-            self.column_values['dir'] = '->'
-            try:
-                self.column_values['dport'] = line[5]
-            except IndexError:
-                self.column_values['dport'] = ''
-            try:
-                self.column_values['state'] = line[11]
-            except IndexError:
-                self.column_values['state'] = ''
-            try:
-                self.column_values['spkts'] = float(line[16])
-            except (IndexError, ValueError):
-                self.column_values['spkts'] = 0
-            try:
-                self.column_values['dpkts'] = float(line[18])
-            except (IndexError, ValueError):
-                self.column_values['dpkts'] = 0
-            self.column_values['pkts'] = self.column_values['spkts'] + self.column_values['dpkts']
-            try:
-                self.column_values['sbytes'] = float(line[9])
-            except (IndexError, ValueError):
-                self.column_values['sbytes'] = 0
-            try:
-                self.column_values['dbytes'] = float(line[10])
-            except (IndexError, ValueError):
-                self.column_values['dbytes'] = 0
-            self.column_values['bytes'] = self.column_values['sbytes'] + self.column_values['dbytes']
-            try:
-                self.column_values['state_hist'] = line[15]
-            except IndexError:
-                self.column_values['state_hist'] = self.column_values['state']
-            # We do not know the indexes of MACs.
-            self.column_values['smac'] = ''
-            self.column_values['dmac'] = ''
-        elif 'dns' in line[-1]:
-            self.column_values['type'] = 'dns'
-            try:
-                self.column_values['query'] = line[9]
-            except IndexError:
-                self.column_values['query'] = ''
-            try:
-                self.column_values['qclass_name'] = line[11]
-            except IndexError:
-                self.column_values['qclass_name'] = ''
-            try:
-                self.column_values['qtype_name'] = line[13]
-            except IndexError:
-                self.column_values['qtype_name'] = ''
-            try:
-                self.column_values['rcode_name'] = line[15]
-            except IndexError:
-                self.column_values['rcode_name'] = ''
-            try:
-                self.column_values['answers'] = line[21]
-            except IndexError:
-                self.column_values['answers'] = ''
-            try:
-                self.column_values['TTLs'] = line[22]
-            except IndexError:
-                self.column_values['TTLs'] = ''
-        elif 'http' in line[-1]:
-            self.column_values['type'] = 'http'
-            try:
-                self.column_values['method'] = line[7]
-            except IndexError:
-                self.column_values['method'] = ''
-            try:
-                self.column_values['host'] = line[8]
-            except IndexError:
-                self.column_values['host'] = ''
-            try:
-                self.column_values['uri'] = line[9]
-            except IndexError:
-                self.column_values['uri'] = ''
-            try:
-                self.column_values['httpversion'] = line[11]
-            except IndexError:
-                self.column_values['httpversion'] = ''
-            try:
-                self.column_values['user_agent'] = line[12]
-            except IndexError:
-                self.column_values['user_agent'] = ''
-            try:
-                self.column_values['request_body_len'] = line[13]
-            except IndexError:
-                self.column_values['request_body_len'] = 0
-            try:
-                self.column_values['response_body_len'] = line[14]
-            except IndexError:
-                self.column_values['response_body_len'] = 0
-            try:
-                self.column_values['status_code'] = line[15]
-            except IndexError:
-                self.column_values['status_code'] = ''
-            try:
-                self.column_values['status_msg'] = line[16]
-            except IndexError:
-                self.column_values['status_msg'] = ''
-            try:
-                self.column_values['resp_mime_types'] = line[28]
-            except IndexError:
-                self.column_values['resp_mime_types'] = ''
-            try:
-                self.column_values['resp_fuids'] = line[26]
-            except IndexError:
-                self.column_values['resp_fuids'] = ''
-        elif 'ssl' in line[-1]:
-            self.column_values['type'] = 'ssl'
-            try:
-                self.column_values['sslversion'] = line[6]
-            except IndexError:
-                self.column_values['sslversion'] = ''
-            try:
-                self.column_values['cipher'] = line[7]
-            except IndexError:
-                self.column_values['cipher'] = ''
-            try:
-                self.column_values['resumed'] = line[10]
-            except IndexError:
-                self.column_values['resumed'] = ''
-            try:
-                self.column_values['established'] = line[13]
-            except IndexError:
-                self.column_values['established'] = ''
-            try:
-                self.column_values['cert_chain_fuids'] = line[14]
-            except IndexError:
-                self.column_values['cert_chain_fuids'] = ''
-            try:
-                self.column_values['client_cert_chain_fuids'] = line[15]
-            except IndexError:
-                self.column_values['client_cert_chain_fuids'] = ''
-            try:
-                self.column_values['subject'] = line[16]
-            except IndexError:
-                self.column_values['subject'] = ''
-            try:
-                self.column_values['issuer'] = line[17]
-            except IndexError:
-                self.column_values['issuer'] = ''
-            self.column_values['validation_status'] = ''
-            try:
-                self.column_values['curve'] = line[8]
-            except IndexError:
-                self.column_values['curve'] = ''
-            try:
-                self.column_values['server_name'] = line[9]
-            except IndexError:
-                self.column_values['server_name'] = ''
-        elif 'ssh' in line[-1]:
-            self.column_values['type'] = 'ssh'
-        elif 'irc' in line[-1]:
-            self.column_values['type'] = 'irc'
-        elif 'long' in line[-1]:
-            self.column_values['type'] = 'long'
-        elif 'dhcp' in line[-1]:
-            self.column_values['type'] = 'dhcp'
-        elif 'dce_rpc' in line[-1]:
-            self.column_values['type'] = 'dce_rpc'
-        elif 'dnp3' in line[-1]:
-            self.column_values['type'] = 'dnp3'
-        elif 'ftp' in line[-1]:
-            self.column_values['type'] = 'ftp'
-        elif 'kerberos' in line[-1]:
-            self.column_values['type'] = 'kerberos'
-        elif 'mysql' in line[-1]:
-            self.column_values['type'] = 'mysql'
-        elif 'modbus' in line[-1]:
-            self.column_values['type'] = 'modbus'
-        elif 'ntlm' in line[-1]:
-            self.column_values['type'] = 'ntlm'
-        elif 'rdp' in line[-1]:
-            self.column_values['type'] = 'rdp'
-        elif 'sip' in line[-1]:
-            self.column_values['type'] = 'sip'
-        elif 'smb_cmd' in line[-1]:
-            self.column_values['type'] = 'smb_cmd'
-        elif 'smb_files' in line[-1]:
-            self.column_values['type'] = 'smb_files'
-        elif 'smb_mapping' in line[-1]:
-            self.column_values['type'] = 'smb_mapping'
-        elif 'smtp' in line[-1]:
-            self.column_values['type'] = 'smtp'
-        elif 'socks' in line[-1]:
-            self.column_values['type'] = 'socks'
-        elif 'syslog' in line[-1]:
-            self.column_values['type'] = 'syslog'
-        elif 'tunnel' in line[-1]:
-            self.column_values['type'] = 'tunnel'
-
-    def process_zeek_input(self, line):
-        """
-        Process the line and extract columns for zeek
-        Its a dictionary
-        """
-        # Generic fields in Zeek
-        self.column_values = {}
-        # We need to set it to empty at the beggining so any new flow has the key 'type'
-        self.column_values['type'] = ''
-        try:
-            self.column_values['starttime'] = self.get_time(line['ts'])
-        except KeyError:
-            self.column_values['starttime'] = ''
-        try:
-            self.column_values['uid'] = line['uid']
-        except KeyError:
-            self.column_values['uid'] = False
-        try:
-            self.column_values['saddr'] = line['id.orig_h']
-        except KeyError:
-            self.column_values['saddr'] = ''
-        try:
-            self.column_values['daddr'] = line['id.resp_h']
-        except KeyError:
-            self.column_values['daddr'] = ''
-
-        if 'conn' in line['type']:
-            # {'ts': 1538080852.403669, 'uid': 'Cewh6D2USNVtfcLxZe', 'id.orig_h': '192.168.2.12', 'id.orig_p': 56343, 'id.resp_h': '192.168.2.1', 'id.resp_p': 53, 'proto': 'udp', 'service': 'dns', 'duration': 0.008364, 'orig_bytes': 30, 'resp_bytes': 94, 'conn_state': 'SF', 'missed_bytes': 0, 'history': 'Dd', 'orig_pkts': 1, 'orig_ip_bytes': 58, 'resp_pkts': 1, 'resp_ip_bytes': 122, 'orig_l2_addr': 'b8:27:eb:6a:47:b8', 'resp_l2_addr': 'a6:d1:8c:1f:ce:64', 'type': './zeek_files/conn'}
-            self.column_values['type'] = 'conn'
-            try:
-                self.column_values['dur'] = float(line['duration'])
-            except KeyError:
-                self.column_values['dur'] = 0
-            self.column_values['endtime'] = self.column_values['starttime'] + timedelta(seconds=self.column_values['dur'])
-            self.column_values['proto'] = line['proto']
-            try:
-                self.column_values['appproto'] = line['service']
-            except KeyError:
-                # no service recognized
-                self.column_values['appproto'] = ''
-            try:
-                self.column_values['sport'] = line['id.orig_p']
-            except KeyError:
-                self.column_values['sport'] = ''
-            self.column_values['dir'] = '->'
-            try:
-                self.column_values['dport'] = line['id.resp_p']
-            except KeyError:
-                self.column_values['dport'] = ''
-            try:
-                self.column_values['state'] = line['conn_state']
-            except KeyError:
-                self.column_values['state'] = ''
-            try:
-                self.column_values['spkts'] = line['orig_pkts']
-            except KeyError:
-                self.column_values['spkts'] = 0
-            try:
-                self.column_values['dpkts'] = line['resp_pkts']
-            except KeyError:
-                self.column_values['dpkts'] = 0
-            self.column_values['pkts'] = self.column_values['spkts'] + self.column_values['dpkts']
-            try:
-                self.column_values['sbytes'] = line['orig_bytes']
-            except KeyError:
-                self.column_values['sbytes'] = 0
-            try:
-                self.column_values['dbytes'] = line['resp_bytes']
-            except KeyError:
-                self.column_values['dbytes'] = 0
-            self.column_values['bytes'] = self.column_values['sbytes'] + self.column_values['dbytes']
-            try:
-                self.column_values['state_hist'] = line['history']
-            except KeyError:
-                self.column_values['state_hist'] = self.column_values['state']
-            try:
-                self.column_values['smac'] = line['orig_l2_addr']
-            except KeyError:
-                self.column_values['smac'] = ''
-            try:
-                self.column_values['dmac'] = line['resp_l2_addr']
-            except KeyError:
-                self.column_values['dmac'] = ''
-        elif 'dns' in line['type']:
-            #{"ts":1538080852.403669,"uid":"CtahLT38vq7vKJVBC3","id.orig_h":"192.168.2.12","id.orig_p":56343,"id.resp_h":"192.168.2.1","id.resp_p":53,"proto":"udp","trans_id":2,"rtt":0.008364,"query":"pool.ntp.org","qclass":1,"qclass_name":"C_INTERNET","qtype":1,"qtype_name":"A","rcode":0,"rcode_name":"NOERROR","AA":false,"TC":false,"RD":true,"RA":true,"Z":0,"answers":["185.117.82.70","212.237.100.250","213.251.52.107","183.177.72.201"],"TTLs":[42.0,42.0,42.0,42.0],"rejected":false}
-            self.column_values['type'] = 'dns'
-            try:
-                self.column_values['query'] = line['query']
-            except KeyError:
-                self.column_values['query'] = ''
-            try:
-                self.column_values['qclass_name'] = line['qclass_name']
-            except KeyError:
-                self.column_values['qclass_name'] = ''
-            try:
-                self.column_values['qtype_name'] = line['qtype_name']
-            except KeyError:
-                self.column_values['qtype_name'] = ''
-            try:
-                self.column_values['rcode_name'] = line['rcode_name']
-            except KeyError:
-                self.column_values['rcode_name'] = ''
-            try:
-                self.column_values['answers'] = line['answers']
-            except KeyError:
-                self.column_values['answers'] = ''
-            try:
-                self.column_values['TTLs'] = line['TTLs']
-            except KeyError:
-                self.column_values['TTLs'] = ''
-        elif 'http' in line['type']:
-            # {"ts":158.957403,"uid":"CnNLbE2dyfy5KyqEhh","id.orig_h":"10.0.2.105","id.orig_p":49158,"id.resp_h":"64.182.208.181","id.resp_p":80,"trans_depth":1,"method":"GET","host":"icanhazip.com","uri":"/","version":"1.1","user_agent":"Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.38 (KHTML, like Gecko) Chrome/45.0.2456.99 Safari/537.38","request_body_len":0,"response_body_len":13,"status_code":200,"status_msg":"OK","tags":[],"resp_fuids":["FwraVxIOACcjkaGi3"],"resp_mime_types":["text/plain"]}
-            self.column_values['type'] = 'http'
-            try:
-                self.column_values['method'] = line['method']
-            except KeyError:
-                self.column_values['method'] = ''
-            try:
-                self.column_values['host'] = line['host']
-            except KeyError:
-                self.column_values['host'] = ''
-            try:
-                self.column_values['uri'] = line['uri']
-            except KeyError:
-                self.column_values['uri'] = ''
-            try:
-                self.column_values['httpversion'] = line['version']
-            except KeyError:
-                self.column_values['httpversion'] = ''
-            try:
-                self.column_values['user_agent'] = line['user_agent']
-            except KeyError:
-                self.column_values['user_agent'] = ''
-            try:
-                self.column_values['request_body_len'] = line['request_body_len']
-            except KeyError:
-                self.column_values['request_body_len'] = 0
-            try:
-                self.column_values['response_body_len'] = line['response_body_len']
-            except KeyError:
-                self.column_values['response_body_len'] = 0
-            try:
-                self.column_values['status_code'] = line['status_code']
-            except KeyError:
-                self.column_values['status_code'] = ''
-            try:
-                self.column_values['status_msg'] = line['status_msg']
-            except KeyError:
-                self.column_values['status_msg'] = ''
-            try:
-                self.column_values['resp_mime_types'] = line['resp_mime_types']
-            except KeyError:
-                self.column_values['resp_mime_types'] = ''
-            try:
-                self.column_values['resp_fuids'] = line['resp_fuids']
-            except KeyError:
-                self.column_values['resp_fuids'] = ''
-        elif 'ssl' in line['type']:
-            # {"ts":12087.045499,"uid":"CdoFDp4iW79I5ZmsT7","id.orig_h":"10.0.2.105","id.orig_p":49704,"id.resp_h":"195.211.240.166","id.resp_p":443,"version":"SSLv3","cipher":"TLS_RSA_WITH_RC4_128_SHA","resumed":false,"established":true,"cert_chain_fuids":["FhGp1L3yZXuURiPqq7"],"client_cert_chain_fuids":[],"subject":"OU=DAHUATECH,O=DAHUA,L=HANGZHOU,ST=ZHEJIANG,C=CN,CN=192.168.1.108","issuer":"O=DahuaTech,L=HangZhou,ST=ZheJiang,C=CN,CN=Product Root CA","validation_status":"unable to get local issuer certificate"}
-            # {"ts":1382354909.915615,"uid":"C7W6ZA4vI8FxJ9J0bh","id.orig_h":"147.32.83.53","id.orig_p":36567,"id.resp_h":"195.113.214.241","id.resp_p":443,"version":"TLSv12","cipher":"TLS_ECDHE_ECDSA_WITH_RC4_128_SHA","curve":"secp256r1","server_name":"id.google.com.ar","resumed":false,"established":true,"cert_chain_fuids":["FnomJz1vghKIOHtytf","FSvQff1KsaDkRtKXo4","Fif2PF48bytqq6xMDb"],"client_cert_chain_fuids":[],"subject":"CN=*.google.com,O=Google Inc,L=Mountain View,ST=California,C=US","issuer":"CN=Google Internet Authority G2,O=Google Inc,C=US","validation_status":"ok"}
-            self.column_values['type'] = 'ssl'
-            try:
-                self.column_values['sslversion'] = line['version']
-            except KeyError:
-                self.column_values['sslversion'] = ''
-            try:
-                self.column_values['cipher'] = line['cipher']
-            except KeyError:
-                self.column_values['cipher'] = ''
-            try:
-                self.column_values['resumed'] = line['resumed']
-            except KeyError:
-                self.column_values['resumed'] = ''
-            try:
-                self.column_values['established'] = line['established']
-            except KeyError:
-                self.column_values['established'] = ''
-            try:
-                self.column_values['cert_chain_fuids'] = line['cert_chain_fuids']
-            except KeyError:
-                self.column_values['cert_chain_fuids'] = ''
-            try:
-                self.column_values['client_cert_chain_fuids'] = line['client_cert_chain_fuids']
-            except KeyError:
-                self.column_values['client_cert_chain_fuids'] = ''
-            try:
-                self.column_values['subject'] = line['subject']
-            except KeyError:
-                self.column_values['subject'] = ''
-            try:
-                self.column_values['issuer'] = line['issuer']
-            except KeyError:
-                self.column_values['issuer'] = ''
-            try:
-                self.column_values['validation_status'] = line['validation_status']
-            except KeyError:
-                self.column_values['validation_status'] = ''
-            try:
-                self.column_values['curve'] = line['curve']
-            except KeyError:
-                self.column_values['curve'] = ''
-            try:
-                self.column_values['server_name'] = line['server_name']
-            except KeyError:
-                self.column_values['server_name'] = ''
-        elif 'ssh' in line['type']:
-            self.column_values['type'] = 'ssh'
-        elif 'irc' in line['type']:
-            self.column_values['type'] = 'irc'
-        elif 'long' in line['type']:
-            self.column_values['type'] = 'long'
-        elif 'dhcp' in line['type']:
-            self.column_values['type'] = 'dhcp'
-        elif 'dce_rpc' in line['type']:
-            self.column_values['type'] = 'dce_rpc'
-        elif 'dnp3' in line['type']:
-            self.column_values['type'] = 'dnp3'
-        elif 'ftp' in line['type']:
-            self.column_values['type'] = 'ftp'
-        elif 'kerberos' in line['type']:
-            self.column_values['type'] = 'kerberos'
-        elif 'mysql' in line['type']:
-            self.column_values['type'] = 'mysql'
-        elif 'modbus' in line['type']:
-            self.column_values['type'] = 'modbus'
-        elif 'ntlm' in line['type']:
-            self.column_values['type'] = 'ntlm'
-        elif 'rdp' in line['type']:
-            self.column_values['type'] = 'rdp'
-        elif 'sip' in line['type']:
-            self.column_values['type'] = 'sip'
-        elif 'smb_cmd' in line['type']:
-            self.column_values['type'] = 'smb_cmd'
-        elif 'smb_files' in line['type']:
-            self.column_values['type'] = 'smb_files'
-        elif 'smb_mapping' in line['type']:
-            self.column_values['type'] = 'smb_mapping'
-        elif 'smtp' in line['type']:
-            self.column_values['type'] = 'smtp'
-        elif 'socks' in line['type']:
-            self.column_values['type'] = 'socks'
-        elif 'syslog' in line['type']:
-            self.column_values['type'] = 'syslog'
-        elif 'tunnel' in line['type']:
-            self.column_values['type'] = 'tunnel'
-
-    def process_argus_input(self, line):
-        """
-        Process the line and extract columns for argus
-        """
-        self.column_values = {}
-        self.column_values['starttime'] = False
-        self.column_values['endtime'] = False
-        self.column_values['dur'] = False
-        self.column_values['proto'] = False
-        self.column_values['appproto'] = False
-        self.column_values['saddr'] = False
-        self.column_values['sport'] = False
-        self.column_values['dir'] = False
-        self.column_values['daddr'] = False
-        self.column_values['dport'] = False
-        self.column_values['state'] = False
-        self.column_values['pkts'] = False
-        self.column_values['spkts'] = False
-        self.column_values['dpkts'] = False
-        self.column_values['bytes'] = False
-        self.column_values['sbytes'] = False
-        self.column_values['dbytes'] = False
-        self.column_values['type'] = 'argus'
-
-        # Read the lines fast
-        nline = line.strip().split(self.separator)
-        try:
-            self.column_values['starttime'] = self.get_time(nline[self.column_idx['starttime']])
-        except KeyError:
-            pass
-        try:
-            self.column_values['endtime'] = nline[self.column_idx['endtime']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['dur'] = nline[self.column_idx['dur']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['proto'] = nline[self.column_idx['proto']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['appproto'] = nline[self.column_idx['appproto']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['saddr'] = nline[self.column_idx['saddr']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['sport'] = nline[self.column_idx['sport']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['dir'] = nline[self.column_idx['dir']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['daddr'] = nline[self.column_idx['daddr']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['dport'] = nline[self.column_idx['dport']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['state'] = nline[self.column_idx['state']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['pkts'] = nline[self.column_idx['pkts']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['spkts'] = nline[self.column_idx['spkts']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['dpkts'] = nline[self.column_idx['dpkts']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['bytes'] = nline[self.column_idx['bytes']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['sbytes'] = nline[self.column_idx['sbytes']]
-        except KeyError:
-            pass
-        try:
-            self.column_values['dbytes'] = nline[self.column_idx['dbytes']]
-        except KeyError:
-            pass
-
-    def process_nfdump_input(self, line):
-        """
-        Process the line and extract columns for argus
-        """
-        self.column_values = {}
-        self.column_values['starttime'] = False
-        self.column_values['endtime'] = False
-        self.column_values['dur'] = False
-        self.column_values['proto'] = False
-        self.column_values['appproto'] = False
-        self.column_values['saddr'] = False
-        self.column_values['sport'] = False
-        self.column_values['dir'] = False
-        self.column_values['daddr'] = False
-        self.column_values['dport'] = False
-        self.column_values['state'] = False
-        self.column_values['pkts'] = False
-        self.column_values['spkts'] = False
-        self.column_values['dpkts'] = False
-        self.column_values['bytes'] = False
-        self.column_values['sbytes'] = False
-        self.column_values['dbytes'] = False
-        self.column_values['type'] = 'argus'
-
-        # Read the lines fast
-        nline = line.strip().split(self.separator)
-        try:
-            self.column_values['starttime'] = self.get_time(nline[0])
-        except IndexError:
-            pass
-        try:
-            self.column_values['endtime'] = self.get_time(nline[1])
-        except IndexError:
-            pass
-        try:
-            self.column_values['dur'] = nline[2]
-        except IndexError:
-            pass
-        try:
-            self.column_values['proto'] = nline[7]
-        except IndexError:
-            pass
-        try:
-            self.column_values['saddr'] = nline[3]
-        except IndexError:
-            pass
-        try:
-            self.column_values['sport'] = nline[5]
-        except IndexError:
-            pass
-        try:
-            # Direction: ingress=0, egress=1
-            self.column_values['dir'] = nline[22]
-        except IndexError:
-            pass
-        try:
-            self.column_values['daddr'] = nline[4]
-        except IndexError:
-            pass
-        try:
-            self.column_values['dport'] = nline[6]
-        except IndexError:
-            pass
-        try:
-            self.column_values['state'] = nline[8]
-        except IndexError:
-            pass
-        try:
-            self.column_values['spkts'] = nline[11]
-        except IndexError:
-            pass
-        try:
-            self.column_values['dpkts'] = nline[13]
-        except IndexError:
-            pass
-        try:
-            self.column_values['pkts'] = self.column_values['spkts'] + self.column_values['dpkts']
-        except IndexError:
-            pass
-        try:
-            self.column_values['sbytes'] = nline[12]
-        except IndexError:
-            pass
-        try:
-            self.column_values['dbytes'] = nline[14]
-        except IndexError:
-            pass
-        try:
-            self.column_values['bytes'] = self.column_values['sbytes'] + self.column_values['dbytes']
-        except IndexError:
-            pass
-
-    def process_suricata_input(self, line: str) -> None:
-        """ Read suricata json input """
-        line = json.loads(line)
-
-        self.column_values: dict = {}
-        try:
-            self.column_values['starttime'] = self.get_time(line['timestamp'])
-        # except (KeyError, ValueError):
-        except ValueError:
-            # Reason for catching ValueError:
-            # "ValueError: time data '1900-01-00T00:00:08.511802+0000' does not match format '%Y-%m-%dT%H:%M:%S.%f%z'"
-            # It means some flow do not have valid timestamp. It seems to me if suricata does not know the timestamp, it put
-            # there this not valid time.
-            self.column_values['starttime'] = False
-        self.column_values['endtime'] = False
-        self.column_values['dur'] = 0
-        try:
-            self.column_values['flow_id'] = line['flow_id']
-        except KeyError:
-            self.column_values['flow_id'] = False
-        try:
-            self.column_values['saddr'] = line['src_ip']
-        except KeyError:
-            self.column_values['saddr'] = False
-        try:
-            self.column_values['sport'] = line['src_port']
-        except KeyError:
-            self.column_values['sport'] = False
-        try:
-            self.column_values['daddr'] = line['dest_ip']
-        except KeyError:
-            self.column_values['daddr'] = False
-        try:
-            self.column_values['dport'] = line['dest_port']
-        except KeyError:
-            self.column_values['dport'] = False
-        try:
-            self.column_values['proto'] = line['proto']
-        except KeyError:
-            self.column_values['proto'] = False
-        try:
-            self.column_values['type'] = line['event_type']
-        except KeyError:
-            self.column_values['type'] = False
-        self.column_values['dir'] = '->'
-        try:
-            self.column_values['appproto'] = line['app_proto']
-        except KeyError:
-            self.column_values['appproto'] = False
-
-        if self.column_values['type']:
-            """
-            event_type: 
-            -flow
-            -tls
-            -http
-            -dns
-            -alert
-            -fileinfo
-            -stats (only one line - it is conclusion of entire capture)
-            """
-            if self.column_values['type'] == 'flow':
-                # A suricata line of flow type usually has 2 components.
-                # 1. flow information
-                # 2. tcp information
-                if line.get('flow', None):
-                    try:
-                        # Define time again, because this is line of flow type and
-                        # we do not want timestamp but start time.
-                        self.column_values['starttime'] = self.get_time(line['flow']['start'])
-                    except KeyError:
-                        self.column_values['starttime'] = False
-                    try:
-                        self.column_values['endtime'] = self.get_time(line['flow']['end'])
-                    except KeyError:
-                        self.column_values['endtime'] = False
-
-                    try:
-                        self.column_values['dur'] = (
-                            self.column_values['endtime'] - self.column_values['starttime']).total_seconds()
-                    except (KeyError, TypeError):
-                        self.column_values['dur'] = 0
-                    try:
-                        self.column_values['spkts'] = line['flow']['pkts_toserver']
-                    except KeyError:
-                        self.column_values['spkts'] = 0
-                    try:
-                        self.column_values['dpkts'] = line['flow']['pkts_toclient']
-                    except KeyError:
-                        self.column_values['dpkts'] = 0
-
-                    self.column_values['pkts'] = self.column_values['dpkts'] + self.column_values['spkts']
-
-                    try:
-                        self.column_values['sbytes'] = line['flow']['bytes_toserver']
-                    except KeyError:
-                        self.column_values['sbytes'] = 0
-
-                    try:
-                        self.column_values['dbytes'] = line['flow']['bytes_toclient']
-                    except KeyError:
-                        self.column_values['dbytes'] = 0
-
-                    self.column_values['bytes'] = self.column_values['dbytes'] + self.column_values['sbytes']
-
-                    try:
-                        """
-                        There are different states in which a flow can be. 
-                        Suricata distinguishes three flow-states for TCP and two for UDP. For TCP, 
-                        these are: New, Established and Closed,for UDP only new and established.
-                        For each of these states Suricata can employ different timeouts. 
-                        """
-                        self.column_values['state'] = line['flow']['state']
-                    except KeyError:
-                        self.column_values['state'] = ''
-            elif self.column_values['type'] == 'http':
-                if line.get('http', None):
-                    try:
-                        self.column_values['method'] = line['http']['http_method']
-                    except KeyError:
-                        self.column_values['method'] = ''
-                    try:
-                        self.column_values['host'] = line['http']['hostname']
-                    except KeyError:
-                        self.column_values['host'] = ''
-                    try:
-                        self.column_values['uri'] = line['http']['url']
-                    except KeyError:
-                        self.column_values['uri'] = ''
-                    try:
-                        self.column_values['user_agent'] = line['http']['http_user_agent']
-                    except KeyError:
-                        self.column_values['user_agent'] = ''
-                    try:
-                        self.column_values['status_code'] = line['http']['status']
-                    except KeyError:
-                        self.column_values['status_code'] = ''
-                    try:
-                        self.column_values['httpversion'] = line['http']['protocol']
-                    except KeyError:
-                        self.column_values['httpversion'] = ''
-                    try:
-                        self.column_values['response_body_len'] = line['http']['length']
-                    except KeyError:
-                        self.column_values['response_body_len'] = 0
-                    try:
-                        self.column_values['request_body_len'] = line['http']['request_body_len']
-                    except KeyError:
-                        self.column_values['request_body_len'] = 0
-                    self.column_values['status_msg'] = ''
-                    self.column_values['resp_mime_types'] = ''
-                    self.column_values['resp_fuids'] = ''
-
-            elif self.column_values['type'] == 'dns':
-                if line.get('dns', None):
-                    try:
-                        self.column_values['query'] = line['dns']['rdata']
-                    except KeyError:
-                        self.column_values['query'] = ''
-                    try:
-                        self.column_values['TTLs'] = line['dns']['ttl']
-                    except KeyError:
-                        self.column_values['TTLs'] = ''
-
-                    try:
-                        self.column_values['qtype_name'] = line['dns']['rrtype']
-                    except KeyError:
-                        self.column_values['qtype_name'] = ''
-
-                    # can not find in eve.json:
-                    self.column_values['qclass_name'] = ''
-                    self.column_values['rcode_name'] = ''
-                    self.column_values['answers'] = ''
-
-
-            elif self.column_values['type'] == 'tls':
-                if line.get('tls', None):
-                    try:
-                        self.column_values['sslversion'] = line['tls']['version']
-                    except KeyError:
-                        self.column_values['sslversion'] = ''
-                    try:
-                        self.column_values['subject'] = line['tls']['subject']
-                    except KeyError:
-                        self.column_values['subject'] = ''
-                    try:
-                        self.column_values['issuer'] = line['tls']['issuerdn']
-                    except KeyError:
-                        self.column_values['issuer'] = ''
-                    try:
-                        self.column_values['server_name'] = line['tls']['sni']
-                    except KeyError:
-                        self.column_values['server_name'] = ''
-
-                    try:
-                        self.column_values['notbefore'] = datetime.strptime((line['tls']['notbefore']), '%Y-%m-%dT%H:%M:%S')
-                    except KeyError:
-                        self.column_values['notbefore'] = ''
-
-                    try:
-                        self.column_values['notafter'] = datetime.strptime((line['tls']['notafter']), '%Y-%m-%dT%H:%M:%S')
-                    except KeyError:
-                        self.column_values['notafter'] = ''
-            elif self.column_values['type'] == 'alert':
-                if line.get('alert', None):
-                    try:
-                        self.column_values['signature'] = line['alert']['signature']
-                    except KeyError:
-                        self.column_values['signature'] = ''
-                    try:
-                        self.column_values['category'] = line['alert']['category']
-                    except KeyError:
-                        self.column_values['category'] = ''
-                    try:
-                        self.column_values['severity'] = line['alert']['severity']
-                    except KeyError:
-                        self.column_values['severity'] = ''
-            elif self.column_values['type'] == 'fileinfo':
-                try:
-                    self.column_values['filesize'] = line['fileinfo']['size']
-                except KeyError:
-                    self.column_values['filesize'] = ''
-
-
+    def owns(self, ip: str) -> bool:
+        """ Return True if the profile of this IP belongs to this profiler """
+        return self.profilers == 1 or get_shard(ip, self.profilers) == self.profiler_id
 
     def add_flow_to_profile(self):
         """ 
@@ -1183,150 +294,110 @@ class ProfilerProcess(multiprocessing.Process):
         It interprets each colum 
         """
         try:
-            # For now we only process the argus flows and the zeek conn logs
-            if not self.column_values:
+            flow = self.flow
+            # For now we only process the argus flows and the zeek conn, dns, http and ssl logs
+            if not flow:
                 return True
-            elif not 'ssl' in self.column_values['type'] and not 'http' in self.column_values['type'] and not 'dns' in self.column_values['type'] and not 'conn' in self.column_values['type'] and not 'flow' in self.column_values['type'] and not 'argus' in self.column_values['type']:
+            elif flow.type not in profiled_flow_types:
                 return True
-            elif self.column_values['starttime'] is None:
+            elif type(flow.starttime) != float:
                 # There is suricata issue with invalid timestamp for examaple: "1900-01-00T00:00:08.511802+0000"
                 return True
+            # Close the TWs that ended before this flow
+            self.close_timewindows(flow.starttime)
 
             # The first change we should do is to take into account different types of flows. A normal netflow is what we have now, but we need all
             # the zeek type of flows. So we need to adapt all the database?
 
             #########
-            # 1st. Get the data from the interpreted columns
+            # 1st. Get the data from the flow record
             separator = __database__.getFieldSeparator()
             # These are common to all types of flows
-            # No, older zeek has seconds instead of date.
-            try:
-                # seconds.
-                starttime = self.column_values['starttime'].timestamp()
-            except ValueError:
-                # date
-                try:
-                    # This file format is very extended, but we should consider more options. Maybe we should detect the time format.
-                    # Some times if there is no microseconds, the datatime object just give us '2018-12-18 14:00:00' instead of '2018-12-18 14:00:00.000000' so the format fails
-                    try:
-                        date_time = datetime.strptime(str(self.column_values['starttime']), '%Y-%m-%d %H:%M:%S.%f')
-                    except ValueError:
-                        date_time = datetime.strptime(str(self.column_values['starttime']) + '.000000', '%Y-%m-%d %H:%M:%S.%f')
-                    starttime = date_time.timestamp()
-                except ValueError as e:
-                    self.print("We can not recognize time format.", 0, 1)
-                    self.print("{}".format((type(e))), 0, 1)
+            # The time of the flow in seconds. get_time() already converted it from the format of the input
+            starttime = flow.starttime
 
             # This uid check is for when we read things that are not zeek
-            try:
-                uid = self.column_values['uid']
-            except KeyError:
+            uid = flow.uid
+            if not uid:
                 # In the case of other tools that are not Zeek, there is no UID. So we generate a new one here
                 # Zeeks uses human-readable strings in Base62 format, from 112 bits usually. We do base64 with some bits just because we need a fast unique way
                 uid = base64.b64encode(binascii.b2a_hex(os.urandom(9))).decode('utf-8')
-            flow_type = self.column_values['type']
-            saddr = self.column_values['saddr']
-            daddr = self.column_values['daddr']
+            flow_type = flow.type
+            saddr = flow.saddr
+            daddr = flow.daddr
             profileid = 'profile' + separator + str(saddr)
-
-            if 'flow' in flow_type or 'conn' in flow_type or 'argus' in flow_type:
-                dur = self.column_values['dur']
-                sport = self.column_values['sport']
-                dport = self.column_values['dport']
-                sport = self.column_values['sport']
-                proto = self.column_values['proto']
-                state = self.column_values['state']
-                pkts = self.column_values['pkts']
-                allbytes = self.column_values['bytes']
-                spkts = self.column_values['spkts']
-                sbytes = self.column_values['sbytes']
-                endtime = self.column_values['endtime']
-                appproto = self.column_values['appproto']
-                direction = self.column_values['dir']
-                dpkts = self.column_values['dpkts']
-                dbytes = self.column_values['dbytes']
-
-            elif 'dns' in flow_type:
-                query = self.column_values['query']
-                qclass_name = self.column_values['qclass_name']
-                qtype_name = self.column_values['qtype_name']
-                rcode_name = self.column_values['rcode_name']
-                answers = self.column_values['answers']
-                ttls = self.column_values['TTLs']
-
-            # Create the objects of IPs
-            try:
-                saddr_as_obj = ipaddress.IPv4Address(saddr)
-                daddr_as_obj = ipaddress.IPv4Address(daddr)
-                # Is ipv4
-            except ipaddress.AddressValueError:
-                # Is it ipv6?
-                try:
-                    saddr_as_obj = ipaddress.IPv6Address(saddr)
-                    daddr_as_obj = ipaddress.IPv6Address(daddr)
-                except ipaddress.AddressValueError:
-                    # Its a mac
-                    return False
+            # Flows with the traffic between the IPs, that have tuples, ports and letters
+            is_conn = isinstance(flow, ConnFlow)
+
+            # Classify the IPs. Both should be ipv4 or both ipv6
+            saddr_info = self.ip_classifier.classify(saddr)
+            daddr_info = self.ip_classifier.classify(daddr)
+            if not saddr_info or not daddr_info or saddr_info.version != daddr_info.version:
+                # Its a mac
+                return False
+            saddr_ip = saddr_info.ip
+            daddr_ip = daddr_info.ip
+            saddr_in_home = saddr_info.in_home
+            daddr_in_home = daddr_info.in_home
 
             ##############
             # For Adding the profile only now
 
             # 2nd. Check home network
             # Check if the ip received (src_ip) is part of our home network. We only crate profiles for our home network
-            if self.home_net and saddr_as_obj in self.home_net:
+            # With several profilers, only store the data of the profiles that this profiler owns.
+            # The input process sends the flow to the profilers of both IPs, so the profile of each IP is created by its
+            # owner as if there was only one profiler
+            owns_src = self.owns(saddr)
+            owns_dst = self.owns(daddr)
+
+            if self.home_net and saddr_in_home:
                 # Its in our Home network
+                if not owns_src:
+                    return True
 
                 # The steps for adding a flow in a profile should be
                 # 1. Add the profile to the DB. If it already exists, nothing happens. So now profileid is the id of the profile to work with.
                 # The width is unique for all the timewindow in this profile.
                 # Also we only need to pass the width for registration in the DB. Nothing operational
-                __database__.addProfile(profileid, starttime, self.width)
+                self.add_profile(profileid, starttime)
 
                 # 3. For this profile, find the id in the database of the tw where the flow belongs.
                 twid = self.get_timewindow(starttime, profileid)
 
-            elif self.home_net and saddr_as_obj not in self.home_net:
+            elif self.home_net and not saddr_in_home:
                 # The src ip is not in our home net
 
                 # Check that the dst IP is in our home net. Like the flow is 'going' to it.
-                if daddr_as_obj in self.home_net:
-                    self.print("Flow with dstip in homenet: srcip {}, dstip {}".format(saddr_as_obj, daddr_as_obj), 0, 7)
+                if daddr_in_home:
+                    if not owns_dst:
+                        return True
+                    self.print("Flow with dstip in homenet: srcip {}, dstip {}".format(saddr_ip, daddr_ip), 0, 7)
                     # The dst ip is in the home net. So register this as going to it
-                    # 1. Get the profile of the dst ip.
-                    rev_profileid = __database__.getProfileIdFromIP(daddr_as_obj)
-                    if not rev_profileid:
-                        # We do not have yet the profile of the dst ip that is in our home net
-                        self.print("The dstip profile was not here... create", 0, 7)
-                        # Create a reverse profileid for managing the data going to the dstip.
-                        # With the rev_profileid we can now work with data in relation to the dst ip
-                        rev_profileid = 'profile' + separator + str(daddr_as_obj)
-                        __database__.addProfile(rev_profileid, starttime, self.width)
-                        # Try again
-                        rev_profileid = __database__.getProfileIdFromIP(daddr_as_obj)
-                        # For the profile to the dstip, find the id in the database of the tw where the flow belongs.
-                        rev_twid = self.get_timewindow(starttime, rev_profileid)
-                        if not rev_profileid:
-                            # Too many errors. We should not be here
-                            return False
-                    self.print("Profile for dstip {} : {}".format(daddr_as_obj, profileid), 0, 7)
+                    # 1. Get the profile of the dst ip, and create it if we do not have it yet.
+                    # With the rev_profileid we can now work with data in relation to the dst ip
+                    rev_profileid = 'profile' + separator + daddr_ip
+                    self.add_profile(rev_profileid, starttime)
+                    self.print("Profile for dstip {} : {}".format(daddr_ip, rev_profileid), 0, 7)
                     # 2. For this profile, find the id in the databse of the tw where the flow belongs.
-                    rev_twid = self.get_timewindow(starttime, profileid)
-                elif daddr_as_obj not in self.home_net:
+                    rev_twid = self.get_timewindow(starttime, rev_profileid)
+                elif not daddr_in_home:
                     # The dst ip is also not part of our home net. So ignore completely
                     return False
             elif not self.home_net:
                 # We don't have a home net, so create profiles for everyone
 
                 # Add the profile for the srcip to the DB. If it already exists, nothing happens. So now profileid is the id of the profile to work with.
-                __database__.addProfile(profileid, starttime, self.width)
                 # Add the profile for the dstip to the DB. If it already exists, nothing happens. So now rev_profileid is the id of the profile to work with. 
-                rev_profileid = 'profile' + separator + str(daddr_as_obj)
-                __database__.addProfile(rev_profileid, starttime, self.width)
-
-                # For the profile from the srcip , find the id in the database of the tw where the flow belongs.
-                twid = self.get_timewindow(starttime, profileid)
-                # For the profile to the dstip, find the id in the database of the tw where the flow belongs.
-                rev_twid = self.get_timewindow(starttime, rev_profileid)
+                rev_profileid = 'profile' + separator + daddr_ip
+                if owns_src:
+                    self.add_profile(profileid, starttime)
+                    # For the profile from the srcip , find the id in the database of the tw where the flow belongs.
+                    twid = self.get_timewindow(starttime, profileid)
+                if owns_dst:
+                    self.add_profile(rev_profileid, starttime)
+                    # For the profile to the dstip, find the id in the database of the tw where the flow belongs.
+                    rev_twid = self.get_timewindow(starttime, rev_profileid)
 
             ##############
             # 4th Define help functions for storing data
@@ -1334,54 +405,56 @@ class ProfilerProcess(multiprocessing.Process):
                 """
                 This is an internal function in the add_flow_to_profile function for adding the features going out of the profile
                 """
+                self.count_flow_in_timewindow(profileid, twid, flow)
                 role = 'Client'
-                if 'flow' in flow_type or 'conn' in flow_type or 'argus' in flow_type:
+                if is_conn:
                     # Tuple
-                    tupleid = str(daddr_as_obj) + ':' + str(dport) + ':' + proto
+                    tupleid = daddr_ip + ':' + str(flow.dport) + ':' + flow.proto
                     # Compute the symbol for this flow, for this TW, for this profile. The symbol is based on the 'letters' of the original Startosphere ips tool
-                    symbol = self.compute_symbol(profileid, twid, tupleid, starttime, dur, allbytes, tuple_key='OutTuples')
+                    symbol = self.compute_symbol(profileid, twid, tupleid, starttime, flow.dur, flow.bytes, tuple_key='OutTuples')
                     # Change symbol for its internal data. Symbol is a tuple and is confusing if we ever change the API
                     # Add the out tuple
-                    __database__.add_tuple(profileid, twid, tupleid, symbol, role)
+                    self.add_tuple(profileid, twid, tupleid, symbol, 'OutTuples')
                     # Add the dstip
-                    __database__.add_ips(profileid, twid, daddr_as_obj, self.column_values, role)
+                    __database__.add_ips(profileid, twid, daddr_ip, flow, role)
                     # Add the dstport
                     port_type = 'Dst'
-                    __database__.add_port(profileid, twid, daddr_as_obj, self.column_values, role, port_type)
+                    __database__.add_port(profileid, twid, daddr_ip, flow, role, port_type)
                     # Add the srcport
                     port_type = 'Src'
-                    __database__.add_port(profileid, twid, daddr_as_obj, self.column_values, role, port_type)
+                    __database__.add_port(profileid, twid, daddr_ip, flow, role, port_type)
                     # Add the flow with all the fields interpreted
-                    __database__.add_flow(profileid=profileid, twid=twid, stime=starttime, dur=dur, saddr=str(saddr_as_obj), sport=sport, daddr=str(daddr_as_obj), dport=dport, proto=proto, state=state, pkts=pkts, allbytes=allbytes, spkts=spkts, sbytes=sbytes, appproto=appproto, uid=uid, label=self.label)
-                elif 'dns' in flow_type:
-                    __database__.add_out_dns(profileid, twid, flow_type, uid, query, qclass_name, qtype_name, rcode_name, answers, ttls)
+                    __database__.add_flow(profileid, twid, flow, saddr_ip, daddr_ip, uid, self.label)
+                elif flow_type == 'dns':
+                    __database__.add_out_dns(profileid, twid, uid, flow)
                 elif flow_type == 'http':
-                    __database__.add_out_http(profileid, twid, flow_type, uid, self.column_values['method'], self.column_values['host'], self.column_values['uri'], self.column_values['httpversion'], self.column_values['user_agent'], self.column_values['request_body_len'], self.column_values['response_body_len'], self.column_values['status_code'], self.column_values['status_msg'], self.column_values['resp_mime_types'], self.column_values['resp_fuids'])
+                    __database__.add_out_http(profileid, twid, uid, flow)
                 elif flow_type == 'ssl':
-                    __database__.add_out_ssl(profileid, twid, flow_type, uid, self.column_values['sslversion'], self.column_values['cipher'], self.column_values['resumed'], self.column_values['established'], self.column_values['cert_chain_fuids'], self.column_values['client_cert_chain_fuids'], self.column_values['subject'], self.column_values['issuer'], self.column_values['validation_status'], self.column_values['curve'], self.column_values['server_name'])
+                    __database__.add_out_ssl(profileid, twid, uid, flow)
 
             def store_features_going_in(profileid, twid):
                 """
                 This is an internal function in the add_flow_to_profile function for adding the features going in of the profile
                 """
+                self.count_flow_in_timewindow(profileid, twid, flow)
                 role = 'Server'
-                if 'flow' in flow_type or 'conn' in flow_type or 'argus' in flow_type:
+                if is_conn:
                     # Tuple
-                    tupleid = str(saddr_as_obj) + ':' + str(sport) + ':' + proto
+                    tupleid = saddr_ip + ':' + str(flow.sport) + ':' + flow.proto
                     # Compute symbols.
-                    symbol = self.compute_symbol(profileid, twid, tupleid, starttime, dur, allbytes, tuple_key='InTuples')
+                    symbol = self.compute_symbol(profileid, twid, tupleid, starttime, flow.dur, flow.bytes, tuple_key='InTuples')
                     # Add the src tuple
-                    __database__.add_tuple(profileid, twid, tupleid, symbol, role)
+                    self.add_tuple(profileid, twid, tupleid, symbol, 'InTuples')
                     # Add the srcip
-                    __database__.add_ips(profileid, twid, saddr_as_obj, self.column_values, role)
+                    __database__.add_ips(profileid, twid, saddr_ip, flow, role)
                     # Add the dstport
                     port_type = 'Dst'
-                    __database__.add_port(profileid, twid, daddr_as_obj, self.column_values, role, port_type)
+                    __database__.add_port(profileid, twid, daddr_ip, flow, role, port_type)
                     # Add the srcport
                     port_type = 'Src'
-                    __database__.add_port(profileid, twid, daddr_as_obj, self.column_values, role, port_type)
+                    __database__.add_port(profileid, twid, daddr_ip, flow, role, port_type)
                     # Add the flow with all the fields interpreted
-                    __database__.add_flow(profileid=profileid, twid=twid, stime=starttime, dur=dur, saddr=str(saddr_as_obj), sport=sport, daddr=str(daddr_as_obj), dport=dport, proto=proto, state=state, pkts=pkts, allbytes=allbytes, spkts=spkts, sbytes=sbytes, appproto=appproto, uid=uid, label=self.label)
+                    __database__.add_flow(profileid, twid, flow, saddr_ip, daddr_ip, uid, self.label)
 
             ##########################################
             # 5th. Store the data according to the paremeters
@@ -1393,7 +466,7 @@ class ProfilerProcess(multiprocessing.Process):
             if self.analysis_direction == 'out':
                 # Only take care of the stuff going out. Here we don't keep track of the stuff going in
                 # If we have a home net and the flow comes from it, or if we don't have a home net and we are in out out.
-                if (self.home_net and saddr_as_obj in self.home_net) or not self.home_net:
+                if ((self.home_net and saddr_in_home) or not self.home_net) and owns_src:
                     store_features_going_out(profileid, twid)
 
             # Mode 'all'
@@ -1402,22 +475,24 @@ class ProfilerProcess(multiprocessing.Process):
                 if not self.home_net:
                     # If we don't have a home net, just try to store everything coming OUT and IN to the IP
                     # Out features
-                    store_features_going_out(profileid, twid)
+                    if owns_src:
+                        store_features_going_out(profileid, twid)
                     # IN features
-                    store_features_going_in(rev_profileid, rev_twid)
+                    if owns_dst:
+                        store_features_going_in(rev_profileid, rev_twid)
                 else:
                     """
                     The flow is going TO homenet or FROM homenet or BOTH together.
                     """
                     # If we have a home net and the flow comes from it. Only the features going out of the IP
-                    if saddr_as_obj in self.home_net:
+                    if saddr_in_home:
                         store_features_going_out(profileid, twid)
                     # If we have a home net and the flow comes to it. Only the features going in of the IP
-                    elif daddr_as_obj in self.home_net:
+                    elif daddr_in_home:
                         # The dstip was in the homenet. Add the src info to the dst profile
                         store_features_going_in(rev_profileid, rev_twid)
                     # If the flow is going from homenet to homenet.
-                    elif daddr_as_obj in self.home_net and saddr_as_obj in self.home_net:
+                    elif daddr_in_home and saddr_in_home:
                         store_features_going_out(profileid, twid)
                         store_features_going_in(rev_profileid, rev_twid)
         except Exception as inst:
@@ -1433,9 +508,8 @@ class ProfilerProcess(multiprocessing.Process):
         current_time is the starttime of the flow
         """
         try:
-            current_duration = float(current_duration)
-            current_size = int(current_size)
-            now_ts = float(current_time)
+            # The parsers already converted the numbers of the flow
+            now_ts = current_time
             self.print("Starting compute symbol. Tupleid {}, time:{} ({}), dur:{}, size:{}".format(tupleid, current_time, type(current_time), current_duration, current_size), 0, 8)
             # Variables for computing the symbol of each tuple
             T2 = False
@@ -1456,7 +530,7 @@ class ProfilerProcess(multiprocessing.Process):
 
             # Get the time of the last flow in this tuple, and the last last
             # Implicitely this is converting what we stored as 'now' into 'last_ts' and what we stored as 'last_ts' as 'last_last_ts'
-            (last_last_ts, last_ts) = __database__.getT2ForProfileTW(profileid, twid, tupleid, tuple_key)
+            (last_last_ts, last_ts) = self.tuple_cache.get_timestamps(profileid, twid, tuple_key, tupleid)
 
 
             ## BE SURE THAT HERE WE RECEIVE THE PROPER DATA
@@ -1531,116 +605,7 @@ class ProfilerProcess(multiprocessing.Process):
 
             def compute_letter():
                 """ Function to compute letter """
-                if periodicity == -1:
-                    if size == 1:
-                        if duration == 1:
-                            return '1'
-                        elif duration == 2:
-                            return '2'
-                        elif duration == 3:
-                            return '3'
-                    elif size == 2:
-                        if duration == 1:
-                            return '4'
-                        elif duration == 2:
-                            return '5'
-                        elif duration == 3:
-                            return '6'
-                    elif size == 3:
-                        if duration == 1:
-                            return '7'
-                        elif duration == 2:
-                            return '8'
-                        elif duration == 3:
-                            return '9'
-                elif periodicity == 1:
-                    if size == 1:
-                        if duration == 1:
-                            return 'a'
-                        elif duration == 2:
-                            return 'b'
-                        elif duration == 3:
-                            return 'c'
-                    elif size == 2:
-                        if duration == 1:
-                            return 'd'
-                        elif duration == 2:
-                            return 'e'
-                        elif duration == 3:
-                            return 'f'
-                    elif size == 3:
-                        if duration == 1:
-                            return 'g'
-                        elif duration == 2:
-                            return 'h'
-                        elif duration == 3:
-                            return 'i'
-                elif periodicity == 2:
-                    if size == 1:
-                        if duration == 1:
-                            return 'A'
-                        elif duration == 2:
-                            return 'B'
-                        elif duration == 3:
-                            return 'C'
-                    elif size == 2:
-                        if duration == 1:
-                            return 'D'
-                        elif duration == 2:
-                            return 'E'
-                        elif duration == 3:
-                            return 'F'
-                    elif size == 3:
-                        if duration == 1:
-                            return 'G'
-                        elif duration == 2:
-                            return 'H'
-                        elif duration == 3:
-                            return 'I'
-                elif periodicity == 3:
-                    if size == 1:
-                        if duration == 1:
-                            return 'r'
-                        elif duration == 2:
-                            return 's'
-                        elif duration == 3:
-                            return 't'
-                    elif size == 2:
-                        if duration == 1:
-                            return 'u'
-                        elif duration == 2:
-                            return 'v'
-                        elif duration == 3:
-                            return 'w'
-                    elif size == 3:
-                        if duration == 1:
-                            return 'x'
-                        elif duration == 2:
-                            return 'y'
-                        elif duration == 3:
-                            return 'z'
-                elif periodicity == 4:
-                    if size == 1:
-                        if duration == 1:
-                            return 'R'
-                        elif duration == 2:
-                            return 'S'
-                        elif duration == 3:
-                            return 'T'
-                    elif size == 2:
-                        if duration == 1:
-                            return 'U'
-                        elif duration == 2:
-                            return 'V'
-                        elif duration == 3:
-                            return 'W'
-                    elif size == 3:
-                        if duration == 1:
-                            return 'X'
-                        elif duration == 2:
-                            return 'Y'
-                        elif duration == 3:
-                            return 'Z'
+                return letters[periodicity][(size - 1) * 3 + duration - 1]
 
             def compute_timechar():
                 """ Function to compute the timechar """
@@ -1694,6 +659,21 @@ class ProfilerProcess(multiprocessing.Process):
             self.print("{}".format(inst), 0, 1)
             self.print("{}".format(traceback.format_exc()), 0, 1)
 
+    def add_tuple(self, profileid, twid, tupleid, symbol, tuple_key: str):
+        """
+        Add the symbol computed by compute_symbol to the tuple, and store the tuple in the DB.
+        tuple_key: OutTuples if the traffic is going out of the profile, InTuples if it is coming in
+        """
+        try:
+            (symbol_to_add, previous_two_timestamps) = symbol
+        except TypeError:
+            # compute_symbol failed and already printed why
+            return
+        self.print('Add_tuple called with profileid {}, twid {}, tupleid {}, data {}'.format(profileid, twid, tupleid, symbol), 0, 5)
+        data = self.tuple_cache.add_symbol(profileid, twid, tuple_key, tupleid, symbol_to_add, previous_two_timestamps)
+        self.print('\tLetters so far for tuple {}: {}'.format(tupleid, data[0]), 0, 6)
+        __database__.setTupleForProfileTW(profileid, twid, tuple_key, tupleid, data)
+
     def get_timewindow(self, flowtime, profileid):
         """"
         This function should get the id of the TW in the database where the flow belong.
@@ -1704,6 +684,8 @@ class ProfilerProcess(multiprocessing.Process):
         - The empty profiles in the middle are not being created!!!
         - The Dtp ips are stored in the first time win
         """
+        if self.aligned_tws:
+            return self.get_aligned_timewindow(flowtime, profileid)
         try:
             # First check of we are not in the last TW. Since this will be the majority of cases
             try:
@@ -1775,68 +757,177 @@ class ProfilerProcess(multiprocessing.Process):
             self.print("Error in get_timewindow().", 0, 1)
             self.print("{}".format(e), 0, 1)
 
+    def add_profile(self, profileid, starttime):
+        """
+        Add the profile to the DB if we did not add it before. If it already exists, nothing happens.
+        The profiles already added are kept in memory, so most of the flows do not need to ask the DB.
+        The DB adds the profile atomically, so it is also correct when several profilers add the same profile.
+        """
+        if profileid in self.known_profiles:
+            return
+        if len(self.known_profiles) >= max_known_profiles:
+            # Adding a profile that is in the DB again does nothing, so we can forget them
+            self.known_profiles.clear()
+        __database__.addProfile(profileid, starttime, self.width)
+        self.known_profiles.add(profileid)
+
+    def get_aligned_timewindow(self, flowtime, profileid):
+        """
+        Return the id of the aligned TW of the flow, and add it to the DB the first time that this profile uses it.
+        The TWs are the intervals of width seconds since time_windows_epoch, so the id of the TW is computed from the
+        time of the flow, without reading the TWs of the profile from the DB. The TW timewindowN goes from
+        epoch + N * width to epoch + (N + 1) * width for all the profiles, and the TWs without flows are not created.
+        """
+        index = int((flowtime - self.tw_epoch) // self.width)
+        twid = 'timewindow' + str(index)
+        if (profileid, index) not in self.registered_tws:
+            if len(self.registered_tws) >= max_registered_tws:
+                # Adding a TW that is in the DB again does not change it, so we can forget them
+                self.registered_tws.clear()
+            __database__.addTW(profileid, twid, self.tw_epoch + index * self.width)
+            self.registered_tws.add((profileid, index))
+        return twid
+
+    def count_flow_in_timewindow(self, profileid, twid, flow):
+        """ Count the flow in the summary of its TW, and start tracking the TW if it is the first flow we see in it """
+        tw_tracker = self.tw_tracker
+        summary = tw_tracker.get_summary(profileid, twid)
+        if summary is None:
+            if self.aligned_tws:
+                start = self.tw_epoch + int(twid[len('timewindow'):]) * self.width
+            else:
+                start = float(__database__.getTimeTW(profileid, twid))
+            summary = tw_tracker.open(profileid, twid, start, start + self.width)
+        tw_tracker.add_flow(summary, flow)
+
+    def close_timewindows(self, flowtime=None):
+        """
+        Publish the TWs that can not receive more flows, because the time of the flows passed their end plus
+        tw_close_grace seconds. Without flowtime, there are no more flows and all the TWs are closed
+        """
+        if flowtime is None:
+            closed = self.tw_tracker.close_all()
+        else:
+            closed = self.tw_tracker.advance(flowtime)
+        for (profileid, twid, summary) in closed:
+            self.print('Closing TW {} of profile {}. {} flows'.format(twid, profileid, summary['flows']), 0, 4)
+            __database__.markProfileTWAsClosed(profileid, twid, summary)
+
+    def process_line(self, line):
+        """
+        Process one line received from the input process.
+        Find the type of input if we don't know it yet, parse the line with the parser of the input and add the flow to the profile
+        """
+        if not self.parser:
+            # Find the type of input received
+            # We should do this before parsing the line so we don't lose the first line of input
+            self.define_type(line)
+            if not self.parser:
+                return
+        # Add the flow to the profile
+        self.add_flows([self.parser.parse(line)])
+
+    def process_lines(self, lines: list):
+        """
+        Process the lines of a batch or a block received from the input process.
+        Once we know the type of input, the lines are parsed all together
+        """
+        position = 0
+        while position < len(lines) and not self.parser:
+            # Received new input data
+            if self.debug >= 3:
+                self.print("< Received Line: {}".format(lines[position]), 0, 3)
+            self.process_line(lines[position])
+            position += 1
+        if position < len(lines):
+            lines = lines[position:] if position else lines
+            if self.debug >= 3:
+                for line in lines:
+                    self.print("< Received Line: {}".format(line), 0, 3)
+            # Add the flows to the profile
+            self.add_flows(self.parser.parse_lines(lines))
+
+    def add_flows(self, flows: list):
+        """
+        Add the flows parsed to the profiles.
+        With the reorder buffer, the flows wait in it until the watermark passes their time, so they are added in order
+        of time. The lines that are not flows and the flows without a valid time do not wait.
+        """
+        if self.reorder_buffer is None:
+            for self.flow in flows:
+                self.add_flow_to_profile()
+            return
+        reorder_buffer = self.reorder_buffer
+        for flow in flows:
+            if not flow or type(flow.starttime) != float:
+                continue
+            for self.flow in reorder_buffer.push(flow.starttime, flow):
+                self.add_flow_to_profile()
+
+    def flush_flows(self):
+        """ Add to the profiles all the flows waiting in the reorder buffer """
+        if self.reorder_buffer is not None:
+            for self.flow in self.reorder_buffer.flush():
+                self.add_flow_to_profile()
+
     def run(self):
         # Main loop function
         try:
             rec_lines = 0
+            rec_batches = 0
             while True:
-                line = self.inputqueue.get()
-                if 'stop' == line:
-                    self.print("Stopping Profiler Process. Received {} lines ({})".format(rec_lines, datetime.now().strftime('%Y-%m-%d--%H:%M:%S')), 0, 1)
+                if self.reorder_buffer:
+                    # When no input arrives for reorder_delay seconds, the flows waiting in the buffer are added
+                    try:
+                        item = self.inputqueue.get(timeout=self.reorder_delay)
+                    except queue.Empty:
+                        self.flush_flows()
+                        continue
+                else:
+                    item = self.inputqueue.get()
+                if type(item) == list:
+                    # The input process sends the lines in batches
+                    rec_batches += 1
+                    self.print("< Received batch of {} lines".format(len(item)), 0, 4)
+                    lines = item
+                elif type(item) == tuple:
+                    # ('checkpoint', position in the input files). We processed all the lines sent before it
+                    self.flush_flows()
+                    __database__.set_input_checkpoint(self.profiler_id, item[1])
+                    self.print("< Received checkpoint of {} files".format(len(item[1]['files'])), 0, 4)
+                    continue
+                elif type(item) == bytes:
+                    # The input process sends the flow files in blocks of complete lines. Ignore the empty lines
+                    rec_batches += 1
+                    lines = [line for line in item.decode('utf-8', 'replace').splitlines() if line]
+                    self.print("< Received block of {} lines".format(len(lines)), 0, 4)
+                elif 'stop' == item:
+                    self.flush_flows()
+                    # No more flows will arrive, so the modules can do the final analysis of all the TWs
+                    self.close_timewindows()
+                    self.print("Stopping Profiler Process. Received {} lines in {} batches ({})".format(rec_lines, rec_batches, datetime.now().strftime('%Y-%m-%d--%H:%M:%S')), 0, 1)
+                    if rec_batches:
+                        self.print("Average batch size received: {:.1f} lines".format(rec_lines / rec_batches), 0, 2)
+                    if self.parser and self.parser.broken:
+                        self.print("Ignored {} lines that could not be parsed as {} flows".format(self.parser.broken, self.input_type), 0, 1)
+                    event_filter = getattr(self.parser, 'event_filter', None)
+                    if event_filter and event_filter.skipped:
+                        self.print("Skipped {} suricata lines of events that are not used: {}".format(event_filter.get_skipped(), event_filter.describe_skipped()), 0, 1)
+                    if self.reorder_buffer:
+                        self.print("Reorder buffer of {} seconds: {}".format(self.reorder_delay, self.reorder_buffer.describe()), 0, 1)
+                    self.print("Closed {} TWs. {} flows arrived after their TW was closed".format(self.tw_tracker.closed, self.tw_tracker.late_flows), 0, 2)
                     return True
                 # if timewindows are not updated for a long time (see at logsProcess.py), we will stop slips automatically.The 'stop_process' line is sent from logsProcess.py.
-                elif 'stop_process' in line:
-                    self.print("Stopping Profiler Process. Received {} lines ({})")
+                elif 'stop_process' in item:
+                    self.flush_flows()
+                    self.close_timewindows()
+                    self.print("Stopping Profiler Process. Received {} lines ({})".format(rec_lines, datetime.now().strftime('%Y-%m-%d--%H:%M:%S')), 0, 1)
                     return True
                 else:
-                    # Received new input data
-                    # Extract the columns smartly
-                    self.print("< Received Line: {}".format(line), 0, 3)
-                    rec_lines += 1
-                    if not self.input_type:
-                        # Find the type of input received
-                        # This line will be discarded because 
-                        self.define_type(line)
-                        # We should do this before checking the type of input so we don't lose the first line of input
-
-                    # What type of input do we have?
-                    if self.input_type == 'zeek':
-                        #self.print('Zeek line')
-                        self.process_zeek_input(line)
-                        # Add the flow to the profile
-                        self.add_flow_to_profile()
-
-                    elif self.input_type == 'argus':
-                        #self.print('Argus line')
-                        # Argus puts the definition of the columns on the first line only
-                        # So read the first line and define the columns
-
-                        try:
-                            # Are the columns defined? Just try to access them
-                            temp = self.column_idx['starttime']
-                            # Yes
-                            # Quickly process all lines
-                            self.process_argus_input(line)
-                            # Add the flow to the profile
-                            self.add_flow_to_profile()
-                        except AttributeError:
-                            # No. Define columns. Do not add this line to profile, its only headers
-                            self.define_columns(line)
-
-                    elif self.input_type == 'suricata':
-                        #self.print('Suricata line')
-                        self.process_suricata_input(line)
-                        # Add the flow to the profile
-                        self.add_flow_to_profile()
-
-                    elif self.input_type == 'zeek-tabs':
-                        #self.print('Zeek-tabs line')
-                        self.process_zeek_tabs_input(line)
-                        # Add the flow to the profile
-                        self.add_flow_to_profile()
-                    elif self.input_type == 'nfdump':
-                        self.process_nfdump_input(line)
-                        self.add_flow_to_profile()
+                    # A single line not sent in a batch
+                    lines = [item]
+                rec_lines += len(lines)
+                self.process_lines(lines)
         except KeyboardInterrupt:
             self.print("Received {} lines.".format(rec_lines), 0, 1)
             return True
@@ -0,0 +1,82 @@
+# Tests of the time windows and the profiles that the profiler adds to the DB.
+# They do not need a redis server, the calls to the DB are recorded instead.
+# Run them with: python -m pytest profilerProcess_test.py
+
+import configparser
+import queue
+
+import pytest
+
+import profilerProcess
+from profilerProcess import ProfilerProcess
+from slips.core.flows import Flow
+from slips.core.database import __database__
+
+
+@pytest.fixture
+def make_profiler(monkeypatch):
+    """ Return a function that creates a ProfilerProcess with these options of the conf. The calls to the DB are in profiler.db_calls """
+    db_calls = []
+    monkeypatch.setattr(__database__, 'start', lambda config: None)
+    monkeypatch.setattr(__database__, 'setOutputQueue', lambda outputqueue: None)
+    monkeypatch.setattr(__database__, 'addTW', lambda profileid, twid, start: db_calls.append(('addTW', profileid, twid, start)))
+    monkeypatch.setattr(__database__, 'addProfile', lambda profileid, starttime, width: db_calls.append(('addProfile', profileid, starttime, width)))
+
+    def make_profiler(**options):
+        config = configparser.ConfigParser()
+        config.read_dict({'parameters': options})
+        profiler = ProfilerProcess(queue.Queue(), queue.Queue(), config, None)
+        profiler.db_calls = db_calls
+        return profiler
+    return make_profiler
+
+
+def test_aligned_time_windows_are_computed_from_the_time_of_the_flow(make_profiler):
+    profiler = make_profiler(aligned_time_windows='yes', time_windows_epoch=1000, time_window_width=300)
+    assert profiler.get_timewindow(1000.0, 'profile_10.0.0.1') == 'timewindow0'
+    assert profiler.get_timewindow(1299.9, 'profile_10.0.0.1') == 'timewindow0'
+    assert profiler.get_timewindow(1300.0, 'profile_10.0.0.1') == 'timewindow1'
+    # The TWs without flows are not created, and the flows before the epoch have negative TWs
+    assert profiler.get_timewindow(4000.5, 'profile_10.0.0.1') == 'timewindow10'
+    assert profiler.get_timewindow(900.0, 'profile_10.0.0.1') == 'timewindow-1'
+    # All the profiles have the same TWs
+    assert profiler.get_timewindow(1350.0, 'profile_2001:db8::1') == 'timewindow1'
+    # Each TW is added to the DB the first time that the profile uses it
+    assert profiler.db_calls == [
+        ('addTW', 'profile_10.0.0.1', 'timewindow0', 1000.0),
+        ('addTW', 'profile_10.0.0.1', 'timewindow1', 1300.0),
+        ('addTW', 'profile_10.0.0.1', 'timewindow10', 4000.0),
+        ('addTW', 'profile_10.0.0.1', 'timewindow-1', 700.0),
+        ('addTW', 'profile_2001:db8::1', 'timewindow1', 1300.0),
+    ]
+
+
+def test_aligned_time_windows_are_registered_again_after_the_limit(make_profiler, monkeypatch):
+    monkeypatch.setattr(profilerProcess, 'max_registered_tws', 2)
+    profiler = make_profiler(aligned_time_windows='yes', time_window_width=300)
+    for flowtime in (0, 300, 600, 0):
+        profiler.get_timewindow(flowtime, 'profile_10.0.0.1')
+    # Adding a TW again does not change it in the DB
+    assert [call[2] for call in profiler.db_calls] == ['timewindow0', 'timewindow1', 'timewindow2', 'timewindow0']
+    assert len(profiler.registered_tws) == 2
+
+
+def test_aligned_time_windows_are_tracked_from_their_start(make_profiler):
+    profiler = make_profiler(aligned_time_windows='yes', time_windows_epoch=1000, time_window_width=300)
+    profiler.count_flow_in_timewindow('profile_10.0.0.1', 'timewindow2', Flow(type='dns', starttime=1700.0))
+    summary = profiler.tw_tracker.get_summary('profile_10.0.0.1', 'timewindow2')
+    assert (summary['start'], summary['end']) == (1600.0, 1900.0)
+
+
+def test_profiles_are_added_to_the_db_once(make_profiler, monkeypatch):
+    profiler = make_profiler(time_window_width=300)
+    for (profileid, starttime) in (('profile_10.0.0.1', 1.0), ('profile_2001:db8::1', 2.0), ('profile_10.0.0.1', 3.0)):
+        profiler.add_profile(profileid, starttime)
+    assert profiler.db_calls == [('addProfile', 'profile_10.0.0.1', 1.0, 300.0), ('addProfile', 'profile_2001:db8::1', 2.0, 300.0)]
+    # When there are too many, they are forgotten, and added again to the DB when they come back
+    monkeypatch.setattr(profilerProcess, 'max_known_profiles', 2)
+    profiler.add_profile('profile_10.0.0.3', 4.0)
+    assert profiler.known_profiles == {'profile_10.0.0.3'}
+    profiler.add_profile('profile_10.0.0.1', 5.0)
+    profiler.add_profile('profile_10.0.0.3', 6.0)
+    assert profiler.db_calls[2:] == [('addProfile', 'profile_10.0.0.3', 4.0, 300.0), ('addProfile', 'profile_10.0.0.1', 5.0, 300.0)]
@@ -68,10 +68,19 @@ if __name__ == '__main__':
     parser.add_argument('-f', '--filepath', help='Path to the flow input file to read. It can be a Argus binetflow flow, a Zeek conn.log file, or a Zeek folder with all the log files.', required=False)
     parser.add_argument('-i', '--interface', help='Interface name to read packets from. Zeek is run on it and slips interfaces with Zeek.', required=False)
     parser.add_argument('-r', '--pcapfile', help='Pcap file to read. Zeek is run on it and slips interfaces with Zeek.', required=False)
-    parser.add_argument('-b', '--nfdump', help='A binary file from NFDUMP to read. NFDUMP is used to send data to slips.', required=False)
+    parser.add_argument('-b', '--nfdump', help='A binary file from NFDUMP to read, or a folder of them. NFDUMP is used to send data to slips.', required=False)
     parser.add_argument('-G', '--gui', help='Use the nodejs gui interface.', required=False, default=False, action='store_true')
     parser.add_argument('-l', '--nologfiles', help='Do not create log files with all the traffic info and detections, only show in the stdout.', required=False, default=False, action='store_true')
     parser.add_argument('-F', '--pcapfilter', help='Packet filter for Zeek. BPF style.', required=False, type=str, action='store')
+    parser.add_argument('-p', '--profilers', help='Amount of profiler processes. Each one owns a part of the profiles.', action='store', required=False, type=int)
+    parser.add_argument('-d', '--db', help='Index of the Redis DB to use. Several slips can run at the same time using different DBs.', action='store', required=False, type=int)
+    parser.add_argument('-o', '--output', help='Folder to store the log files. By default a folder named with the current date and time.', action='store', required=False)
+    parser.add_argument('-B', '--batch', help='Analyze many flow files, each one with its own slips and Redis DB, and print a summary of all of them. Each item can be a file, a glob or a folder with flow files.', nargs='+', required=False)
+    parser.add_argument('-W', '--batch-workers', help='Amount of files of the batch (-B) analyzed at the same time. By default, the amount of CPUs.', action='store', required=False, type=int)
+    parser.add_argument('-S', '--replay-speed', help='Replay the file or Zeek folder (-f) at the pace of the capture multiplied by this speed. 1 is the original pace.', action='store', required=False, type=float)
+    parser.add_argument('-T', '--replay-rate', help='Replay the file or Zeek folder (-f) at this amount of flows per second.', action='store', required=False, type=float)
+    parser.add_argument('-N', '--replay-shift-time', help='When replaying, change the time of the flows to the time when they are sent.', required=False, default=False, action='store_true')
+    parser.add_argument('-R', '--resume', help='Continue reading the file or Zeek folder (-f) from where the previous run stopped. The DB is not deleted.', required=False, default=False, action='store_true')
     args = parser.parse_args()
 
     # Read the config file name given from the parameters
@@ -90,6 +99,26 @@ if __name__ == '__main__':
     if server_redis_version is None:
         terminate_slips()
 
+    # In a batch, this slips only starts one slips for each file and waits for them
+    if args.batch:
+        from slips.core.batch import BatchAnalysis, find_batch_files
+        batch_files = find_batch_files(args.batch)
+        if not batch_files:
+            print('There are no files to analyze in the batch.')
+            sys.exit(-1)
+        batch_workers = args.batch_workers or os.cpu_count() or 1
+        BatchAnalysis(batch_files, batch_workers, args.config, args.verbose, args.debug, args.output).run()
+        sys.exit(0)
+
+    # The DB and the output folder given as parameters override the configuration. The other processes read them from the conf
+    if args.db is not None or args.output:
+        if not config.has_section('parameters'):
+            config.add_section('parameters')
+        if args.db is not None:
+            config.set('parameters', 'redis_db', str(args.db))
+        if args.output:
+            config.set('parameters', 'output_folder', args.output)
+
     # If we need zeek (bro), test if we can run it.
     if args.pcapfile:
         visible_zeek = test_program('bro --version')
@@ -107,7 +136,7 @@ if __name__ == '__main__':
     """
     Import modules here because if user wants to run "./slips.py --help" it should never throw error. 
     """
-    from multiprocessing import Queue
+    from slips.common.queues import create_queue, describe_queues
     from inputProcess import InputProcess
     from outputProcess import OutputProcess
     from profilerProcess import ProfilerProcess
@@ -145,6 +174,20 @@ if __name__ == '__main__':
     if args.debug < 0:
         args.debug = 0
 
+    # Any amount of profilers passed as parameter overrides the configuration
+    if args.profilers == None:
+        # Read the amount of profilers from the config
+        try:
+            args.profilers = int(config.get('parameters', 'profilers'))
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            # By default, 1
+            args.profilers = 1
+
+    # Limit the amount of profilers to >= 1
+    if args.profilers < 1:
+        args.profilers = 1
+
 
 
     # Check the type of input
@@ -164,6 +207,32 @@ if __name__ == '__main__':
         print('You need to define an input source.')
         sys.exit(-1)
 
+    # The replay controls when each flow of the file is sent, to find the rate of flows that slips can process
+    replay = None
+    if args.replay_speed is not None or args.replay_rate is not None or args.replay_shift_time:
+        if input_type != 'file':
+            print('The replay is only possible when reading a file or a Zeek folder (-f).')
+            sys.exit(-1)
+        if (args.replay_speed is not None and args.replay_speed <= 0) or (args.replay_rate is not None and args.replay_rate <= 0):
+            print('The replay speed and rate should be more than 0.')
+            sys.exit(-1)
+        from slips.common.replay import ReplayClock
+        replay = ReplayClock(args.replay_speed or 1.0, args.replay_rate, args.replay_shift_time)
+        print('Replaying the input at {}.'.format(replay.describe()))
+        if args.resume:
+            print('Resuming is not possible when replaying. Reading the input from the start.')
+            args.resume = False
+
+    # We can only resume the inputs that can be read again from the same position
+    if args.resume and (input_type != 'file' or input_information == '-'):
+        print('Resuming is only possible when reading a file or a Zeek folder (-f). Reading the input from the start.')
+        args.resume = False
+    if args.resume:
+        # The flows processed before the checkpoint are in the DB, so it should not be deleted
+        if not config.has_section('parameters'):
+            config.add_section('parameters')
+        config.set('parameters', 'deletePrevdb', 'False')
+
 
 
     ##########################
@@ -171,9 +240,13 @@ if __name__ == '__main__':
     ##########################
     from slips.core.database import __database__
 
+    # The queues of the processes, to report how full they are. Their size and what to do when they are full is in the conf
+    queues = {}
+
     # Output thread. This thread should be created first because it handles the output of the rest of the threads.
     # Create the queue
-    outputProcessQueue = Queue()
+    outputProcessQueue = create_queue(config, 'output')
+    queues['output'] = outputProcessQueue
     # Create the output thread and start it
     outputProcessThread = OutputProcess(outputProcessQueue, args.verbose, args.debug, config)
     outputProcessThread.start()
@@ -200,7 +273,8 @@ if __name__ == '__main__':
     # Several combinations of outputs should be able to be used
     if args.gui:
         # Create the curses thread
-        guiProcessQueue = Queue()
+        guiProcessQueue = create_queue(config, 'gui')
+        queues['gui'] = guiProcessQueue
         guiProcessThread = GuiProcess(guiProcessQueue, outputProcessQueue, args.verbose, args.debug, config)
         guiProcessThread.start()
         outputProcessQueue.put('quiet')
@@ -209,7 +283,8 @@ if __name__ == '__main__':
         do_logs = read_configuration(config, 'parameters', 'create_log_files')
         if do_logs == 'yes':
             # Create the logsfile thread if by parameter we were told, or if it is specified in the configuration
-            logsProcessQueue = Queue()
+            logsProcessQueue = create_queue(config, 'logs')
+            queues['logs'] = logsProcessQueue
             logsProcessThread = LogsProcess(logsProcessQueue, outputProcessQueue, args.verbose, args.debug, config)
             logsProcessThread.start()
             outputProcessQueue.put('20|main|Started logsfiles thread [PID {}]'.format(logsProcessThread.pid))
@@ -217,23 +292,28 @@ if __name__ == '__main__':
 
     # Evidence thread
     # Create the queue for the evidence thread
-    evidenceProcessQueue = Queue()
+    evidenceProcessQueue = create_queue(config, 'evidence')
+    queues['evidence'] = evidenceProcessQueue
     # Create the thread and start it
     evidenceProcessThread = EvidenceProcess(evidenceProcessQueue, outputProcessQueue, config)
     evidenceProcessThread.start()
     outputProcessQueue.put('20|main|Started Evidence thread [PID {}]'.format(evidenceProcessThread.pid))
 
-    # Profile thread
-    # Create the queue for the profile thread
-    profilerProcessQueue = Queue()
-    # Create the profile thread and start it
-    profilerProcessThread = ProfilerProcess(profilerProcessQueue, outputProcessQueue, config, args.width)
-    profilerProcessThread.start()
-    outputProcessQueue.put('20|main|Started profiler thread [PID {}]'.format(profilerProcessThread.pid))
+    # Profile threads
+    # Create one queue for each profile thread. The input process sends each flow to the profilers that own its profiles
+    profilerProcessQueues = []
+    for profiler_id in range(args.profilers):
+        profilerProcessQueue = create_queue(config, 'profiler')
+        profilerProcessQueues.append(profilerProcessQueue)
+        queues['profiler' + (str(profiler_id) if args.profilers > 1 else '')] = profilerProcessQueue
+        # Create the profile thread and start it
+        profilerProcessThread = ProfilerProcess(profilerProcessQueue, outputProcessQueue, config, args.width, profiler_id, args.profilers, args.debug)
+        profilerProcessThread.start()
+        outputProcessQueue.put('20|main|Started profiler thread {} [PID {}]'.format(profiler_id, profilerProcessThread.pid))
 
     # Input process
     # Create the input process and start it
-    inputProcess = InputProcess(outputProcessQueue, profilerProcessQueue, input_type, input_information, config, args.pcapfilter)
+    inputProcess = InputProcess(outputProcessQueue, profilerProcessQueues, input_type, input_information, config, args.pcapfilter, args.debug, args.resume, replay)
     inputProcess.start()
     outputProcessQueue.put('20|main|Started input thread [PID {}]'.format(inputProcess.pid))
 
@@ -256,6 +336,8 @@ if __name__ == '__main__':
         # How many profiles we have?
         profilesLen = str(__database__.getProfilesLen())
         outputProcessQueue.put('20|main|[Main] Total Number of Profiles in DB so far: {}. Modified Profiles in the last TW: {}. ({})'.format(profilesLen, amount_of_modified , datetime.now().strftime('%Y-%m-%d--%H:%M:%S')))
+        # How many items are waiting in each queue, and how many were dropped because it was full
+        outputProcessQueue.put('20|main|[Main] Items in the queues: {}'.format(describe_queues(queues)))
 
         #outputProcessQueue.put('11|Main|[Main] Counter to stop Slips. Amount of modified timewindows: {}. Stop counter: {}'.format(amount_of_modified, minimum_intervals_to_wait))
 
@@ -272,7 +354,8 @@ if __name__ == '__main__':
                 # Send manual stops to the process not using channels
                 logsProcessQueue.put('stop_process')
                 outputProcessQueue.put('stop_process')
-                profilerProcessQueue.put('stop_process')
+                for profilerProcessQueue in profilerProcessQueues:
+                    profilerProcessQueue.put('stop_process')
                 break
             #outputProcessQueue.put('11|Main|[Main] Decreasing one')
             minimum_intervals_to_wait -= 1
@@ -0,0 +1,112 @@
+# Classification of the IPs of the flows.
+# Most of the traffic comes from and goes to the same few thousand IPs, so each IP is parsed only once: we keep
+# its canonical text, its value as an int and if it is in the home network for the IPs seen recently.
+
+from collections import OrderedDict, namedtuple
+import bisect
+import configparser
+import ipaddress
+import sys
+
+# ip: canonical text of the IP, interned so all the flows share the same string
+# value: the IP as an int
+# version: 4 or 6
+# in_home: True if it is in the home network
+IPInfo = namedtuple('IPInfo', ['ip', 'value', 'version', 'in_home'])
+
+
+class HomeNetworks(object):
+    """
+    The networks of the home_network option of the conf. It can have one network or a list of them, like
+    10.0.0.0/8, 172.16.0.0/12, 147.32.83.0/24. Individual IPs are also accepted.
+    The networks are merged into sorted intervals of ints for each IP version, so checking if an IP is in the home
+    network is a binary search, also with thousands of networks.
+    """
+    def __init__(self, networks=()):
+        """ networks: list of texts with the networks. Raises ValueError if one of them is not a network """
+        self.networks = []
+        for network in networks:
+            self.networks.append(ipaddress.ip_network(network.strip(), strict=False))
+        # version: (sorted first IP of each interval, last IP of each interval)
+        self.intervals = {}
+        for version in (4, 6):
+            collapsed = list(ipaddress.collapse_addresses([network for network in self.networks if network.version == version]))
+            if collapsed:
+                self.intervals[version] = ([int(network.network_address) for network in collapsed], [int(network.broadcast_address) for network in collapsed])
+
+    @classmethod
+    def from_text(cls, text: str):
+        """ Read the networks separated by commas or spaces. They can also be written like a python list """
+        for character in '[]\'"':
+            text = text.replace(character, ' ')
+        return cls(text.replace(',', ' ').split())
+
+    def __bool__(self):
+        return bool(self.networks)
+
+    def __str__(self):
+        return ', '.join(str(network) for network in self.networks)
+
+    def contains(self, value: int, version: int) -> bool:
+        """ Check if the IP with this value as an int is in any of the networks """
+        try:
+            (starts, ends) = self.intervals[version]
+        except KeyError:
+            return False
+        index = bisect.bisect_right(starts, value) - 1
+        return index >= 0 and value <= ends[index]
+
+    def __contains__(self, ip) -> bool:
+        """ So the modules can check any IP, as text or as an ipaddress object """
+        try:
+            ip = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return self.contains(int(ip), ip.version)
+
+
+def read_home_networks(config) -> HomeNetworks:
+    """ Read the home networks from the conf. Raises ValueError if some network is wrong """
+    try:
+        return HomeNetworks.from_text(config.get('parameters', 'home_network'))
+    except (configparser.NoOptionError, configparser.NoSectionError, NameError):
+        # There is a conf, but there is no option, or no section or no configuration file specified
+        return HomeNetworks()
+
+
+class IPClassifier(object):
+    """
+    Converts the IPs of the flows to IPInfo, and keeps a LRU cache of the last IPs.
+    The home networks are checked over the value of the IP, instead of with ipaddress objects.
+    """
+    def __init__(self, home_net=None, cache_size=10000):
+        """ home_net: HomeNetworks, or None if there is no home network """
+        self.home_net = home_net or HomeNetworks()
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def in_home_net(self, value: int, version: int) -> bool:
+        return self.home_net.contains(value, version)
+
+    def classify(self, ip: str):
+        """ Return the IPInfo of this IP, or None if it is not an IP (like a MAC) """
+        try:
+            info = self.cache[ip]
+            self.cache.move_to_end(ip)
+            return info
+        except KeyError:
+            pass
+        try:
+            ip_as_obj = ipaddress.IPv4Address(ip)
+        except ipaddress.AddressValueError:
+            try:
+                ip_as_obj = ipaddress.IPv6Address(ip)
+            except ipaddress.AddressValueError:
+                return None
+        value = int(ip_as_obj)
+        info = IPInfo(sys.intern(str(ip_as_obj)), value, ip_as_obj.version, self.in_home_net(value, ip_as_obj.version))
+        self.cache[ip] = info
+        if len(self.cache) > self.cache_size:
+            # Forget the IP that was not seen for longer
+            self.cache.popitem(last=False)
+        return info
@@ -0,0 +1,73 @@
+# Tests of the classification of the IPs of the flows and of the home networks.
+# Run them with: python -m pytest slips/common/ipclassifier_test.py
+
+import configparser
+import ipaddress
+import random
+
+import pytest
+
+from slips.common.ipclassifier import HomeNetworks, IPClassifier, read_home_networks
+
+
+def test_classify_ipv4_and_ipv6():
+    classifier = IPClassifier(HomeNetworks(['192.168.0.0/16', '2001:db8::/32']))
+    info = classifier.classify('192.168.1.10')
+    assert (info.ip, info.value, info.version, info.in_home) == ('192.168.1.10', int(ipaddress.ip_address('192.168.1.10')), 4, True)
+    assert classifier.classify('8.8.8.8').in_home is False
+    # The IPv6 addresses are kept in their canonical text
+    info = classifier.classify('2001:0DB8:0000::0001')
+    assert (info.ip, info.version, info.in_home) == ('2001:db8::1', 6, True)
+    assert classifier.classify('2001:db9::1').in_home is False
+
+
+def test_macs_and_invalid_ips_are_not_classified():
+    classifier = IPClassifier()
+    for text in ('00:11:22:33:44:55', '', '-', '10.0.0.256', 'example.com'):
+        assert classifier.classify(text) is None
+    # Without home network nothing is in home
+    assert classifier.classify('10.0.0.1').in_home is False
+
+
+def test_the_cache_keeps_the_last_ips():
+    classifier = IPClassifier(cache_size=2)
+    first = classifier.classify('10.0.0.1')
+    classifier.classify('10.0.0.2')
+    assert classifier.classify('10.0.0.1') is first
+    classifier.classify('10.0.0.3')
+    # 10.0.0.2 was used before 10.0.0.1, so it was forgotten
+    assert list(classifier.cache) == ['10.0.0.1', '10.0.0.3']
+
+
+def test_home_networks_accept_lists_and_single_ips():
+    for text in ('10.0.0.0/8, 172.16.0.0/12 147.32.83.0/24', "['10.0.0.0/8', '172.16.0.0/12', '147.32.83.0/24']"):
+        home_net = HomeNetworks.from_text(text)
+        assert str(home_net) == '10.0.0.0/8, 172.16.0.0/12, 147.32.83.0/24'
+        assert '10.255.255.255' in home_net and '172.31.0.1' in home_net and '147.32.83.7' in home_net
+        assert '172.32.0.1' not in home_net and '147.32.84.1' not in home_net and '9.255.255.255' not in home_net
+    home_net = HomeNetworks.from_text('192.168.1.1, 2001:db8::/64')
+    assert '192.168.1.1' in home_net and '192.168.1.2' not in home_net
+    assert ipaddress.ip_address('2001:db8::ffff') in home_net and '2001:db8:0:1::1' not in home_net
+    # The IPv4 networks do not match IPv6 addresses with the same value
+    assert '::c0a8:101' not in home_net
+    assert 'not an ip' not in home_net
+    assert not HomeNetworks()
+    with pytest.raises(ValueError):
+        HomeNetworks.from_text('10.0.0.0/8, 300.0.0.0/8')
+
+
+def test_home_networks_match_like_ipaddress():
+    rng = random.Random(1)
+    networks = ['{}.{}.0.0/{}'.format(rng.randint(1, 223), rng.randint(0, 255), rng.randint(8, 24)) for _ in range(300)]
+    home_net = HomeNetworks(networks)
+    objects = [ipaddress.ip_network(network, strict=False) for network in networks]
+    for _ in range(3000):
+        ip = ipaddress.ip_address(rng.getrandbits(32))
+        assert (ip in home_net) == any(ip in network for network in objects)
+
+
+def test_read_home_networks_from_the_configuration():
+    config = configparser.ConfigParser()
+    config.read_string('[parameters]\nhome_network = 10.0.0.0/8, 2001:db8::/32\n')
+    assert str(read_home_networks(config)) == '10.0.0.0/8, 2001:db8::/32'
+    assert not read_home_networks(configparser.ConfigParser())
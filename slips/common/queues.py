@@ -0,0 +1,144 @@
+# Queues between the processes of slips with a maximum size, and what to do with the new items when they are full.
+# Without a limit, when a process can not keep up with the traffic (like the profiler reading an interface), its queue
+# grows until the computer runs out of memory.
+
+import configparser
+import multiprocessing
+import multiprocessing.queues
+import queue
+
+# What to do when a queue is full:
+# - block: the process that puts the item waits until there is space. Nothing is lost but the producer is slowed down
+# - drop_newest: the new item is discarded
+# - drop_oldest: the oldest item in the queue is discarded to make space for the new one
+# - sample: when the queue is more than half full, only one of every sample_rate new items is put. If it is full, the item is discarded
+policies = ('block', 'drop_newest', 'drop_oldest', 'sample')
+# Items that tell the processes what to do. They are never dropped
+control_items = ('stop', 'stop_process', 'quiet')
+
+
+def is_control_item(item) -> bool:
+    """ The stops, and the tuples like the checkpoints of the input, are never dropped """
+    return type(item) == tuple or (type(item) == str and item in control_items)
+
+
+class BoundedQueue(multiprocessing.queues.Queue):
+    """
+    multiprocessing.Queue with a maximum size and a policy for when it is full.
+    It counts the items dropped. The counter is shared by all the processes that use the queue, so the main process
+    can report it.
+    """
+    def __init__(self, maxsize=0, policy='block', sample_rate=10):
+        if policy not in policies:
+            raise ValueError('Unknown queue policy {}. It should be one of {}'.format(policy, ', '.join(policies)))
+        super().__init__(maxsize, ctx=multiprocessing.get_context())
+        self.size_limit = max(0, maxsize)
+        self.policy = policy
+        self.sample_rate = max(1, int(sample_rate))
+        # Amount of items dropped by all the processes
+        self.dropped = multiprocessing.Value('l', 0)
+        self.sample_counter = 0
+
+    def __getstate__(self):
+        # Also send our attributes when the queue is given to a new process
+        return super().__getstate__() + (self.size_limit, self.policy, self.sample_rate, self.dropped)
+
+    def __setstate__(self, state):
+        super().__setstate__(state[:-4])
+        (self.size_limit, self.policy, self.sample_rate, self.dropped) = state[-4:]
+        self.sample_counter = 0
+
+    def count_dropped(self):
+        with self.dropped.get_lock():
+            self.dropped.value += 1
+
+    def get_dropped(self) -> int:
+        return self.dropped.value
+
+    def get_depth(self):
+        """ Amount of items in the queue, or None if the system can not tell it (macOS) """
+        try:
+            return self.qsize()
+        except NotImplementedError:
+            return None
+
+    def put(self, obj, block=True, timeout=None):
+        """ Put the item following the policy of the queue. Returns False if it was dropped """
+        if not self.size_limit or self.policy == 'block' or not block or is_control_item(obj):
+            super().put(obj, block, timeout)
+            return True
+        if self.policy == 'sample':
+            depth = self.get_depth()
+            if depth is not None and depth * 2 >= self.size_limit:
+                self.sample_counter += 1
+                if self.sample_counter % self.sample_rate:
+                    self.count_dropped()
+                    return False
+        try:
+            super().put(obj, False)
+            return True
+        except queue.Full:
+            pass
+        if self.policy == 'drop_oldest':
+            try:
+                oldest = self.get(False)
+            except queue.Empty:
+                # The consumer took it first, or is taking it now
+                oldest = None
+            if oldest is not None and is_control_item(oldest):
+                # Keep it, and drop the new item instead
+                super().put(oldest)
+            else:
+                if oldest is not None:
+                    self.count_dropped()
+                try:
+                    super().put(obj, True, 1)
+                    return True
+                except queue.Full:
+                    # Other processes filled it again
+                    pass
+        self.count_dropped()
+        return False
+
+
+def read_queue_option(config, name: str, option: str, default):
+    """ Read the option of this queue (like profiler_size), or the general one (size) if the queue does not have it """
+    for key in (name + '_' + option, option):
+        try:
+            return config.get('queues', key)
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            continue
+    return default
+
+
+def create_queue(config, name: str) -> BoundedQueue:
+    """ Create the queue of a process (output, profiler, logs, evidence, gui) with the size and policy of the conf """
+    try:
+        size = int(read_queue_option(config, name, 'size', 0))
+    except ValueError:
+        size = 0
+    policy = read_queue_option(config, name, 'policy', 'block')
+    if policy not in policies:
+        print('Unknown policy {} for the {} queue. Using block.'.format(policy, name))
+        policy = 'block'
+    try:
+        sample_rate = int(read_queue_option(config, name, 'sample_rate', 10))
+    except ValueError:
+        sample_rate = 10
+    return BoundedQueue(size, policy, sample_rate)
+
+
+def describe_queues(queues: dict) -> str:
+    """ Text with the depth and the dropped items of each queue. queues is name: BoundedQueue """
+    texts = []
+    for name, bounded_queue in queues.items():
+        depth = bounded_queue.get_depth()
+        text = '{} {}'.format(name, '?' if depth is None else depth)
+        if bounded_queue.size_limit:
+            text += '/{}'.format(bounded_queue.size_limit)
+        dropped = bounded_queue.get_dropped()
+        if dropped:
+            text += ' (dropped {})'.format(dropped)
+        texts.append(text)
+    return ', '.join(texts)
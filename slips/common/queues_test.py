@@ -0,0 +1,103 @@
+# Tests of the queues between the processes and their policies when they are full.
+# Run them with: python -m pytest slips/common/queues_test.py
+
+import configparser
+import queue
+import time
+
+import pytest
+
+from slips.common.queues import BoundedQueue, create_queue, describe_queues, is_control_item
+
+
+def fill(bounded_queue, items) -> list:
+    """ Put the items and wait until the feeder thread wrote them, so get(False) can see them """
+    results = [bounded_queue.put(item) for item in items]
+    time.sleep(0.2)
+    return results
+
+
+def read_all(bounded_queue) -> list:
+    items = []
+    while True:
+        try:
+            items.append(bounded_queue.get(True, 0.2))
+        except queue.Empty:
+            return items
+
+
+def test_drop_newest():
+    bounded_queue = BoundedQueue(3, 'drop_newest')
+    assert fill(bounded_queue, range(5)) == [True, True, True, False, False]
+    assert bounded_queue.get_dropped() == 2
+    assert read_all(bounded_queue) == [0, 1, 2]
+
+
+def test_drop_oldest():
+    bounded_queue = BoundedQueue(3, 'drop_oldest')
+    fill(bounded_queue, range(3))
+    assert bounded_queue.put(3) and bounded_queue.put(4)
+    assert bounded_queue.get_dropped() == 2
+    assert read_all(bounded_queue) == [2, 3, 4]
+
+
+def test_control_items_are_never_dropped():
+    bounded_queue = BoundedQueue(2, 'drop_oldest')
+    fill(bounded_queue, ['stop', 'line'])
+    # The oldest item is a stop, so the new line is dropped instead. The stop is put back after the other line
+    assert not bounded_queue.put('new line')
+    assert bounded_queue.get_dropped() == 1
+    assert read_all(bounded_queue) == ['line', 'stop']
+    bounded_queue = BoundedQueue(1, 'drop_newest')
+    fill(bounded_queue, ['line'])
+    # A checkpoint waits for space in the queue, like with the block policy
+    checkpoint = ('checkpoint', {'files': {}})
+    with pytest.raises(queue.Full):
+        bounded_queue.put(checkpoint, True, 0.1)
+    assert bounded_queue.get_dropped() == 0
+    assert bounded_queue.get() == 'line'
+    assert bounded_queue.put(checkpoint)
+    assert read_all(bounded_queue) == [checkpoint]
+    assert is_control_item('stop_process') and is_control_item(('checkpoint', {}))
+    assert not is_control_item('a line') and not is_control_item(['stop'])
+
+
+def test_sample_keeps_one_of_every_sample_rate_items_when_half_full():
+    bounded_queue = BoundedQueue(10, 'sample', sample_rate=3)
+    # Below half of the size, nothing is dropped
+    assert all(fill(bounded_queue, range(5)))
+    assert fill(bounded_queue, range(5, 11)) == [False, False, True, False, False, True]
+    assert bounded_queue.get_dropped() == 4
+    assert read_all(bounded_queue) == [0, 1, 2, 3, 4, 7, 10]
+
+
+def test_block_and_unbounded_queues_do_not_drop():
+    bounded_queue = BoundedQueue(2, 'block')
+    fill(bounded_queue, range(2))
+    with pytest.raises(queue.Full):
+        bounded_queue.put(2, True, 0.1)
+    bounded_queue = BoundedQueue(0, 'drop_newest')
+    assert all(fill(bounded_queue, range(100)))
+    assert bounded_queue.get_dropped() == 0
+    assert len(read_all(bounded_queue)) == 100
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        BoundedQueue(10, 'drop_all')
+
+
+def test_create_queue_from_the_configuration():
+    config = configparser.ConfigParser()
+    config.read_string('[queues]\nsize = 100\npolicy = drop_newest\nprofiler_size = 5\nprofiler_policy = sample\nprofiler_sample_rate = 4\noutput_policy = unknown\n')
+    profiler_queue = create_queue(config, 'profiler')
+    assert (profiler_queue.size_limit, profiler_queue.policy, profiler_queue.sample_rate) == (5, 'sample', 4)
+    logs_queue = create_queue(config, 'logs')
+    assert (logs_queue.size_limit, logs_queue.policy, logs_queue.sample_rate) == (100, 'drop_newest', 10)
+    assert create_queue(config, 'output').policy == 'block'
+    # Without a [queues] section the queues are unbounded and block
+    default_queue = create_queue(configparser.ConfigParser(), 'profiler')
+    assert (default_queue.size_limit, default_queue.policy) == (0, 'block')
+    fill(logs_queue, ['line'])
+    fill(profiler_queue, range(5))
+    assert describe_queues({'logs': logs_queue, 'profiler': profiler_queue}) == 'logs 1/100, profiler 3/5 (dropped 2)'
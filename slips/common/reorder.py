@@ -0,0 +1,78 @@
+# Buffer that gives the flows to the profiler in order of time, even if they arrive a bit out of order.
+# The Zeek logs interleave and several sensors send their flows with different delays. A flow older than the last TW
+# of its profile makes get_timewindow() search and create older TWs, and compute_symbol() sees negative times
+# between the flows of a tuple.
+
+import heapq
+
+
+class ReorderBuffer(object):
+    """
+    Min-heap of items keyed by the time of their flow.
+    The watermark is the time of the newest flow seen minus delay seconds. The flows older than the watermark are
+    released in order of time, so the flows that arrive at most delay seconds late are still processed in order.
+    When there are more than max_size flows in the buffer, the oldest ones are released before the watermark passes them.
+    A flow older than the last flow released can not be put in order anymore. It is released at once and counted as late.
+    """
+    def __init__(self, delay: float, max_size=100000):
+        self.delay = delay
+        self.max_size = max(1, max_size)
+        # (time, arrival number, item). The arrival number keeps the order of the flows with the same time
+        self.heap = []
+        self.arrivals = 0
+        self.newest_time = None
+        # Time of the last flow released
+        self.released_time = None
+        # Flows that arrived after a newer one, and were put in order
+        self.reordered = 0
+        # Flows that arrived too late to be put in order, and how late the latest of them was, in seconds
+        self.late = 0
+        self.max_lateness = 0.0
+        # Largest amount of flows in the buffer
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def get_watermark(self):
+        """ The flows older than this time are released. None if no flow was seen yet """
+        if self.newest_time is None:
+            return None
+        return self.newest_time - self.delay
+
+    def push(self, flowtime: float, item) -> list:
+        """ Add the item of a flow with this time. Returns the items that are released, in order of time """
+        if self.released_time is not None and flowtime < self.released_time:
+            # Too late. The flows after it were already released
+            self.late += 1
+            self.max_lateness = max(self.max_lateness, self.released_time - flowtime)
+            return [item]
+        if self.newest_time is None or flowtime > self.newest_time:
+            self.newest_time = flowtime
+        elif flowtime < self.newest_time:
+            self.reordered += 1
+        heapq.heappush(self.heap, (flowtime, self.arrivals, item))
+        self.arrivals += 1
+        if len(self.heap) > self.max_depth:
+            self.max_depth = len(self.heap)
+        watermark = self.newest_time - self.delay
+        if self.heap[0][0] > watermark and len(self.heap) <= self.max_size:
+            # The usual case when the flows arrive in order: nothing to release yet
+            return []
+        released = []
+        while self.heap and (self.heap[0][0] <= watermark or len(self.heap) > self.max_size):
+            (self.released_time, _, item) = heapq.heappop(self.heap)
+            released.append(item)
+        return released
+
+    def flush(self) -> list:
+        """ Release all the items, in order of time """
+        released = []
+        while self.heap:
+            (self.released_time, _, item) = heapq.heappop(self.heap)
+            released.append(item)
+        return released
+
+    def describe(self) -> str:
+        """ Text with the counters of the buffer """
+        return '{} flows put in order, {} flows arrived too late (up to {:.3f} seconds), at most {} flows in the buffer'.format(self.reordered, self.late, self.max_lateness, self.max_depth)
@@ -0,0 +1,62 @@
+# Tests of the buffer that gives the flows to the profiler in order of time.
+# Run them with: python -m pytest slips/common/reorder_test.py
+
+import random
+
+from slips.common.reorder import ReorderBuffer
+
+
+def test_flows_are_released_when_the_watermark_passes_them():
+    buffer = ReorderBuffer(delay=10)
+    assert buffer.get_watermark() is None
+    assert buffer.push(100, 'a') == []
+    assert buffer.push(105, 'b') == []
+    assert buffer.get_watermark() == 95
+    # Late but inside the delay, so it goes before b
+    assert buffer.push(103, 'c') == []
+    assert buffer.push(113, 'd') == ['a', 'c']
+    assert buffer.get_watermark() == 103
+    assert buffer.push(200, 'e') == ['b', 'd']
+    assert buffer.flush() == ['e']
+    assert (len(buffer), buffer.reordered, buffer.late) == (0, 1, 0)
+
+
+def test_flows_with_the_same_time_keep_their_order():
+    buffer = ReorderBuffer(delay=0)
+    assert buffer.push(1, 'a') == ['a']
+    buffer = ReorderBuffer(delay=5)
+    for item in 'abcd':
+        buffer.push(10, item)
+    assert buffer.push(20, 'e') == list('abcd')
+
+
+def test_random_delays_inside_the_delay_are_put_in_order():
+    rng = random.Random(1)
+    times = [number + rng.uniform(-4, 0) for number in range(1000)]
+    buffer = ReorderBuffer(delay=5)
+    released = []
+    for flowtime in times:
+        released.extend(buffer.push(flowtime, flowtime))
+    released.extend(buffer.flush())
+    assert released == sorted(times)
+    assert buffer.late == 0
+
+
+def test_too_late_flows_are_released_at_once():
+    buffer = ReorderBuffer(delay=10)
+    buffer.push(100, 'a')
+    assert buffer.push(120, 'b') == ['a']
+    assert buffer.push(90, 'late') == ['late']
+    assert (buffer.late, buffer.max_lateness) == (1, 10)
+    assert buffer.flush() == ['b']
+
+
+def test_max_size_releases_the_oldest_flows():
+    buffer = ReorderBuffer(delay=1000, max_size=3)
+    for (flowtime, item) in [(5, 'e'), (1, 'a'), (3, 'c')]:
+        assert buffer.push(flowtime, item) == []
+    assert buffer.push(4, 'd') == ['a']
+    assert buffer.push(2, 'b') == ['b']
+    assert buffer.max_depth == 4
+    assert buffer.flush() == ['c', 'd', 'e']
+    assert buffer.describe() == '4 flows put in order, 0 flows arrived too late (up to 0.000 seconds), at most 4 flows in the buffer'
@@ -0,0 +1,186 @@
+# Replay of flow files at a controlled pace, to find at which rate of flows slips starts to fall behind.
+# The flows can be sent at the pace of the capture, N times faster, or at a fixed amount of flows per second.
+# Optionally the time of the flows is changed to the time when they are sent, as if they were happening now.
+
+from slips.core import codec
+from slips.core.timestamps import time_formats, get_parser
+from datetime import datetime, timezone
+import time
+
+
+def parse_time(text: str, time_format=None):
+    """
+    Convert the time of a flow to seconds since the epoch.
+    Returns (seconds, time_format) or (None, None) if it is not a time. time_format is 'unixtimestamp' or a strptime format.
+    The format of the previous flow can be given, so we try it first.
+    """
+    if time_format == 'unixtimestamp' or time_format is None:
+        try:
+            return float(text), 'unixtimestamp'
+        except (TypeError, ValueError):
+            pass
+    if time_format and time_format != 'unixtimestamp':
+        try:
+            return get_parser(time_format)(text), time_format
+        except (TypeError, ValueError):
+            pass
+    for time_format in time_formats:
+        try:
+            return get_parser(time_format)(text), time_format
+        except (TypeError, ValueError):
+            continue
+    return None, None
+
+
+def format_time(seconds: float, time_format: str) -> str:
+    """ Convert seconds since the epoch to the time format of the flows """
+    if time_format == 'unixtimestamp':
+        return '{:.6f}'.format(seconds)
+    if '%z' in time_format:
+        return datetime.fromtimestamp(seconds, timezone.utc).strftime(time_format)
+    return datetime.fromtimestamp(seconds).strftime(time_format)
+
+
+class FlowTime(object):
+    """
+    Read and change the time of the lines of the flow files: argus and nfdump csv, Zeek logs in json or TSV,
+    the Zeek lines already converted to dict, and suricata json.
+    """
+    def __init__(self):
+        # The format of the times in the text lines. The same for all the lines of a file
+        self.time_format = None
+        self.separator = None
+
+    def get_time(self, line):
+        """ Return the time of the flow in seconds, or None if the line is not a flow (like the headers) """
+        if type(line) == dict:
+            return parse_time(line.get('ts'), 'unixtimestamp')[0]
+        if not line or line[0] == '#':
+            return None
+        if line[0] == '{':
+            try:
+                data = codec.loads(line)
+            except ValueError:
+                return None
+            if 'ts' in data:
+                return parse_time(data['ts'], 'unixtimestamp')[0]
+            (seconds, self.time_format) = parse_time(data.get('timestamp'), self.time_format)
+            return seconds
+        if not line[0].isdigit():
+            # The header of argus
+            return None
+        if self.separator is None:
+            self.separator = '\t' if line.count('\t') > line.count(',') else ','
+        (seconds, time_format) = parse_time(line.split(self.separator, 1)[0], self.time_format)
+        if time_format:
+            self.time_format = time_format
+        return seconds
+
+    def set_time(self, line, seconds: float):
+        """ Return the line with its time changed to these seconds, in the same format """
+        if type(line) == dict:
+            line['ts'] = seconds
+            return line
+        if self.time_format is None:
+            # Learn the format of the times from this line
+            self.get_time(line)
+        if line[0] == '{':
+            data = codec.loads(line)
+            if 'ts' in data:
+                data['ts'] = seconds
+            else:
+                data['timestamp'] = format_time(seconds, self.time_format)
+            return codec.dumps(data)
+        rest = line.split(self.separator, 1)[1]
+        return format_time(seconds, self.time_format) + self.separator + rest
+
+
+class ReplayClock(object):
+    """
+    Decide when each flow of a replay is sent, and measure how much the replay is behind the schedule.
+    With speed, a flow is sent when the time since the first flow, divided by the speed, has passed since the replay started.
+    With rate, the flows are sent one after the other at that amount of flows per second, without looking at their time.
+    """
+    def __init__(self, speed=1.0, rate=None, shift_time=False):
+        self.speed = speed
+        self.rate = rate
+        self.shift_time = shift_time
+        # Wall time when the first flow was sent, and the time of the first flow
+        self.start_time = None
+        self.first_flow_time = None
+        # Time when the last flow should have been sent. Older flows that come out of order are not delayed
+        self.last_due_time = 0
+        self.flows = 0
+        self.last_flow_time = None
+        # How many seconds we are behind the schedule after the last flow, and the maximum so far
+        self.lag = 0
+        self.max_lag = 0
+        # Values at the last report, to compute the rates since then
+        self.report_wall_time = None
+        self.report_flows = 0
+        self.report_flow_time = None
+
+    def describe(self) -> str:
+        """ Text with the target of the replay """
+        if self.rate:
+            return '{:g} flows/s'.format(self.rate)
+        return '{:g}x the speed of the capture'.format(self.speed)
+
+    def wait(self, flow_time) -> float:
+        """
+        Sleep until the flow with this time should be sent. The time can be None for flows without time.
+        Returns the wall time when the flow should have been sent, used as the new time of the flow.
+        """
+        now = time.time()
+        if self.start_time is None:
+            self.start_time = now
+            self.report_wall_time = now
+        if self.rate:
+            due_time = self.start_time + self.flows / self.rate
+        elif flow_time is None:
+            due_time = self.last_due_time
+        else:
+            if self.first_flow_time is None:
+                self.first_flow_time = flow_time
+                self.report_flow_time = flow_time
+            due_time = self.start_time + (flow_time - self.first_flow_time) / self.speed
+        due_time = max(due_time, self.last_due_time)
+        self.last_due_time = due_time
+        if due_time > now:
+            time.sleep(due_time - now)
+            self.lag = 0
+        else:
+            self.lag = now - due_time
+            self.max_lag = max(self.max_lag, self.lag)
+        self.flows += 1
+        if flow_time is not None:
+            self.last_flow_time = flow_time
+        return due_time
+
+    def report(self) -> str:
+        """ Text with the rate and the lag since the last report """
+        now = time.time()
+        elapsed = now - self.report_wall_time
+        if elapsed <= 0:
+            elapsed = 1e-9
+        flows_rate = (self.flows - self.report_flows) / elapsed
+        if self.rate:
+            target = 'target {:g} flows/s'.format(self.rate)
+        else:
+            speed = 0
+            if self.report_flow_time is not None and self.last_flow_time is not None:
+                speed = (self.last_flow_time - self.report_flow_time) / elapsed
+            target = 'replaying at {:.2f}x, target {:g}x'.format(speed, self.speed)
+            self.report_flow_time = self.last_flow_time
+        self.report_wall_time = now
+        self.report_flows = self.flows
+        return '{:.0f} flows/s ({}). Behind the schedule by {:.3f}s'.format(flows_rate, target, self.lag)
+
+    def summary(self) -> str:
+        """ Text with the totals of the replay """
+        if self.start_time is None:
+            return 'No flows were replayed'
+        elapsed = time.time() - self.start_time
+        if elapsed <= 0:
+            elapsed = 1e-9
+        return 'Replayed {} flows in {:.1f}s ({:.0f} flows/s, target {}). Maximum lag behind the schedule: {:.3f}s'.format(self.flows, elapsed, self.flows / elapsed, self.describe(), self.max_lag)
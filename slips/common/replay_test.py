@@ -0,0 +1,80 @@
+# Tests of the times of the replayed flows and of the clock of the replay.
+# Run them with: python -m pytest slips/common/replay_test.py
+
+import pytest
+
+from slips.common.replay import FlowTime, ReplayClock, format_time, parse_time
+from slips.core import codec
+from slips.core.timestamps import time_formats
+
+seconds = 1554394980.325010
+
+
+@pytest.mark.parametrize('time_format', ['unixtimestamp'] + time_formats)
+def test_format_and_parse_time_round_trip(time_format):
+    text = format_time(seconds, time_format)
+    (parsed, parsed_format) = parse_time(text)
+    assert parsed_format == time_format
+    if time_format == '%Y-%m-%d %H:%M:%S':
+        assert parsed == int(seconds)
+    else:
+        assert parsed == pytest.approx(seconds, abs=1e-6)
+    # Giving the format of the previous flow gives the same result
+    assert parse_time(text, time_format) == (parsed, time_format)
+    assert format_time(parsed, time_format) == text
+
+
+def test_parse_time_of_other_formats_and_invalid_times():
+    assert parse_time('2019-04-04T16:23:00.325010+0200', 'unixtimestamp') == (pytest.approx(seconds - 7200, abs=1e-6), '%Y-%m-%dT%H:%M:%S.%f%z')
+    for text in ('', 'StartTime', None, '2019-13-04 16:23:00'):
+        assert parse_time(text) == (None, None)
+
+
+def test_flow_time_of_text_lines():
+    argus = format_time(seconds, '%Y/%m/%d %H:%M:%S.%f') + ',0.02,udp,10.8.0.69,48427,  <->,8.8.8.8,53,CON'
+    zeek_tabs = '{:.6f}\tC1\t10.0.0.1\t53'.format(seconds)
+    for line in (argus, zeek_tabs):
+        flow_time = FlowTime()
+        assert flow_time.get_time(line) == pytest.approx(seconds, abs=1e-6)
+        changed = flow_time.set_time(line, seconds + 100)
+        assert changed.split(flow_time.separator)[1:] == line.split(flow_time.separator)[1:]
+        assert flow_time.get_time(changed) == pytest.approx(seconds + 100, abs=1e-6)
+    flow_time = FlowTime()
+    for line in ('#fields\tts\tuid', 'StartTime,Dur,Proto', ''):
+        assert flow_time.get_time(line) is None
+
+
+def test_flow_time_of_json_lines():
+    flow_time = FlowTime()
+    zeek_json = codec.dumps({'ts': seconds, 'uid': 'C1'})
+    assert flow_time.get_time(zeek_json) == seconds
+    assert codec.loads(flow_time.set_time(zeek_json, 10.5)) == {'ts': 10.5, 'uid': 'C1'}
+    suricata = codec.dumps({'timestamp': '2019-04-04T16:23:00.325010+0000', 'event_type': 'flow'})
+    assert flow_time.get_time(suricata) == pytest.approx(seconds, abs=1e-6)
+    changed = codec.loads(flow_time.set_time(suricata, 0.5))
+    assert changed == {'timestamp': '1970-01-01T00:00:00.500000+0000', 'event_type': 'flow'}
+    line = {'ts': seconds, 'type': 'conn'}
+    assert flow_time.get_time(line) == seconds
+    assert flow_time.set_time(line, 1.0)['ts'] == 1.0
+    assert flow_time.get_time('{broken') is None
+
+
+def test_replay_clock_with_speed():
+    clock = ReplayClock(speed=100)
+    first = clock.wait(1000.0)
+    assert clock.wait(1001.0) == pytest.approx(first + 0.01)
+    # A flow that comes out of order is not sent before the previous one
+    assert clock.wait(999.0) == pytest.approx(first + 0.01)
+    assert clock.wait(None) == pytest.approx(first + 0.01)
+    assert clock.wait(1002.0) == pytest.approx(first + 0.02)
+    assert clock.flows == 5
+    assert clock.describe() == '100x the speed of the capture'
+
+
+def test_replay_clock_with_rate():
+    clock = ReplayClock(rate=1000)
+    due_times = [clock.wait(flow_time) for flow_time in (5.0, 1.0, None, 100.0)]
+    assert [due_time - due_times[0] for due_time in due_times] == pytest.approx([0, 0.001, 0.002, 0.003], abs=1e-6)
+    assert clock.describe() == '1000 flows/s'
+    assert clock.summary().startswith('Replayed 4 flows in ')
+    assert ReplayClock().summary() == 'No flows were replayed'
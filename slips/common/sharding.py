@@ -0,0 +1,134 @@
+# Functions to split the profiles between several profiler processes.
+# Each profile is owned by exactly one profiler, so all the TWs and tuples of a profile are always
+# modified by the same process and in the same order that the flows arrived.
+
+from slips.core.parsers import find_json_string
+import zlib
+
+
+def get_shard(ip: str, shards: int) -> int:
+    """
+    Return the index of the profiler that owns the profile of this IP.
+    We can not use hash() because it changes between python processes.
+    """
+    return zlib.crc32(ip.encode('utf-8')) % shards
+
+
+class FlowRouter(object):
+    """
+    Decide to which profilers a line of input should be sent.
+    A flow goes to the profilers that own its src IP and its dst IP. The profiler of the dst IP may create the profile
+    and the TW of the dst IP even with analysis_direction = out (when there is no home net, or when the flow comes into
+    the home net), so the profiles created do not depend on the amount of profilers.
+    Lines that are not flows, such as the headers of the files, go to all the profilers.
+    Flows where we can not find the IPs go to all the profilers, and each one only adds the profiles that it owns.
+    """
+    def __init__(self, shards: int):
+        self.shards = shards
+        self.all_shards = tuple(range(shards))
+        # How to find the IPs in the argus and nfdump lines. We learn it from the first text line
+        self.separator = None
+        self.saddr_idx = None
+        self.daddr_idx = None
+        # How to find the IPs in the Zeek logs in TSV format. We learn it from the #fields header of each log
+        self.zeek_separator = '\t'
+        self.zeek_path = ''
+        # #path of the log: (position of id.orig_h, position of id.resp_h)
+        self.zeek_columns = {}
+        # The lines without the #path at the end belong to the last log with a header
+        self.last_zeek_columns = None
+
+    def route(self, line) -> tuple:
+        """ Return the indexes of the profilers that should receive this line """
+        if type(line) == dict:
+            # Zeek line already converted from json
+            return self.route_addresses(line.get('id.orig_h'), line.get('id.resp_h'))
+        if not line:
+            return self.all_shards
+        if line[0] == '#':
+            # Comments and headers of the Zeek files are needed by all the profilers
+            self.add_zeek_header(line)
+            return self.all_shards
+        if line[0] == '{':
+            # Suricata eve.json line. Find the IPs without decoding the json
+            return self.route_addresses(find_json_string(line, 'src_ip'), find_json_string(line, 'dest_ip'))
+        if self.last_zeek_columns is not None:
+            return self.route_zeek_line(line)
+        if self.separator is None:
+            return self.define_columns(line)
+        if self.saddr_idx is None:
+            return self.all_shards
+        fields = line.split(self.separator)
+        try:
+            return self.route_addresses(fields[self.saddr_idx], fields[self.daddr_idx])
+        except (IndexError, TypeError):
+            return self.all_shards
+
+    def route_addresses(self, saddr, daddr) -> tuple:
+        """ Return the profilers that own the profiles of the src and dst IPs """
+        if not saddr:
+            return self.all_shards
+        shard = get_shard(saddr, self.shards)
+        if daddr:
+            rev_shard = get_shard(daddr, self.shards)
+            if rev_shard != shard:
+                return (shard, rev_shard)
+        return (shard,)
+
+    def add_zeek_header(self, line: str):
+        """ Find the positions of the IPs in the #fields header of a Zeek log in TSV format """
+        line = line.rstrip('\r\n')
+        if line.startswith('#separator'):
+            # The separator is written escaped, like '#separator \x09'
+            self.zeek_separator = line.split(' ', 1)[1].encode('utf-8').decode('unicode_escape')
+            return
+        (name, _, value) = line.partition(self.zeek_separator)
+        if name == '#path':
+            self.zeek_path = value
+        elif name == '#fields':
+            fields = value.split(self.zeek_separator)
+            try:
+                columns = (fields.index('id.orig_h'), fields.index('id.resp_h'))
+            except ValueError:
+                # A log without IPs
+                columns = (None, None)
+            self.zeek_columns[self.zeek_path] = columns
+            self.last_zeek_columns = columns
+
+    def route_zeek_line(self, line: str) -> tuple:
+        """ Route a line of a Zeek log in TSV format with the positions of the IPs in the header of its log """
+        values = line.rstrip('\r\n').split(self.zeek_separator)
+        # Is the #path of the log in the last column?
+        (saddr_idx, daddr_idx) = self.zeek_columns.get(values[-1], self.last_zeek_columns)
+        if saddr_idx is None:
+            return self.all_shards
+        try:
+            return self.route_addresses(values[saddr_idx], values[daddr_idx])
+        except IndexError:
+            return self.all_shards
+
+    def define_columns(self, line: str) -> tuple:
+        """
+        Find the separator and the position of the IPs in the first text line.
+        The heuristic is the same as the one of the profiler to find the type of input.
+        """
+        nr_commas = line.count(',')
+        nr_tabs = line.count('\t')
+        if nr_commas > nr_tabs:
+            self.separator = ','
+            if nr_commas + 1 > 40:
+                # nfdump csv
+                self.saddr_idx = 3
+                self.daddr_idx = 4
+                return self.route(line)
+            # Argus. The first line has the names of the columns
+            fields = line.strip().split(self.separator)
+            for index, field in enumerate(fields):
+                if 'srca' in field.lower():
+                    self.saddr_idx = index
+                elif 'dsta' in field.lower():
+                    self.daddr_idx = index
+            return self.all_shards
+        # Lines separated by tabs without a Zeek header. We do not know where the IPs are
+        self.separator = '\t'
+        return self.all_shards
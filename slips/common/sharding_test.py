@@ -0,0 +1,95 @@
+# Tests of the routing of the flows to several profilers.
+# Run them with: python -m pytest slips/common/sharding_test.py
+
+import random
+
+from slips.common.sharding import FlowRouter, get_shard
+
+argus_header = 'StartTime,Dur,Proto,SrcAddr,Sport,Dir,DstAddr,Dport,State,sTos,dTos,TotPkts,TotBytes,SrcBytes,Label'
+
+
+def random_ip(rng) -> str:
+    if rng.random() < 0.2:
+        return '2001:db8::{:x}'.format(rng.randint(1, 0xffff))
+    return '10.0.{}.{}'.format(rng.randint(0, 255), rng.randint(1, 254))
+
+
+def flows(amount: int) -> list:
+    """ (line, saddr, daddr) of Zeek json and suricata flows between random IPv4 and IPv6 addresses """
+    rng = random.Random(1)
+    result = []
+    for number in range(amount):
+        (saddr, daddr) = (random_ip(rng), random_ip(rng))
+        if number % 2:
+            line = {'type': 'conn', 'ts': 1.0, 'id.orig_h': saddr, 'id.resp_h': daddr}
+        else:
+            line = '{"timestamp":"2019-01-01T10:00:00.000000+0000","event_type":"flow","src_ip":"' + saddr + '","dest_ip":"' + daddr + '"}'
+        result.append((line, saddr, daddr))
+    return result
+
+
+def profiles_created(lines: list, shards: int) -> set:
+    """
+    The (profiler, IP) of the profiles created when the lines are routed to the profilers. Each profiler only creates
+    the profiles of the IPs of the flow that it owns, as ProfilerProcess.owns() does
+    """
+    router = FlowRouter(shards)
+    created = set()
+    for (line, saddr, daddr) in lines:
+        for shard in router.route(line):
+            for ip in (saddr, daddr):
+                if shards == 1 or get_shard(ip, shards) == shard:
+                    created.add((shard, ip))
+    return created
+
+
+def test_the_profiles_do_not_depend_on_the_amount_of_profilers():
+    """ Both IPs of a flow may get a profile, even with analysis_direction = out, so the flow goes to both owners """
+    lines = flows(2000)
+    with_one = {ip for (_, ip) in profiles_created(lines, 1)}
+    assert with_one == {ip for (_, saddr, daddr) in lines for ip in (saddr, daddr)}
+    for shards in (2, 4, 7):
+        created = profiles_created(lines, shards)
+        assert {ip for (_, ip) in created} == with_one
+        # Each profile is created by only one profiler
+        assert len(created) == len(with_one)
+
+
+def test_flows_go_to_the_owners_of_both_ips():
+    router = FlowRouter(4)
+    for (line, saddr, daddr) in flows(200):
+        assert set(router.route(line)) == {get_shard(saddr, 4), get_shard(daddr, 4)}
+
+
+def test_argus_and_nfdump_lines():
+    router = FlowRouter(4)
+    assert router.route(argus_header) == (0, 1, 2, 3)
+    line = '2019/04/04 16:23:00.325010,0.02,udp,10.8.0.69,48427,  <->,2001:db8::1,53,CON,0,0,2,142,63,'
+    assert set(router.route(line)) == {get_shard('10.8.0.69', 4), get_shard('2001:db8::1', 4)}
+    # A broken line goes to all the profilers, and each one adds the profiles that it owns
+    assert router.route('2019/04/04 16:23:00.325010,0.02') == (0, 1, 2, 3)
+    router = FlowRouter(4)
+    nfdump_line = ','.join(['2019-01-01 10:00:00', '2019-01-01 10:00:01', '1.000', '10.0.0.1', '10.0.0.2'] + ['0'] * 40)
+    assert set(router.route(nfdump_line)) == {get_shard('10.0.0.1', 4), get_shard('10.0.0.2', 4)}
+
+
+def test_zeek_tabs_lines_use_the_fields_header_of_their_log():
+    router = FlowRouter(4)
+    header = ['#separator \\x09', '#path\tdns', '#fields\tts\tuid\tid.orig_p\tid.orig_h\tid.resp_p\tid.resp_h\tquery', '#types\ttime\tstring\tport\taddr\tport\taddr\tstring']
+    for line in header:
+        assert router.route(line) == (0, 1, 2, 3)
+    assert set(router.route('1.0\tC1\t53\t10.0.0.1\t53\t2001:db8::2\texample.com')) == {get_shard('10.0.0.1', 4), get_shard('2001:db8::2', 4)}
+    # A log without IPs
+    for line in ['#path\tfiles', '#fields\tts\tfuid']:
+        router.route(line)
+    assert router.route('1.0\tF1') == (0, 1, 2, 3)
+    # The merged logs have the #path of their log in the last column
+    assert set(router.route('1.0\tC1\t53\t10.0.0.3\t53\t10.0.0.4\texample.com\tdns')) == {get_shard('10.0.0.3', 4), get_shard('10.0.0.4', 4)}
+
+
+def test_lines_without_ips_go_to_all_the_profilers():
+    router = FlowRouter(3)
+    assert router.route({'type': 'files', 'ts': 1.0}) == (0, 1, 2)
+    assert router.route('{"event_type":"stats"}') == (0, 1, 2)
+    assert router.route('') == (0, 1, 2)
+    assert router.route({'id.orig_h': '10.0.0.1'}) == (get_shard('10.0.0.1', 3),)
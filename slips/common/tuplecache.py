@@ -0,0 +1,57 @@
+# The last tuples used by the profiler, so the letters are computed without reading Redis.
+# For each flow of a tuple we need the times of its last two flows to compute the letter, and then we add the letter
+# to the letters of the tuple. Both used to read and decode all the tuples of the TW from Redis.
+
+from collections import OrderedDict
+
+
+class TupleCache(object):
+    """
+    LRU cache of the last tuples used, as they are stored in the DB:
+    (profileid, twid, tuple_key, tupleid): [letters, [last_last_ts, last_ts]]
+    tuple_key is OutTuples or InTuples.
+    Each profile is owned by one profiler, so the profiler is the only one that writes its tuples. After reading a
+    tuple once from the DB, we keep it updated here and the DB is only used to store it.
+    The letters of a tuple are limited to max_letters. When they are longer, we keep only the last ones, so a
+    connection that lasts for very long does not make its tuple grow without limit. 0 is no limit.
+    """
+    def __init__(self, load, cache_size=10000, max_letters=0):
+        """ load: function(profileid, twid, tuple_key, tupleid) that returns a tuple stored in the DB, or None """
+        self.load = load
+        self.cache_size = cache_size
+        self.max_letters = max_letters
+        self.cache = OrderedDict()
+
+    def get_tuple(self, profileid: str, twid: str, tuple_key: str, tupleid: str):
+        """ Return the tuple as [letters, [last_last_ts, last_ts]], or None if it is new """
+        key = (profileid, twid, tuple_key, tupleid)
+        try:
+            data = self.cache[key]
+            self.cache.move_to_end(key)
+            return data
+        except KeyError:
+            pass
+        data = self.load(profileid, twid, tuple_key, tupleid)
+        self.cache[key] = data
+        if len(self.cache) > self.cache_size:
+            # Forget the tuple that was not used for longer. It is already in the DB
+            self.cache.popitem(last=False)
+        return data
+
+    def get_timestamps(self, profileid: str, twid: str, tuple_key: str, tupleid: str):
+        """ Return the times of the last two flows of the tuple (last_last_ts, last_ts), or False, False if it is new """
+        data = self.get_tuple(profileid, twid, tuple_key, tupleid)
+        if data is None:
+            return False, False
+        (last_last_ts, last_ts) = data[1]
+        return last_last_ts, last_ts
+
+    def add_symbol(self, profileid: str, twid: str, tuple_key: str, tupleid: str, symbol: str, previous_two_timestamps) -> list:
+        """ Add the symbol to the letters of the tuple and store its last two times. Returns the tuple """
+        data = self.get_tuple(profileid, twid, tuple_key, tupleid)
+        letters = symbol if data is None else data[0] + symbol
+        if self.max_letters and len(letters) > self.max_letters:
+            letters = letters[-self.max_letters:]
+        data = [letters, list(previous_two_timestamps)]
+        self.cache[(profileid, twid, tuple_key, tupleid)] = data
+        return data
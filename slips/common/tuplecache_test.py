@@ -0,0 +1,51 @@
+# Tests of the cache of the tuples used by the profiler.
+# Run them with: python -m pytest slips/common/tuplecache_test.py
+
+from slips.common.tuplecache import TupleCache
+
+
+class FakeDB(object):
+    """ The tuples stored in the DB, and the amount of times each one was loaded """
+    def __init__(self, tuples=None):
+        self.tuples = tuples or {}
+        self.loads = []
+
+    def load(self, profileid, twid, tuple_key, tupleid):
+        self.loads.append(tupleid)
+        return self.tuples.get((profileid, twid, tuple_key, tupleid))
+
+
+def test_tuples_are_loaded_once_and_updated_in_the_cache():
+    db = FakeDB({('profile_10.0.0.1', 'timewindow1', 'OutTuples', '1.1.1.1-53-udp'): ['1', [10.0, 11.0]]})
+    cache = TupleCache(db.load)
+    assert cache.get_timestamps('profile_10.0.0.1', 'timewindow1', 'OutTuples', '1.1.1.1-53-udp') == (10.0, 11.0)
+    assert cache.add_symbol('profile_10.0.0.1', 'timewindow1', 'OutTuples', '1.1.1.1-53-udp', 'a', (11.0, 12.0)) == ['1a', [11.0, 12.0]]
+    assert cache.get_timestamps('profile_10.0.0.1', 'timewindow1', 'OutTuples', '1.1.1.1-53-udp') == (11.0, 12.0)
+    # A new tuple
+    assert cache.get_timestamps('profile_10.0.0.1', 'timewindow1', 'InTuples', '1.1.1.1-53-udp') == (False, False)
+    assert cache.add_symbol('profile_10.0.0.1', 'timewindow1', 'InTuples', '1.1.1.1-53-udp', '1', (False, 5.0)) == ['1', [False, 5.0]]
+    assert db.loads == ['1.1.1.1-53-udp', '1.1.1.1-53-udp']
+
+
+def test_the_least_recently_used_tuple_is_evicted():
+    db = FakeDB()
+    cache = TupleCache(db.load, cache_size=2)
+    for tupleid in ('a', 'b', 'a', 'c'):
+        cache.get_tuple('profile_10.0.0.1', 'timewindow1', 'OutTuples', tupleid)
+    # b was used before a, so it was forgotten
+    assert db.loads == ['a', 'b', 'c']
+    assert len(cache.cache) == 2
+    cache.get_tuple('profile_10.0.0.1', 'timewindow1', 'OutTuples', 'a')
+    cache.get_tuple('profile_10.0.0.1', 'timewindow1', 'OutTuples', 'b')
+    assert db.loads == ['a', 'b', 'c', 'b']
+
+
+def test_the_letters_are_bounded_to_the_last_ones():
+    cache = TupleCache(FakeDB().load, max_letters=4)
+    for (number, symbol) in enumerate('abcdef'):
+        data = cache.add_symbol('profile_2001:db8::1', 'timewindow1', 'OutTuples', 'x', symbol, (number, number + 1))
+    assert data == ['cdef', [5, 6]]
+    cache = TupleCache(FakeDB().load, max_letters=0)
+    for symbol in 'abcdef':
+        data = cache.add_symbol('profile_2001:db8::1', 'timewindow1', 'OutTuples', 'x', symbol, (1, 2))
+    assert data[0] == 'abcdef'
@@ -0,0 +1,102 @@
+# Knows which time windows of the profiles can still receive flows, so the profiler can tell the modules when a time
+# window is closed. The modules can then analyze each TW once when it is complete, instead of every time it is modified.
+
+import heapq
+from slips.core import codec
+
+
+class TimeWindowTracker(object):
+    """
+    The open TWs of the profiles of a profiler, with summary counters of their flows.
+    The watermark is the time of the newest flow added. A TW is closed when the watermark passes its end plus grace
+    seconds, because the flows arrive in order of time (or at most the delay of the reorder buffer late).
+    The flows that arrive for a TW that is already closed are counted, but the TW is not closed again.
+    """
+    def __init__(self, grace: float):
+        self.grace = grace
+        # (profileid, twid): summary counters of the TW
+        self.open_tws = {}
+        # Heap of (end of the TW, profileid, twid) of the open TWs
+        self.ends = []
+        self.watermark = None
+        # Flows that arrived after their TW was closed
+        self.late_flows = 0
+        # TWs closed so far
+        self.closed = 0
+
+    def __len__(self):
+        return len(self.open_tws)
+
+    def is_closed(self, end: float) -> bool:
+        """ True if a TW that ends at this time can not receive more flows """
+        return self.watermark is not None and end + self.grace <= self.watermark
+
+    def get_summary(self, profileid: str, twid: str):
+        """ The counters of the TW if it is open, or None """
+        return self.open_tws.get((profileid, twid))
+
+    def open(self, profileid: str, twid: str, start: float, end: float):
+        """ Start tracking a TW. Returns its counters, or None if the TW is already closed """
+        if self.is_closed(end):
+            return None
+        summary = {'start': start, 'end': end, 'flows': 0, 'conn_flows': 0, 'pkts': 0, 'bytes': 0, 'flow_types': {}, 'first_flow': None, 'last_flow': None}
+        self.open_tws[(profileid, twid)] = summary
+        heapq.heappush(self.ends, (end, profileid, twid))
+        return summary
+
+    def add_flow(self, summary, flow):
+        """ Count the flow in the counters of its TW. summary is None if the TW was already closed """
+        if summary is None:
+            self.late_flows += 1
+            return
+        summary['flows'] += 1
+        summary['flow_types'][flow.type] = summary['flow_types'].get(flow.type, 0) + 1
+        if hasattr(flow, 'pkts'):
+            summary['conn_flows'] += 1
+            summary['pkts'] += flow.pkts
+            summary['bytes'] += flow.bytes
+        if summary['first_flow'] is None or flow.starttime < summary['first_flow']:
+            summary['first_flow'] = flow.starttime
+        if summary['last_flow'] is None or flow.starttime > summary['last_flow']:
+            summary['last_flow'] = flow.starttime
+
+    def advance(self, flowtime: float) -> list:
+        """ Move the watermark to the time of a new flow. Returns the TWs closed as (profileid, twid, summary) """
+        if self.watermark is not None and flowtime <= self.watermark:
+            return []
+        self.watermark = flowtime
+        if not self.ends or self.ends[0][0] + self.grace > flowtime:
+            # The usual case: no TW ends yet
+            return []
+        closed = []
+        while self.ends and self.ends[0][0] + self.grace <= flowtime:
+            (_, profileid, twid) = heapq.heappop(self.ends)
+            closed.append((profileid, twid, self.open_tws.pop((profileid, twid))))
+        self.closed += len(closed)
+        return closed
+
+    def close_all(self) -> list:
+        """ Close all the open TWs, when there are no more flows. Returns them as (profileid, twid, summary) """
+        closed = []
+        while self.ends:
+            (_, profileid, twid) = heapq.heappop(self.ends)
+            closed.append((profileid, twid, self.open_tws.pop((profileid, twid))))
+        self.closed += len(closed)
+        return closed
+
+
+def dumps_tw_modified(profileid: str, twid: str, flowtime=None) -> str:
+    """
+    The data of a message of the channel tw_modified. flowtime is the time of the flow that modified the TW, or None.
+    It is json because the profileids of IPv6 addresses have ':'
+    """
+    return codec.dumps({'profileid': profileid, 'twid': twid, 'flowtime': flowtime})
+
+
+def loads_tw_modified(data: str) -> tuple:
+    """ Return (profileid, twid, flowtime) of a message of the channel tw_modified. Raises ValueError if it is not valid """
+    try:
+        message = codec.loads(data)
+        return (message['profileid'], message['twid'], message.get('flowtime'))
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError('Not a message of tw_modified: {!r}'.format(data))
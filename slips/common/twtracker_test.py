@@ -0,0 +1,56 @@
+# Tests of the tracker of the open time windows and of the messages of tw_modified.
+# Run them with: python -m pytest slips/common/twtracker_test.py
+
+import pytest
+
+from slips.common.twtracker import TimeWindowTracker, dumps_tw_modified, loads_tw_modified
+from slips.core.flows import Flow, ConnFlow
+
+
+def test_tw_is_closed_when_the_flows_pass_its_end_plus_grace():
+    tracker = TimeWindowTracker(grace=10)
+    summary = tracker.open('profile_10.0.0.1', 'timewindow1', 0, 100)
+    tracker.add_flow(summary, ConnFlow(type='conn', starttime=50, spkts=2, dpkts=3, sbytes=100, dbytes=200))
+    tracker.add_flow(summary, Flow(type='dns', starttime=40))
+    assert tracker.advance(50) == []
+    assert tracker.advance(109.9) == []
+    closed = tracker.advance(110)
+    assert [(profileid, twid) for (profileid, twid, _) in closed] == [('profile_10.0.0.1', 'timewindow1')]
+    summary = closed[0][2]
+    assert (summary['flows'], summary['conn_flows'], summary['pkts'], summary['bytes']) == (2, 1, 5, 300)
+    assert (summary['flow_types'], summary['first_flow'], summary['last_flow']) == ({'conn': 1, 'dns': 1}, 40, 50)
+    assert (len(tracker), tracker.closed) == (0, 1)
+
+
+def test_tws_are_closed_in_order_of_their_end():
+    tracker = TimeWindowTracker(grace=0)
+    tracker.open('profile_10.0.0.2', 'timewindow2', 100, 200)
+    tracker.open('profile_10.0.0.1', 'timewindow1', 0, 100)
+    tracker.open('profile_10.0.0.3', 'timewindow3', 200, 300)
+    assert [twid for (_, twid, _) in tracker.advance(250)] == ['timewindow1', 'timewindow2']
+    # The watermark does not go back with older flows
+    assert tracker.advance(10) == []
+    assert tracker.watermark == 250
+    assert [twid for (_, twid, _) in tracker.close_all()] == ['timewindow3']
+
+
+def test_late_flows_of_a_closed_tw_are_counted():
+    tracker = TimeWindowTracker(grace=5)
+    tracker.advance(1000)
+    assert tracker.is_closed(100)
+    assert tracker.open('profile_10.0.0.1', 'timewindow1', 0, 100) is None
+    tracker.add_flow(None, Flow(type='conn', starttime=50))
+    assert (tracker.late_flows, len(tracker)) == (1, 0)
+
+
+def test_tw_modified_with_ipv6_profiles():
+    """ The profileids of IPv6 addresses have ':', so the messages must not be split by ':' """
+    for profileid in ('profile_10.0.0.1', 'profile_2001:db8::1', 'profile_fe80::1:2:3:4'):
+        assert loads_tw_modified(dumps_tw_modified(profileid, 'timewindow3', 1554394980.5)) == (profileid, 'timewindow3', 1554394980.5)
+        assert loads_tw_modified(dumps_tw_modified(profileid, 'timewindow3')) == (profileid, 'timewindow3', None)
+
+
+def test_tw_modified_invalid_messages():
+    for data in ('profile_10.0.0.1:timewindow1', '{"twid": "timewindow1"}', '[1, 2]', '1', 1):
+        with pytest.raises(ValueError):
+            loads_tw_modified(data)
@@ -0,0 +1,154 @@
+# Analysis of many flow files in a batch, like all the captures of an incident.
+# Each file is analyzed by its own slips, that uses its own Redis DB, so the profiles of the files are not mixed.
+# Several files are analyzed at the same time, and at the end we print a summary of all of them.
+
+import concurrent.futures
+import configparser
+import glob
+import os
+import queue
+import subprocess
+import sys
+import time
+from datetime import datetime
+from slips.core import codec
+from slips.core.database import Database
+
+# Redis has 16 DBs by default. The DB 0 is left for the slips that are not in a batch
+max_batch_workers = 15
+
+
+def find_batch_files(patterns: list) -> list:
+    """ Return the files of the batch. Each pattern can be a file, a glob, or a folder with flow files """
+    files = []
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            print('[batch] No files found for {}'.format(pattern))
+        for path in paths:
+            if os.path.isdir(path):
+                # In a batch, a folder is a group of flow files and not a Zeek folder
+                paths_in_folder = [os.path.join(path, file) for file in sorted(os.listdir(path)) if not file.startswith('.')]
+                files.extend([file for file in paths_in_folder if os.path.isfile(file)])
+            else:
+                files.append(path)
+    # Each file only once, in the order they were given
+    return list(dict.fromkeys(files))
+
+
+class BatchAnalysis(object):
+    """
+    Run one slips for each file of the batch, with several of them at the same time.
+    Each slips uses a Redis DB that no other slips of the batch is using and stores its log files in its own folder.
+    When it finishes we read the results from its DB, and the DB is used for the next file.
+    """
+    def __init__(self, files: list, workers: int, config_file, verbose, debug, output_folder=None):
+        self.files = files
+        self.workers = max(1, min(workers, max_batch_workers, len(files)))
+        self.config_file = config_file
+        self.verbose = verbose
+        self.debug = debug
+        if not output_folder:
+            output_folder = 'batch-' + datetime.now().strftime('%Y-%m-%d--%H:%M:%S')
+        self.output_folder = output_folder
+        # The DBs that no slips of the batch is using now
+        self.free_dbs = queue.Queue()
+        for db_index in range(1, self.workers + 1):
+            self.free_dbs.put(db_index)
+        self.slips_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'slips.py')
+
+    def get_database(self, db_index: int) -> Database:
+        """ Connect to one of the DBs of the batch without deleting it """
+        config = configparser.ConfigParser()
+        config.add_section('parameters')
+        config.set('parameters', 'redis_db', str(db_index))
+        config.set('parameters', 'deletePrevdb', 'False')
+        database = Database()
+        database.start(config)
+        return database
+
+    def get_results(self, database: Database) -> dict:
+        """ Read the profiles, evidence and blocked time windows that slips left in its DB """
+        results = {'profiles': 0, 'tws': 0, 'evidence': 0, 'blocked': []}
+        for profileid in database.getProfiles():
+            results['profiles'] += 1
+            for (twid, start_time) in database.getTWsfromProfile(profileid):
+                results['tws'] += 1
+                evidence = database.getEvidenceForTW(profileid, twid)
+                if evidence:
+                    results['evidence'] += len(codec.loads(evidence))
+        results['blocked'] = sorted(database.getBlockedTW())
+        return results
+
+    def analyze_file(self, index: int, filename: str) -> dict:
+        """ Thread function. Run slips on one file and return its results """
+        db_index = self.free_dbs.get()
+        try:
+            folder = os.path.join(self.output_folder, '{:03d}-{}'.format(index, os.path.basename(filename)))
+            os.makedirs(folder, exist_ok=True)
+            database = self.get_database(db_index)
+            # The previous file of this DB may have left data if the conf does not delete the DB
+            database.r.flushdb()
+            command = [sys.executable, self.slips_path, '-f', filename, '-d', str(db_index), '-o', folder]
+            if self.config_file:
+                command += ['-c', self.config_file]
+            if self.verbose is not None:
+                command += ['-v', str(self.verbose)]
+            if self.debug is not None:
+                command += ['-e', str(self.debug)]
+            start_time = time.time()
+            with open(os.path.join(folder, 'slips.out'), 'w') as output:
+                returncode = subprocess.call(command, stdout=output, stderr=subprocess.STDOUT)
+            results = self.get_results(database)
+            results.update({'file': filename, 'folder': folder, 'returncode': returncode, 'seconds': time.time() - start_time})
+            database.r.flushdb()
+            return results
+        finally:
+            self.free_dbs.put(db_index)
+
+    def run(self) -> list:
+        """ Analyze all the files and print the summary. Returns the results of each file """
+        os.makedirs(self.output_folder, exist_ok=True)
+        print('[batch] Analyzing {} files with {} slips at the same time. The results are in {}'.format(len(self.files), self.workers, self.output_folder))
+        start_time = time.time()
+        results = [None] * len(self.files)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.analyze_file, index, filename): index for (index, filename) in enumerate(self.files)}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as inst:
+                    results[index] = {'file': self.files[index], 'error': str(inst)}
+                    print('[batch] [{}/{}] Error analyzing {}: {}'.format(done, len(self.files), self.files[index], inst))
+                    continue
+                print('[batch] [{}/{}] {}: {} profiles, {} evidence, {} blocked TWs ({:.1f}s)'.format(done, len(self.files), results[index]['file'], results[index]['profiles'], results[index]['evidence'], len(results[index]['blocked']), results[index]['seconds']))
+        summary = self.get_summary(results, time.time() - start_time)
+        print(summary)
+        with open(os.path.join(self.output_folder, 'summary.txt'), 'w') as summary_file:
+            summary_file.write(summary + '\n')
+        return results
+
+    def get_summary(self, results: list, seconds: float) -> str:
+        """ Text with the results of all the files of the batch """
+        lines = ['', 'Summary of the batch of {} files analyzed in {:.1f}s'.format(len(results), seconds)]
+        lines.append('{:<50} {:>8} {:>9} {:>6} {:>9} {:>8}'.format('File', 'Profiles', 'Time win.', 'Evid.', 'Blocked', 'Seconds'))
+        totals = {'profiles': 0, 'tws': 0, 'evidence': 0, 'blocked': 0}
+        blocked_lines = []
+        for result in results:
+            if 'error' in result:
+                lines.append('{:<50} Error: {}'.format(result['file'][-50:], result['error']))
+                continue
+            status = '' if result['returncode'] == 0 else ' (slips returned {})'.format(result['returncode'])
+            lines.append('{:<50} {:>8} {:>9} {:>6} {:>9} {:>8.1f}{}'.format(result['file'][-50:], result['profiles'], result['tws'], result['evidence'], len(result['blocked']), result['seconds'], status))
+            for key in ('profiles', 'tws', 'evidence'):
+                totals[key] += result[key]
+            totals['blocked'] += len(result['blocked'])
+            for blocked in result['blocked']:
+                # The blocked TWs are stored as profile_<ip>_<twid>
+                blocked_lines.append('\t{}: {}'.format(result['file'], blocked.replace('profile_', '', 1).replace('_', ' ', 1)))
+        lines.append('{:<50} {:>8} {:>9} {:>6} {:>9}'.format('Total', totals['profiles'], totals['tws'], totals['evidence'], totals['blocked']))
+        if blocked_lines:
+            lines.append('Blocked IPs and time windows:')
+            lines.extend(blocked_lines)
+        return '\n'.join(lines)
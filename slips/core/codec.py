@@ -0,0 +1,81 @@
+# JSON encoding and decoding for all of Slips.
+# Each flow is encoded and decoded several times (in the input, in the DB and in the modules), so we use
+# the fastest library installed: orjson, then ujson, and if there is none of them, the json module of python.
+# Use it as:
+#   from slips.core import codec
+#   data = codec.loads(text)
+#   text = codec.dumps(data)
+
+import json
+
+try:
+    import orjson
+
+    backend = 'orjson'
+    JSONDecodeError = orjson.JSONDecodeError
+
+    def loads(data):
+        """ Convert a json str or bytes to a python object """
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Keep the behaviour of json.loads(), that raises TypeError if the data is not a str
+            if not isinstance(data, (str, bytes, bytearray, memoryview)):
+                raise TypeError('the JSON object must be str or bytes, not {}'.format(type(data).__name__))
+            raise
+
+    def dumps(data) -> str:
+        """ Convert a python object to a json str """
+        # Like json.dumps(), allow dictionaries with keys that are not str, like the ports
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+except ImportError:
+    try:
+        import ujson
+
+        backend = 'ujson'
+        JSONDecodeError = getattr(ujson, 'JSONDecodeError', ValueError)
+
+        def loads(data):
+            """ Convert a json str or bytes to a python object """
+            return ujson.loads(data)
+
+        def dumps(data) -> str:
+            """ Convert a python object to a json str """
+            return ujson.dumps(data, escape_forward_slashes=False)
+
+    except ImportError:
+        backend = 'json'
+        JSONDecodeError = json.JSONDecodeError
+        loads = json.loads
+        dumps = json.dumps
+
+
+if __name__ == '__main__':
+    # Benchmark of the serialization done for each flow. Run it as: python3 -m slips.core.codec
+    import timeit
+
+    zeek_line = '{"ts":1538080852.403669,"uid":"CrCvo32GUnyT2VNGwf","id.orig_h":"10.0.2.15","id.orig_p":53788,"id.resp_h":"216.58.201.98","id.resp_p":443,"proto":"tcp","service":"ssl","duration":0.118297,"orig_bytes":1058,"resp_bytes":5465,"conn_state":"SF","missed_bytes":0,"history":"ShADadFf","orig_pkts":12,"orig_ip_bytes":1550,"resp_pkts":13,"resp_ip_bytes":5989,"tunnel_parents":[]}'
+    flow = {'ts': 1538080852.403669, 'dur': 0.118297, 'saddr': '10.0.2.15', 'sport': 53788, 'daddr': '216.58.201.98', 'dport': 443, 'proto': 'tcp', 'origstate': 'SF', 'state': 'Established', 'pkts': 25, 'allbytes': 7539, 'spkts': 12, 'sbytes': 1550, 'appproto': 'ssl', 'label': 'normal'}
+    uid = 'CrCvo32GUnyT2VNGwf'
+
+    def before():
+        """ What was done for each flow with json: the flow went double encoded in the new_flow channel """
+        json.loads(zeek_line)
+        data = json.dumps(flow)
+        to_send = {'profileid': 'profile_10.0.2.15', 'twid': 'timewindow1', 'flow': json.dumps({uid: data}), 'stime': flow['ts']}
+        message = json.loads(json.dumps(to_send))
+        json.loads(json.loads(message['flow'])[uid])
+
+    def after():
+        """ The same with this codec, and the flow encoded only once in the new_flow channel """
+        loads(zeek_line)
+        data = dumps(flow)
+        to_send = {'profileid': 'profile_10.0.2.15', 'twid': 'timewindow1', 'flow': {uid: flow}, 'stime': flow['ts']}
+        message = loads(dumps(to_send))
+        message['flow'][uid]
+
+    amount = 100000
+    time_before = min(timeit.repeat(before, number=amount, repeat=3)) / amount * 1000000
+    time_after = min(timeit.repeat(after, number=amount, repeat=3)) / amount * 1000000
+    print('Serialization cost per flow. json: {:.2f} us. {}: {:.2f} us. Speedup: {:.1f}x'.format(time_before, backend, time_after, time_before / time_after))
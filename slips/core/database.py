@@ -1,6 +1,8 @@
 import redis
 import time
-import json
+from slips.core import codec
+from slips.core.flows import ConnFlow, DNSFlow, HTTPFlow, SSLFlow
+from slips.common.twtracker import dumps_tw_modified
 import sys
 from typing import Tuple, Dict, Set, Callable
 import configparser
@@ -18,6 +20,25 @@ def timing(f):
     return wrap
 
 
+class PrefixedPubSub(object):
+    """
+    The pubsub of the channels of a DB that is not the 0. We subscribe to the channels with the index of the DB in
+    the name, and give the messages to the modules with the name of the channel without it.
+    """
+    def __init__(self, pubsub, prefix):
+        self.pubsub = pubsub
+        self.prefix = prefix
+
+    def get_message(self, *args, **kwargs):
+        message = self.pubsub.get_message(*args, **kwargs)
+        if message and type(message['channel']) == str and message['channel'].startswith(self.prefix):
+            message['channel'] = message['channel'][len(self.prefix):]
+        return message
+
+    def __getattr__(self, name):
+        return getattr(self.pubsub, name)
+
+
 class Database(object):
     """ Database object management """
 
@@ -38,10 +59,21 @@ class Database(object):
         except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError, KeyError):
             # There is a conf, but there is no option, or no section or no configuration file specified
             self.deletePrevdb = True
+        # Index of the Redis DB. Several slips can run at the same time, each one in its own DB
+        try:
+            self.db_index = int(self.config.get('parameters', 'redis_db'))
+        except (configparser.NoOptionError, configparser.NoSectionError, NameError, ValueError, KeyError):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.db_index = 0
+        # The channels of redis are shared by all the DBs. So the channels of the other DBs have the index in the name
+        if self.db_index:
+            self.channel_prefix = 'slipsdb{}:'.format(self.db_index)
+        else:
+            self.channel_prefix = ''
         # Create the connection to redis
         if not hasattr(self, 'r'):
             try:
-                self.r = redis.StrictRedis(host='localhost', port=6379, db=0, charset="utf-8", decode_responses=True) #password='password')
+                self.r = redis.StrictRedis(host='localhost', port=6379, db=self.db_index, charset="utf-8", decode_responses=True) #password='password')
                 if self.deletePrevdb:
                     print('Deleting the previous stored DB in Redis.')
                     self.r.flushdb()
@@ -76,11 +108,12 @@ class Database(object):
         Add a new profile to the DB. Both the list of profiles and the hasmap of profile data
         Profiles are stored in two structures. A list of profiles (index) and individual hashmaps for each profile (like a table)
         Duration is only needed for registration purposes in the profile. Nothing operational
+        Returns True if the profile was new. Several profilers can add the same profile at the same time, but only the
+        one whose sadd added it to the index creates it.
         """
         try:
-            if not self.r.sismember('profiles', str(profileid)):
-                # Add the profile to the index. The index is called 'profiles'
-                self.r.sadd('profiles', str(profileid))
+            # Add the profile to the index. The index is called 'profiles'. sadd returns 0 if it was already there
+            if self.r.sadd('profiles', str(profileid)):
                 # Create the hashmap with the profileid. The hasmap of each profile is named with the profileid
                 self.r.hset(profileid, 'Starttime', starttime)
                 # For now duration of the TW is fixed
@@ -94,7 +127,8 @@ class Database(object):
                 self.publish('new_profile', ip)
                 # After we stored the new, check for all of them (new or not) if we have some detections already.
                 # TODO
-
+                return True
+            return False
         except redis.exceptions.ResponseError as inst:
             self.outputqueue.put('00|database|Error in addProfile in database.py')
             self.outputqueue.put('00|database|{}'.format(type(inst)))
@@ -162,28 +196,6 @@ class Database(object):
         data = self.r.hget(profileid + self.separator + twid, 'DstIPs')
         return data
 
-    def getT2ForProfileTW(self, profileid, twid, tupleid, tuple_key: str):
-        """
-        Get T1 and the previous_time for this previous_time, twid and tupleid
-        """
-        try:
-            hash_id = profileid + self.separator + twid
-            data = self.r.hget(hash_id, tuple_key)
-
-            if not data:
-                return False, False
-            data = json.loads(data)
-            try:
-                (_, previous_two_timestamps) = data[tupleid]
-                return previous_two_timestamps
-            except KeyError:
-                return False, False
-        except Exception as e:
-            self.outputqueue.put('01|database|[DB] Error in getT2ForProfileTW in database.py')
-            self.outputqueue.put('01|database|[DB] {}'.format(type(e)))
-            self.outputqueue.put('01|database|[DB] {}'.format(e))
-            self.outputqueue.put("01|profiler|[Profile] {}".format(traceback.format_exc()))
-
     def hasProfile(self, profileid):
         """ Check if we have the given profile """
         return self.r.sismember('profiles', profileid)
@@ -271,6 +283,19 @@ class Database(object):
             self.outputqueue.put('01|database|Error in addNewTW')
             self.outputqueue.put('01|database|{}'.format(e))
 
+    def addTW(self, profileid, twid, startoftw):
+        """
+        Add the TW with this id to the list of tw for the given profile, without reading the other TWs.
+        Used with the aligned time windows, where the profiler computes the id from the time of the flow.
+        Adding a TW that already exists does not change it.
+        """
+        try:
+            self.r.zadd('tws' + profileid, {twid: float(startoftw)})
+            self.outputqueue.put('04|database|[DB]: Added to DB for profile {} the TW with id {}. Time: {} '.format(profileid, twid, startoftw))
+        except redis.exceptions.ResponseError as e:
+            self.outputqueue.put('01|database|Error in addTW')
+            self.outputqueue.put('01|database|{}'.format(e))
+
     def getTimeTW(self, profileid, twid):
         """ Return the time when this TW in this profile was created """
         # Get all the TW for this profile
@@ -300,7 +325,7 @@ class Database(object):
         """
         self.r.srem('ModifiedTWForLogs', profileid + self.separator + twid)
 
-    def markProfileTWAsModified(self, profileid, twid):
+    def markProfileTWAsModified(self, profileid, twid, flowtime=None):
         """ 
         Mark a TW in a profile as not modified 
         (As a side effect, it can create it if its not there (What does this meas?))
@@ -308,17 +333,29 @@ class Database(object):
         The TW are marked for different processes because some of them 'wake up' 
         every X amount of time and need to check what was modified from their
         points of view. This is why we are putting mark for different modules
+        The data is the json of the profileid, the twid and the time of the flow that modified the TW, or None
         """
         self.r.sadd('ModifiedTWForLogs', profileid + self.separator + twid)
-        self.publish('tw_modified', profileid + ':' + twid)
+        self.publish('tw_modified', dumps_tw_modified(profileid, twid, flowtime))
+
+    def markProfileTWAsClosed(self, profileid, twid, summary: dict):
+        """
+        Publish that this TW of this profile can not receive more flows, with the summary counters of its flows.
+        The modules can do their final analysis of the TW when they receive it
+        """
+        data = dict(summary)
+        data['profileid'] = profileid
+        data['twid'] = twid
+        self.publish('tw_closed', codec.dumps(data))
 
     # old def add_out_dstips(self, profileid, twid, daddr_as_obj, state, pkts, proto, dport):
     # old def add_out_dstips(self, profileid, twid, columns):
-    def add_ips(self, profileid, twid, ip_as_obj, columns, role: str):
+    def add_ips(self, profileid, twid, ip_as_obj, flow: ConnFlow, role: str):
         """
         Function to add information about the IP
         The flow can go out of the IP (we are acting as Client) or into the IP (we are acting as Server)
         ip_as_obj: IP to add. It can be a dstIP or srcIP depending on the rol
+        flow: the ConnFlow record of the flow
         role: 'Client' or 'Server'
 
         This function does two things:
@@ -327,16 +364,12 @@ class Database(object):
                pefect structure to detect vertical port scans later on
         """
         try:
-            dport = columns['dport']
-            sport = columns['sport']
-            totbytes = columns['bytes']
-            sbytes = columns['sbytes']
-            pkts = columns['pkts']
-            spkts = columns['spkts']
-            state = columns['state']
-            proto = columns['proto'].upper()
-            daddr = columns['daddr']
-            saddr = columns['saddr']
+            dport = flow.dport
+            sport = flow.sport
+            totbytes = flow.bytes
+            pkts = flow.pkts
+            state = flow.state
+            proto = flow.proto.upper()
 
             # Depending if the traffic is going out or not, we are Client or Server
             if role == 'Client':
@@ -359,7 +392,7 @@ class Database(object):
                 ipdata = self.getIPData(str(ip_as_obj))
                 if type(ipdata) == str:
                     # Convert the str to a dict
-                    ipdata = json.loads(ipdata)
+                    ipdata = codec.loads(ipdata)
                 #for key in ipdata:
                 #self.print('For IP {}, data stored: {}'.format(str(ip_as_obj), ipdata))
                 # If there are detections, store the evidence.
@@ -388,18 +421,18 @@ class Database(object):
                 data = {}
             try:
                 # Convert the json str to a dictionary
-                data = json.loads(data)
+                data = codec.loads(data)
                 # Add 1 because we found this ip again
                 self.print('add_ips(): Not the first time for this addr. Add 1 to {}'.format(str(ip_as_obj)), 0, 5)
                 data[str(ip_as_obj)] += 1
                 # Convet the dictionary to json
-                data = json.dumps(data)
+                data = codec.dumps(data)
             except (TypeError, KeyError) as e:
                 # There was no previous data stored in the DB
                 self.print('add_ips(): First time for addr {}. Count as 1'.format(str(ip_as_obj)), 0, 5)
                 data[str(ip_as_obj)] = 1
                 # Convet the dictionary to json
-                data = json.dumps(data)
+                data = codec.dumps(data)
             # Store the dstips in the dB
             self.r.hset(hash_id, type_host_key + 'IPs', str(data))
 
@@ -416,15 +449,15 @@ class Database(object):
                 # We had this port
                 # We need to add all the data
                 innerdata['totalflows'] += 1
-                innerdata['totalpkt'] += int(pkts)
-                innerdata['totalbytes'] += int(totbytes)
+                innerdata['totalpkt'] += pkts
+                innerdata['totalbytes'] += totbytes
                 # Store for each dstip, the dstports
                 temp_dstports= innerdata['dstports']
                 try:
-                    temp_dstports[str(dport)] += int(pkts)
+                    temp_dstports[str(dport)] += pkts
                 except KeyError:
                     # First time for this ip in the inner dictionary
-                    temp_dstports[str(dport)] = int(pkts)
+                    temp_dstports[str(dport)] = pkts
                 innerdata['dstports'] = temp_dstports
                 prev_data[str(ip_as_obj)] = innerdata
                 self.print('add_ips() Adding for dst port {}. POST Data: {}'.format(dport, innerdata), 0, 3)
@@ -432,21 +465,21 @@ class Database(object):
                 # First time for this flow
                 innerdata = {}
                 innerdata['totalflows'] = 1
-                innerdata['totalpkt'] = int(pkts)
-                innerdata['totalbytes'] = int(totbytes)
+                innerdata['totalpkt'] = pkts
+                innerdata['totalbytes'] = totbytes
                 temp_dstports = {}
-                temp_dstports[str(dport)] = int(pkts)
+                temp_dstports[str(dport)] = pkts
                 innerdata['dstports'] = temp_dstports
                 self.print('add_ips() First time for dst port {}. Data: {}'.format(dport, innerdata), 0, 3)
                 prev_data[str(ip_as_obj)] = innerdata
             # Convert the dictionary to json
-            data = json.dumps(prev_data)
+            data = codec.dumps(prev_data)
             # Create the key for storing
             key_name = type_host_key + 'IPs' + role + proto.upper() + summaryState
             # Store this data in the profile hash
             self.r.hset( profileid + self.separator + twid, key_name, str(data))
             # Mark the tw as modified
-            self.markProfileTWAsModified(profileid, twid)
+            self.markProfileTWAsModified(profileid, twid, flow.starttime)
         except Exception as inst:
             self.outputqueue.put('01|database|[DB] Error in add_ips in database.py')
             self.outputqueue.put('01|database|[DB] Type inst: {}'.format(type(inst)))
@@ -461,79 +494,55 @@ class Database(object):
 
 
 
-    def add_tuple(self, profileid, twid, tupleid, data_tuple, role):
+    def getTupleFromProfileTW(self, profileid, twid, tuple_key: str, tupleid: str):
         """
-        Add the tuple going in or out for this profile
-        role: 'Client' or 'Server'
+        Get one tuple of this profileid and twid as [letters, [last_last_ts, last_ts]], or None if it is not there.
+        tuple_key is OutTuples or InTuples
+        Each tuple is a field of the hash <profileid>_<twid>_<tuple_key>, so a tuple is stored without rewriting the
+        rest of the tuples of the TW.
         """
-        # If the traffic is going out it is part of our outtuples, if not, part of our intuples
-        if role == 'Client':
-            tuple_key = 'OutTuples'
-        elif role == 'Server':
-            tuple_key = 'InTuples'
+        data = self.r.hget(profileid + self.separator + twid + self.separator + tuple_key, tupleid)
+        if not data:
+            return None
+        return codec.loads(data)
+
+    def setTupleForProfileTW(self, profileid, twid, tuple_key: str, tupleid: str, data):
+        """ Store one tuple of this profileid and twid, and mark the TW as modified. data is [letters, [last_last_ts, last_ts]] """
         try:
-            self.print('Add_tuple called with profileid {}, twid {}, tupleid {}, data {}'.format(profileid, twid, tupleid, data_tuple), 0, 5)
-            # Get all the InTuples or OutTuples for this profileid in this TW
-            hash_id = profileid + self.separator + twid
-            data = self.r.hget(hash_id, tuple_key)
-            # Separate the symbold to add and the previous data
-            (symbol_to_add, previous_two_timestamps) = data_tuple
-            if not data:
-                # Must be str so we can convert later
-                data = '{}'
-            # Convert the json str to a dictionary
-            data = json.loads(data)
-            try:
-                stored_tuple = data[tupleid]
-                # Disasemble the input
-                self.print('Not the first time for tuple {} as an {} for {} in TW {}. Add the symbol: {}. Store previous_times: {}. Prev Data: {}'.format(tupleid, tuple_key, profileid, twid, symbol_to_add, previous_two_timestamps, data), 0, 5)
-                # Get the last symbols of letters in the DB
-                prev_symbols = data[tupleid][0]
-                # Add it to form the string of letters
-                new_symbol = prev_symbols + symbol_to_add
-                # Bundle the data together
-                new_data = (new_symbol, previous_two_timestamps)
-                data[tupleid] = new_data
-                self.print('\tLetters so far for tuple {}: {}'.format(tupleid, new_symbol), 0, 6)
-                data = json.dumps(data)
-            except (TypeError, KeyError) as e:
-                # TODO check that this condition is triggered correctly only for the first case and not the rest after...
-                # There was no previous data stored in the DB
-                self.print('First time for tuple {} as an {} for {} in TW {}'.format(tupleid, tuple_key, profileid, twid), 0, 5)
-                # Here get the info from the ipinfo key
-                new_data = (symbol_to_add, previous_two_timestamps)
-                data[tupleid] = new_data
-                # Convet the dictionary to json
-                data = json.dumps(data)
-            # Store the new data on the db
-            self.r.hset(hash_id, tuple_key, str(data))
+            self.r.hset(profileid + self.separator + twid + self.separator + tuple_key, tupleid, codec.dumps(data))
             # Mark the tw as modified
             self.markProfileTWAsModified(profileid, twid)
         except Exception as inst:
-            self.outputqueue.put('01|database|[DB] Error in add_tuple in database.py')
+            self.outputqueue.put('01|database|[DB] Error in setTupleForProfileTW in database.py')
             self.outputqueue.put('01|database|[DB] Type inst: {}'.format(type(inst)))
             self.outputqueue.put('01|database|[DB] Inst: {}'.format(inst))
-            self.outputqueue.put('01|database|[DB] {}'.format(traceback.format_exc()))
 
-    def add_port(self, profileid: str, twid: str, ip_address: str, columns: dict, role: str, port_type: str):
+    def getTuplesfromProfileTW(self, profileid, twid, tuple_key: str):
+        """
+        Get all the tuples of this profileid and twid as a json dict of tupleid: [letters, [last_last_ts, last_ts]],
+        or None if there are none. The stored tuples are already json, so they are joined without decoding them
+        """
+        data = self.r.hgetall(profileid + self.separator + twid + self.separator + tuple_key)
+        if not data:
+            return None
+        return '{' + ','.join(codec.dumps(tupleid) + ':' + tuple_data for (tupleid, tuple_data) in data.items()) + '}'
+
+    def add_port(self, profileid: str, twid: str, ip_address: str, flow: ConnFlow, role: str, port_type: str):
         """
         Store info learned from ports for this flow
         The flow can go out of the IP (we are acting as Client) or into the IP (we are acting as Server)
+        flow: the ConnFlow record of the flow
         role: 'Client' or 'Server'. Client also defines that the flow is going out, Server that is going in
         port_type: 'Dst' or 'Src'. Depending if this port was a destination port or a source port
         """
         try:
             # Extract variables from columns
-            dport = columns['dport']
-            sport = columns['sport']
-            totbytes = columns['bytes']
-            sbytes = columns['sbytes']
-            pkts = columns['pkts']
-            spkts = columns['spkts']
-            state = columns['state']
-            proto = columns['proto'].upper()
-            daddr = columns['daddr']
-            saddr = columns['saddr']
+            dport = flow.dport
+            sport = flow.sport
+            totbytes = flow.bytes
+            pkts = flow.pkts
+            state = flow.state
+            proto = flow.proto.upper()
 
             # Choose which port to use based if we were asked Dst or Src
             if port_type == 'Dst':
@@ -561,13 +570,13 @@ class Database(object):
             try:
                 innerdata = prev_data[port]
                 innerdata['totalflows'] += 1
-                innerdata['totalpkt'] += int(pkts)
-                innerdata['totalbytes'] += int(totbytes)
+                innerdata['totalpkt'] += pkts
+                innerdata['totalbytes'] += totbytes
                 temp_dstips = innerdata[ip_key]
                 try:
-                    temp_dstips[str(ip_address)] += int(pkts)
+                    temp_dstips[str(ip_address)] += pkts
                 except KeyError:
-                    temp_dstips[str(ip_address)] = int(pkts)
+                    temp_dstips[str(ip_address)] = pkts
                 innerdata[ip_key] = temp_dstips
                 prev_data[port] = innerdata
                 self.print('add_port(): Adding this new info about port {} for {}. Key: {}. NewData: {}'.format(port, profileid, key_name, innerdata), 0, 3)
@@ -575,23 +584,23 @@ class Database(object):
                 # First time for this flow
                 innerdata = {}
                 innerdata['totalflows'] = 1
-                innerdata['totalpkt'] = int(pkts)
-                innerdata['totalbytes'] = int(totbytes)
+                innerdata['totalpkt'] = pkts
+                innerdata['totalbytes'] = totbytes
                 temp_dstips = {}
-                temp_dstips[str(ip_address)] = int(pkts)
+                temp_dstips[str(ip_address)] = pkts
                 innerdata[ip_key] = temp_dstips
                 prev_data[port] = innerdata
                 self.print('add_port(): First time for port {} for {}. Key: {}. Data: {}'.format(port, profileid, key_name, innerdata), 0, 3)
             # self.outputqueue.put('01|database|[DB] {} '.format(ip_address))
 
             # Convet the dictionary to json
-            data = json.dumps(prev_data)
+            data = codec.dumps(prev_data)
             self.print('add_port(): Storing info about port {} for {}. Key: {}. Data: {}'.format(port, profileid, key_name, prev_data), 0, 3)
             # Store this data in the profile hash
             hash_key = profileid + self.separator + twid
             self.r.hset(hash_key, key_name, str(data))
             # Mark the tw as modified
-            self.markProfileTWAsModified(profileid, twid)
+            self.markProfileTWAsModified(profileid, twid, flow.starttime)
         except Exception as inst:
             self.outputqueue.put('01|database|[DB] Error in add_port in database.py')
             self.outputqueue.put('01|database|[DB] Type inst: {}'.format(type(inst)))
@@ -606,7 +615,7 @@ class Database(object):
             data = self.r.hget(hash_key, key_name)
             value = {}
             if data:
-                portdata = json.loads(data)
+                portdata = codec.loads(data)
                 value = portdata
             return value
         except Exception as inst:
@@ -616,18 +625,16 @@ class Database(object):
 
     def getOutTuplesfromProfileTW(self, profileid, twid):
         """ Get the out tuples """
-        data = self.r.hget(profileid + self.separator + twid, 'OutTuples')
-        return data
+        return self.getTuplesfromProfileTW(profileid, twid, 'OutTuples')
 
     def getInTuplesfromProfileTW(self, profileid, twid):
         """ Get the in tuples """
-        data = self.r.hget(profileid + self.separator + twid, 'InTuples')
-        return data
+        return self.getTuplesfromProfileTW(profileid, twid, 'InTuples')
 
     def getFinalStateFromFlags(self, state, pkts):
         """ 
         Analyze the flags given and return a summary of the state. Should work with Argus and Bro flags
-        We receive the pakets to distinguish some Reset connections
+        We receive the pakets to distinguish some Reset connections. pkts is already a number
         """
         try:
             #self.outputqueue.put('06|database|[DB]: State received {}'.format(state))
@@ -730,7 +737,7 @@ class Database(object):
                     # TCP. When -z B is not used in argus, states are single words. Most connections are reseted when finished and therefore are established
                     # It can happen that is reseted being not established, but we can't tell without -z b.
                     # So we use as heuristic the amount of packets. If <=3, then is not established because the OS retries 3 times.
-                    if int(pkts) <= 3:
+                    if pkts <= 3:
                         return 'NotEstablished'
                     else:
                         return 'Established'
@@ -738,7 +745,7 @@ class Database(object):
                     # TCP. When -z B is not used in argus, states are single words. Most connections are finished with FIN when finished and therefore are established
                     # It can happen that is finished being not established, but we can't tell without -z b.
                     # So we use as heuristic the amount of packets. If <=3, then is not established because the OS retries 3 times.
-                    if int(pkts) <= 3:
+                    if pkts <= 3:
                         return 'NotEstablished'
                     else:
                         return 'Established'
@@ -790,7 +797,7 @@ class Database(object):
         # See if we have and get the current evidence stored in the DB fot this profileid in this twid
         current_evidence = self.getEvidenceForTW(profileid, twid)
         if current_evidence:
-            current_evidence = json.loads(current_evidence)
+            current_evidence = codec.loads(current_evidence)
         else:
             # We never had any evidence for nothing
             current_evidence = {}
@@ -801,7 +808,7 @@ class Database(object):
         data.append(description)
         current_evidence[key] = data
 
-        current_evidence_json = json.dumps(current_evidence)
+        current_evidence_json = codec.dumps(current_evidence)
         self.r.hset(profileid + self.separator + twid, 'Evidence', str(current_evidence_json))
         # Tell everyone an evidence was added
         self.publish('evidence_added', profileid + ':' + twid)
@@ -847,7 +854,7 @@ class Database(object):
         """
         data = self.r.hget('IPsInfo', ip)
         if data:
-            data = json.loads(data)
+            data = codec.loads(data)
         else:
             data = {}
         # Always return a dictionary
@@ -856,7 +863,7 @@ class Database(object):
     def getallIPs(self):
         """ Return list of all IPs in the DB """
         data = self.r.hgetall('IPsInfo')
-        #data = json.loads(data)
+        #data = codec.loads(data)
         return data
 
     def setNewIP(self, ip):
@@ -908,7 +915,7 @@ class Database(object):
         for key in iter(ipdata):
             if type(data) == str:
                 # Convert the str to a dict
-                data = json.loads(data)
+                data = codec.loads(data)
             to_store = ipdata[key]
 
             # If the key is already stored, do not modify it
@@ -918,41 +925,55 @@ class Database(object):
                 # Append the new data
                 data[key] = to_store
                 #data.update(ipdata)
-                data = json.dumps(data)
+                data = codec.dumps(data)
                 self.r.hset('IPsInfo', ip, data)
                 self.print('\tNew Info added to IP {}: {}'.format(ip, data),8,8)
 
-    def subscribe(self, channel):
-        """ Subscribe to channel """
-        # For when a TW is modified
+    def subscribe(self, *channels):
+        """
+        Subscribe to the channels.
+        A module that subscribes to several channels receives all their messages in order from the same pubsub,
+        and can tell them apart with message['channel']
+        """
         pubsub = self.r.pubsub()
-        if 'tw_modified' in channel:
-            pubsub.subscribe(channel)
-        elif 'evidence_added' in channel:
-            pubsub.subscribe(channel)
-        elif 'new_ip' in channel:
-            pubsub.subscribe(channel)
-        elif 'new_flow' in channel:
-            pubsub.subscribe(channel)
-        elif 'new_dns' in channel:
-            pubsub.subscribe(channel)
-        elif 'new_http' in channel:
-            pubsub.subscribe(channel)
-        elif 'new_ssl' in channel:
-            pubsub.subscribe(channel)
-        elif 'new_profile' in channel:
-            pubsub.subscribe(channel)
-        elif 'ip_Threat_Intelligence' in channel:
-            pubsub.subscribe(channel)
+        for channel in channels:
+            # For when a TW is modified
+            if 'tw_modified' in channel:
+                pubsub.subscribe(self.channel_prefix + channel)
+            # For when a TW can not receive more flows
+            elif 'tw_closed' in channel:
+                pubsub.subscribe(self.channel_prefix + channel)
+            elif 'evidence_added' in channel:
+                pubsub.subscribe(self.channel_prefix + channel)
+            elif 'new_ip' in channel:
+                pubsub.subscribe(self.channel_prefix + channel)
+            elif 'new_flow' in channel:
+                pubsub.subscribe(self.channel_prefix + channel)
+            elif 'new_dns' in channel:
+                pubsub.subscribe(self.channel_prefix + channel)
+            elif 'new_http' in channel:
+                pubsub.subscribe(self.channel_prefix + channel)
+            elif 'new_ssl' in channel:
+                pubsub.subscribe(self.channel_prefix + channel)
+            elif 'new_profile' in channel:
+                pubsub.subscribe(self.channel_prefix + channel)
+            elif 'ip_Threat_Intelligence' in channel:
+                pubsub.subscribe(self.channel_prefix + channel)
+        if self.channel_prefix:
+            pubsub = PrefixedPubSub(pubsub, self.channel_prefix)
         return pubsub
 
     def publish(self, channel, data):
         """ Publish something """
-        self.r.publish(channel, data)
+        self.r.publish(self.channel_prefix + channel, data)
 
     def publish_stop(self):
         """ Publish stop command to terminate slips """
-        all_channels_list = self.r.pubsub_channels()
+        if self.channel_prefix:
+            all_channels_list = self.r.pubsub_channels(self.channel_prefix + '*')
+        else:
+            # Do not stop the slips that use other DBs
+            all_channels_list = [channel for channel in self.r.pubsub_channels() if not channel.startswith('slipsdb')]
         self.print('Sending the stop signal to all listeners',3,3)
         for channel in all_channels_list:
             self.r.publish(channel, 'stop_process')
@@ -993,55 +1014,55 @@ class Database(object):
         """ Return the amount of each label so far """
         return self.r.zrange('labels', 0, -1, withscores=True)
 
-    def add_flow(self, profileid='', twid='', stime='', dur='', saddr='', sport='', daddr='', dport='', proto='', state='', pkts='', allbytes='', spkts='', sbytes='', appproto='', uid='', label=''):
+    def add_flow(self, profileid: str, twid: str, flow: ConnFlow, saddr: str, daddr: str, uid: str, label=''):
         """
         Function to add a flow by interpreting the data. The flow is added to the correct TW for this profile.
-
+        saddr and daddr are the IPs of the flow already parsed, and uid the uid of the flow or the one we generated for it
         """
+        stime = flow.starttime
         data = {}
         #data['uid'] = uid
         data['ts'] = stime
-        data['dur'] = dur
+        data['dur'] = flow.dur
         data['saddr'] = saddr
-        data['sport'] = sport
+        data['sport'] = flow.sport
         data['daddr'] = daddr
-        data['dport'] = dport
-        data['proto'] = proto
+        data['dport'] = flow.dport
+        data['proto'] = flow.proto
         # Store the interpreted state, not the raw one
-        summaryState = __database__.getFinalStateFromFlags(state, pkts)
-        data['origstate'] = state
+        summaryState = __database__.getFinalStateFromFlags(flow.state, flow.pkts)
+        data['origstate'] = flow.state
         data['state'] = summaryState
-        data['pkts'] = pkts
-        data['allbytes'] = allbytes
-        data['spkts'] = spkts
-        data['sbytes'] = sbytes
-        data['appproto'] = appproto
+        data['pkts'] = flow.pkts
+        data['allbytes'] = flow.bytes
+        data['spkts'] = flow.spkts
+        data['sbytes'] = flow.sbytes
+        data['appproto'] = flow.appproto
         data['label'] = label
 
         # Convert to json string
-        data = json.dumps(data)
+        json_data = codec.dumps(data)
         # Store in the hash 10.0.0.1_timewindow1, a key uid, with data
-        value = self.r.hset(profileid + self.separator + twid + self.separator + 'flows', uid, data)
+        value = self.r.hset(profileid + self.separator + twid + self.separator + 'flows', uid, json_data)
         if value:
             # The key was not there before. So this flow is not repeated
             # Store the label in our uniq set, and increment it by 1
             if label:
                 self.r.zincrby('labels', 1, label)
-            # We can publish the flow directly without asking for it, but its good to maintain the format given by the get_flow() function.
-            flow = self.get_flow(profileid, twid, uid)
-            # Get the dictionary and convert to json string
-            flow = json.dumps(flow)
+            # We publish the flow directly without asking for it. The format is the one of the get_flow() function, {uid: flow},
+            # but the flow is a dictionary and not a json string, so the modules only decode the message once.
+            flow = {uid: data}
             # Prepare the data to publish.
             to_send = {}
             to_send['profileid'] = profileid
             to_send['twid'] = twid
             to_send['flow'] = flow
             to_send['stime'] = stime
-            to_send = json.dumps(to_send)
+            to_send = codec.dumps(to_send)
             self.publish('new_flow', to_send)
-            self.print('Adding complete flow to DB: {}'.format(data), 5, 0)
+            self.print('Adding complete flow to DB: {}'.format(json_data), 5, 0)
 
-    def add_out_ssl(self, profileid, twid, flowtype, uid, version, cipher, resumed, established, cert_chain_fuids, client_cert_chain_fuids, subject, issuer, validation_status, curve, server_name):
+    def add_out_ssl(self, profileid, twid, uid, flow: SSLFlow):
         """
         Store in the DB an ssl request
         All the type of flows that are not netflows are stored in a separate hash ordered by uid.
@@ -1049,31 +1070,31 @@ class Database(object):
         """
         data = {}
         data['uid'] = uid
-        data['type'] = flowtype
-        data['version'] = version
-        data['cipher'] = cipher
-        data['resumed'] = resumed
-        data['established'] = established
-        data['cert_chain_fuids'] = cert_chain_fuids
-        data['client_cert_chain_fuids'] = client_cert_chain_fuids
-        data['subject'] = subject
-        data['issuer'] = issuer
-        data['validation_status'] = validation_status
-        data['curve'] = curve
-        data['server_name'] = server_name
+        data['type'] = flow.type
+        data['version'] = flow.sslversion
+        data['cipher'] = flow.cipher
+        data['resumed'] = flow.resumed
+        data['established'] = flow.established
+        data['cert_chain_fuids'] = flow.cert_chain_fuids
+        data['client_cert_chain_fuids'] = flow.client_cert_chain_fuids
+        data['subject'] = flow.subject
+        data['issuer'] = flow.issuer
+        data['validation_status'] = flow.validation_status
+        data['curve'] = flow.curve
+        data['server_name'] = flow.server_name
 
         # Convert to json string
-        data = json.dumps(data)
+        data = codec.dumps(data)
         self.r.hset(profileid + self.separator + twid + self.separator + 'altflows', uid, data)
         to_send = {}
         to_send['profileid'] = profileid
         to_send['twid'] = twid
         to_send['flow'] = data
-        to_send = json.dumps(to_send)
+        to_send = codec.dumps(to_send)
         self.publish('new_ssl', to_send)
         self.print('Adding SSL flow to DB: {}'.format(data), 5,0)
 
-    def add_out_http(self, profileid, twid, flowtype, uid, method, host, uri, version, user_agent, request_body_len, response_body_len, status_code, status_msg, resp_mime_types, resp_fuids):
+    def add_out_http(self, profileid, twid, uid, flow: HTTPFlow):
         """
         Store in the DB a http request
         All the type of flows that are not netflows are stored in a separate hash ordered by uid.
@@ -1081,30 +1102,30 @@ class Database(object):
         """
         data = {}
         data['uid'] = uid
-        data['type'] = flowtype
-        data['method'] = method
-        data['host'] = host
-        data['uri'] = uri
-        data['version'] = version
-        data['user_agent'] = user_agent
-        data['request_body_len'] = request_body_len
-        data['response_body_len'] = response_body_len
-        data['status_code'] = status_code
-        data['status_msg'] = status_msg
-        data['resp_mime_types'] = resp_mime_types
-        data['resp_fuids'] = resp_fuids
+        data['type'] = flow.type
+        data['method'] = flow.method
+        data['host'] = flow.host
+        data['uri'] = flow.uri
+        data['version'] = flow.httpversion
+        data['user_agent'] = flow.user_agent
+        data['request_body_len'] = flow.request_body_len
+        data['response_body_len'] = flow.response_body_len
+        data['status_code'] = flow.status_code
+        data['status_msg'] = flow.status_msg
+        data['resp_mime_types'] = flow.resp_mime_types
+        data['resp_fuids'] = flow.resp_fuids
         # Convert to json string
-        data = json.dumps(data)
+        data = codec.dumps(data)
         self.r.hset(profileid + self.separator + twid + self.separator + 'altflows', uid, data)
         to_send = {}
         to_send['profileid'] = profileid
         to_send['twid'] = twid
         to_send['flow'] = data
-        to_send = json.dumps(to_send)
+        to_send = codec.dumps(to_send)
         self.publish('new_http', to_send)
         self.print('Adding HTTP flow to DB: {}'.format(data), 5,0)
 
-    def add_out_dns(self, profileid, twid, flowtype, uid, query, qclass_name, qtype_name, rcode_name, answers, ttls):
+    def add_out_dns(self, profileid, twid, uid, flow: DNSFlow):
         """
         Store in the DB a DNS request
 
@@ -1113,21 +1134,21 @@ class Database(object):
         """
         data = {}
         data['uid'] = uid
-        data['type'] = flowtype
-        data['query'] = query
-        data['qclass_name'] = qclass_name
-        data['qtype_name'] = qtype_name
-        data['rcode_name'] = rcode_name
-        data['answers'] = answers
-        data['ttls'] = ttls
+        data['type'] = flow.type
+        data['query'] = flow.query
+        data['qclass_name'] = flow.qclass_name
+        data['qtype_name'] = flow.qtype_name
+        data['rcode_name'] = flow.rcode_name
+        data['answers'] = flow.answers
+        data['ttls'] = flow.ttls
         # Convert to json string
-        data = json.dumps(data)
+        data = codec.dumps(data)
         self.r.hset(profileid + self.separator + twid + self.separator + 'altflows', uid, data)
         to_send = {}
         to_send['profileid'] = profileid
         to_send['twid'] = twid
         to_send['flow'] = data
-        to_send = json.dumps(to_send)
+        to_send = codec.dumps(to_send)
         self.publish('new_dns', to_send)
         self.print('Adding DNS flow to DB: {}'.format(data), 5,0)
 
@@ -1186,6 +1207,21 @@ class Database(object):
         """ Delete an entry from the list of zeek files """
         self.r.srem('zeekfiles', filename)
 
+    def set_input_checkpoint(self, worker, checkpoint: dict):
+        """
+        Store the position in the input files up to which this worker (a profiler) processed all the flows.
+        The checkpoint is a dictionary {'input': path of the input, 'files': {path: {'inode', 'offset', 'ts'}}}
+        """
+        self.r.hset('InputCheckpoints', worker, codec.dumps(checkpoint))
+
+    def get_input_checkpoints(self) -> dict:
+        """ Return the last checkpoint stored by each worker, as a dict {worker: checkpoint} """
+        return {int(worker): codec.loads(checkpoint) for (worker, checkpoint) in self.r.hgetall('InputCheckpoints').items()}
+
+    def del_input_checkpoints(self):
+        """ Delete the checkpoints of all the workers """
+        self.r.delete('InputCheckpoints')
+
     def add_ips_to_IoC(self, ips_and_description: dict) -> None:
         """
         Store a group of IPs in the db as they were obtained from an IoC source
@@ -1212,7 +1248,7 @@ class Database(object):
         """
         data = self.r.hget('MaliciousIPs', ip)
         if data:
-            data = json.loads(data)
+            data = codec.loads(data)
         else:
             data = {}
         return data
@@ -1241,7 +1277,7 @@ class Database(object):
             if data:
                 self.print('Key: {}. Getting info for Profile {} TW {}. Data: {}'.format(key, profileid, twid, data), 5, 0)
                 # Convert the dictionary to json
-                portdata = json.loads(data)
+                portdata = codec.loads(data)
                 value = portdata
             elif not data:
                 self.print('There is no data for Key: {}. Profile {} TW {}'.format(key, profileid, twid), 5, 0)
@@ -0,0 +1,116 @@
+# Records of the flows that the parsers of the profiler create, and that the profiler and the DB read.
+# They use __slots__, so creating one is cheaper than a dict with the same keys and each field is an attribute.
+# The numbers (durations, packets, bytes and lengths) are converted once, when the flow is parsed.
+
+
+class Flow(object):
+    """
+    The fields that all the flows have.
+    type: conn, dns, http or ssl for Zeek, flow, http, dns or tls for suricata, and argus for argus and nfdump.
+    The flows of other Zeek logs (ssh, dhcp...) are only a Flow, because they are not added to the profiles yet.
+    starttime is in seconds, or None if it was not valid. uid is None if the input does not have it.
+    """
+    __slots__ = ('type', 'starttime', 'uid', 'saddr', 'daddr')
+
+    def __init__(self, type='', starttime=None, uid=None, saddr='', daddr=''):
+        self.type = type
+        self.starttime = starttime
+        self.uid = uid
+        self.saddr = saddr
+        self.daddr = daddr
+
+    def fields(self) -> tuple:
+        """ The names of all the fields of this type of flow """
+        return tuple(name for cls in reversed(type(self).__mro__) for name in getattr(cls, '__slots__', ()))
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.fields()}
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join('{}={!r}'.format(name, value) for (name, value) in self.to_dict().items()))
+
+
+class ConnFlow(Flow):
+    """
+    A flow with the traffic between the two IPs: a Zeek conn.log, a suricata flow event, or an argus or nfdump flow.
+    When pkts or bytes are not given, they are the sum of the ones of each direction.
+    """
+    __slots__ = ('endtime', 'dur', 'proto', 'appproto', 'sport', 'dport', 'dir', 'state', 'state_hist', 'pkts', 'spkts', 'dpkts', 'bytes', 'sbytes', 'dbytes', 'smac', 'dmac')
+
+    def __init__(self, type='', starttime=None, uid=None, saddr='', daddr='', endtime=None, dur=0.0, proto='', appproto='', sport='', dport='', dir='', state='', state_hist='', pkts=None, spkts=0, dpkts=0, bytes=None, sbytes=0, dbytes=0, smac='', dmac=''):
+        Flow.__init__(self, type, starttime, uid, saddr, daddr)
+        self.endtime = endtime
+        self.dur = dur
+        self.proto = proto
+        self.appproto = appproto
+        self.sport = sport
+        self.dport = dport
+        self.dir = dir
+        self.state = state
+        self.state_hist = state_hist
+        self.pkts = spkts + dpkts if pkts is None else pkts
+        self.spkts = spkts
+        self.dpkts = dpkts
+        self.bytes = sbytes + dbytes if bytes is None else bytes
+        self.sbytes = sbytes
+        self.dbytes = dbytes
+        self.smac = smac
+        self.dmac = dmac
+
+
+class DNSFlow(Flow):
+    """ A DNS request """
+    __slots__ = ('query', 'qclass_name', 'qtype_name', 'rcode_name', 'answers', 'ttls')
+
+    def __init__(self, type='', starttime=None, uid=None, saddr='', daddr='', query='', qclass_name='', qtype_name='', rcode_name='', answers='', ttls=''):
+        Flow.__init__(self, type, starttime, uid, saddr, daddr)
+        self.query = query
+        self.qclass_name = qclass_name
+        self.qtype_name = qtype_name
+        self.rcode_name = rcode_name
+        self.answers = answers
+        self.ttls = ttls
+
+
+class HTTPFlow(Flow):
+    """ A HTTP request """
+    __slots__ = ('method', 'host', 'uri', 'httpversion', 'user_agent', 'request_body_len', 'response_body_len', 'status_code', 'status_msg', 'resp_mime_types', 'resp_fuids')
+
+    def __init__(self, type='', starttime=None, uid=None, saddr='', daddr='', method='', host='', uri='', httpversion='', user_agent='', request_body_len=0, response_body_len=0, status_code='', status_msg='', resp_mime_types='', resp_fuids=''):
+        Flow.__init__(self, type, starttime, uid, saddr, daddr)
+        self.method = method
+        self.host = host
+        self.uri = uri
+        self.httpversion = httpversion
+        self.user_agent = user_agent
+        self.request_body_len = request_body_len
+        self.response_body_len = response_body_len
+        self.status_code = status_code
+        self.status_msg = status_msg
+        self.resp_mime_types = resp_mime_types
+        self.resp_fuids = resp_fuids
+
+
+class SSLFlow(Flow):
+    """ A SSL/TLS connection. notbefore and notafter are only in suricata, as datetimes """
+    __slots__ = ('sslversion', 'cipher', 'resumed', 'established', 'cert_chain_fuids', 'client_cert_chain_fuids', 'subject', 'issuer', 'validation_status', 'curve', 'server_name', 'notbefore', 'notafter')
+
+    def __init__(self, type='', starttime=None, uid=None, saddr='', daddr='', sslversion='', cipher='', resumed='', established='', cert_chain_fuids='', client_cert_chain_fuids='', subject='', issuer='', validation_status='', curve='', server_name='', notbefore='', notafter=''):
+        Flow.__init__(self, type, starttime, uid, saddr, daddr)
+        self.sslversion = sslversion
+        self.cipher = cipher
+        self.resumed = resumed
+        self.established = established
+        self.cert_chain_fuids = cert_chain_fuids
+        self.client_cert_chain_fuids = client_cert_chain_fuids
+        self.subject = subject
+        self.issuer = issuer
+        self.validation_status = validation_status
+        self.curve = curve
+        self.server_name = server_name
+        self.notbefore = notbefore
+        self.notafter = notafter
+
+
+# The record of each type of flow. The rest of types are a Flow
+flow_classes = {'conn': ConnFlow, 'flow': ConnFlow, 'argus': ConnFlow, 'dns': DNSFlow, 'http': HTTPFlow, 'ssl': SSLFlow, 'tls': SSLFlow}
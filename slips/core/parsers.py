@@ -0,0 +1,602 @@
+# Parsers of the flows that are defined once from the format of the input, so each line is parsed fast.
+# The profiler finds the type of input once and creates its parser from the parsers registry at the end.
+# All the parsers have parse(line) and parse_lines(lines), that return a flow record or None for the lines that
+# are not flows (headers, broken lines and discarded events).
+
+import inspect
+from collections import Counter
+from datetime import datetime
+from itertools import repeat
+from slips.core import codec
+from slips.core.flows import Flow, ConnFlow, flow_classes
+
+# The argus parser converts the columns of floats of the big blocks with numpy when it is installed
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def find_json_string(line: str, key: str):
+    """
+    Return the value of a string field of a json line without decoding the json, or None if it is not there.
+    It finds the first field with this name, so it is meant for the fields at the first level of the suricata events
+    """
+    quoted_key = '"' + key + '"'
+    # Suricata writes the json without spaces, so this is the usual case
+    start = line.find(quoted_key + ':"')
+    if start != -1:
+        start += len(quoted_key) + 2
+    else:
+        start = line.find(quoted_key)
+        if start == -1:
+            return None
+        # Written with spaces around the ':'
+        start = line.find(':', start + len(quoted_key))
+        if start == -1:
+            return None
+        start += 1
+        while line[start:start + 1] == ' ':
+            start += 1
+        if line[start:start + 1] != '"':
+            # The value is not a string
+            return None
+        start += 1
+    end = line.find('"', start)
+    if end == -1:
+        return None
+    return line[start:end]
+
+
+class ZeekTabsParser(object):
+    """
+    Parser of the lines of a Zeek log in TSV format.
+    It is defined from the #fields and #types headers of the log, so it does not depend on the order of the columns.
+    The header is turned once into a table with the index of each column that the flow record uses and the function
+    that converts it, so each line only converts the columns with numbers or times.
+    """
+    # Columns of each type of log that we use. Field of the flow record: name of the field in Zeek
+    common_columns = {'starttime': 'ts', 'uid': 'uid', 'saddr': 'id.orig_h', 'daddr': 'id.resp_h'}
+    log_columns = {
+        'conn': {'sport': 'id.orig_p', 'dport': 'id.resp_p', 'proto': 'proto', 'appproto': 'service', 'dur': 'duration', 'sbytes': 'orig_bytes', 'dbytes': 'resp_bytes', 'state': 'conn_state', 'state_hist': 'history', 'spkts': 'orig_pkts', 'dpkts': 'resp_pkts'},
+        'dns': {'query': 'query', 'qclass_name': 'qclass_name', 'qtype_name': 'qtype_name', 'rcode_name': 'rcode_name', 'answers': 'answers', 'ttls': 'TTLs'},
+        'http': {'method': 'method', 'host': 'host', 'uri': 'uri', 'httpversion': 'version', 'user_agent': 'user_agent', 'request_body_len': 'request_body_len', 'response_body_len': 'response_body_len', 'status_code': 'status_code', 'status_msg': 'status_msg', 'resp_mime_types': 'resp_mime_types', 'resp_fuids': 'resp_fuids'},
+        'ssl': {'sslversion': 'version', 'cipher': 'cipher', 'resumed': 'resumed', 'established': 'established', 'cert_chain_fuids': 'cert_chain_fuids', 'client_cert_chain_fuids': 'client_cert_chain_fuids', 'subject': 'subject', 'issuer': 'issuer', 'validation_status': 'validation_status', 'curve': 'curve', 'server_name': 'server_name'},
+    }
+    # Zeek types that are converted to numbers. The rest (strings, addresses, ports, sets...) are used as they are
+    float_types = {'interval', 'double'}
+    int_types = {'count', 'int'}
+
+    def __init__(self, path: str, fields: list, types: list, time_converter, separator='\t', unset_field='-'):
+        """
+        path: the #path header of the log, like 'conn'
+        fields, types: the #fields and #types headers of the log
+        time_converter: function that converts the text of a Zeek 'time' to seconds
+        """
+        self.path = path
+        self.separator = separator
+        self.unset_field = unset_field
+        self.time_converter = time_converter
+        # The type of flow, as the rest of slips calls it
+        self.flow_type = path
+        for log_type in self.log_columns:
+            if log_type in path:
+                self.flow_type = log_type
+                break
+        # The flow record that the lines of this log create
+        self.record = flow_classes[self.flow_type] if self.flow_type in self.log_columns else Flow
+        # The fields of the record that are not in this log keep the default of the record
+        self.record_defaults = self.record()
+        columns = dict(self.common_columns)
+        columns.update(self.log_columns.get(self.flow_type, {}))
+        # (key, index, converter, default) of the columns that are in this log. The converter is None for the
+        # columns that are used as they are
+        self.columns = []
+        for key, field in columns.items():
+            try:
+                index = fields.index(field)
+            except ValueError:
+                continue
+            try:
+                field_type = types[index]
+            except IndexError:
+                field_type = 'string'
+            if field_type == 'time':
+                converter = time_converter
+            elif field_type in self.float_types:
+                converter = float
+            elif field_type in self.int_types:
+                converter = int
+            else:
+                converter = None
+            self.columns.append((key, index, converter, self.default_value(key)))
+        # Lines with less columns than this are broken
+        self.min_columns = max([index for (key, index, converter, default) in self.columns], default=-1) + 1
+
+    def default_value(self, key: str):
+        """ The value of a column that is not in the log or not set """
+        return getattr(self.record_defaults, key)
+
+    def parse_values(self, values: list):
+        """ Convert the list of values of a line into the flow record. The numbers and times that are not set or not valid keep their default """
+        fields = {'type': self.flow_type}
+        unset_field = self.unset_field
+        for (key, index, converter, default) in self.columns:
+            value = values[index]
+            if converter is not None:
+                if value == unset_field:
+                    value = default
+                else:
+                    try:
+                        value = converter(value)
+                    except (ValueError, TypeError):
+                        value = default
+            fields[key] = value
+        if self.flow_type == 'conn':
+            starttime = fields.get('starttime')
+            if starttime is not None:
+                fields['endtime'] = starttime + fields.get('dur', 0.0)
+            fields['state_hist'] = fields.get('state_hist') or fields.get('state', '')
+            # We do not know the indexes of MACs
+            fields['dir'] = '->'
+        return self.record(**fields)
+
+    def parse(self, values: list):
+        """ Return the flow record of a line already split by the separator. Returns None if the line is broken """
+        if len(values) < self.min_columns:
+            return None
+        return self.parse_values(values)
+
+
+class ZeekTabsHeader(object):
+    """
+    Collects the header lines of a Zeek log in TSV format (#separator, #path, #fields, #types...).
+    When the header is complete, it creates the parser for the lines of the log.
+    """
+    def __init__(self, time_converter):
+        self.time_converter = time_converter
+        self.separator = '\t'
+        self.unset_field = '-'
+        self.path = ''
+        self.fields = None
+
+    def add_line(self, line: str):
+        """ Add a header line. Returns the ZeekTabsParser of the log when the header is complete, if not None """
+        line = line.rstrip('\r\n')
+        if line.startswith('#separator'):
+            # The separator is written escaped, like '#separator \x09'
+            self.separator = line.split(' ', 1)[1].encode('utf-8').decode('unicode_escape')
+            return None
+        (name, _, value) = line.partition(self.separator)
+        if name == '#unset_field':
+            self.unset_field = value
+        elif name == '#path':
+            self.path = value
+        elif name == '#fields':
+            self.fields = value.split(self.separator)
+        elif name == '#types' and self.fields is not None:
+            parser = ZeekTabsParser(self.path, self.fields, value.split(self.separator), self.time_converter, self.separator, self.unset_field)
+            self.fields = None
+            return parser
+        return None
+
+
+class SuricataEventFilter(object):
+    """
+    Finds the event_type of the lines of a suricata eve.json without decoding the json, so the events that the
+    profiler does not use (alerts, stats, fileinfo...) are discarded before the expensive part.
+    It counts how many lines of each event type were discarded.
+    """
+    # The events of suricata that are added to the profiles
+    used_events = ('flow', 'http', 'dns')
+
+    def __init__(self, used_events=None):
+        self.used_events = set(used_events or self.used_events)
+        # Event type: amount of lines discarded
+        self.skipped = {}
+
+    @staticmethod
+    def get_event_type(line: str):
+        """ Return the event_type of the line, or None if it is not there """
+        return find_json_string(line, 'event_type')
+
+    def accept(self, line: str) -> bool:
+        """ Return False if the line is an event that we do not use. Lines where we can not find the event_type are accepted """
+        event_type = self.get_event_type(line)
+        if event_type is None or event_type in self.used_events:
+            return True
+        self.skipped[event_type] = self.skipped.get(event_type, 0) + 1
+        return False
+
+    def get_skipped(self) -> int:
+        """ Total amount of lines discarded """
+        return sum(self.skipped.values())
+
+    def describe_skipped(self) -> str:
+        """ Text with the amount of lines discarded of each event type """
+        return ', '.join('{} {}'.format(count, event_type) for (event_type, count) in sorted(self.skipped.items(), key=lambda item: -item[1]))
+
+
+class ArgusParser(object):
+    """
+    Parser of the argus flows (csv or TSV with a header), that parses the blocks of lines that the profiler receives at once.
+    The first line is the header. The indexes of the columns found in it define which fields of the ConnFlow are read.
+    The columns that are not in the file keep the default of the ConnFlow.
+    The blocks of vectorized_min_lines lines or more are split at once and converted by column instead of by line.
+    The columns converted with float(), like the times in seconds since the epoch, are converted with numpy when it is
+    installed. The flows are the same as the ones parsed line by line.
+    """
+    input_type = 'argus'
+    # Smaller blocks are faster line by line
+    vectorized_min_lines = 1000
+    columns = ('starttime', 'endtime', 'dur', 'proto', 'appproto', 'saddr', 'sport', 'dir', 'daddr', 'dport', 'state', 'pkts', 'spkts', 'dpkts', 'bytes', 'sbytes', 'dbytes')
+    # Columns converted to times and numbers
+    time_columns = {'starttime', 'endtime'}
+    float_columns = {'dur'}
+    int_columns = {'pkts', 'spkts', 'dpkts', 'bytes', 'sbytes', 'dbytes'}
+    # Part of the name of the column in the header: field of the flow record. The first one that matches is used
+    header_columns = (('time', 'starttime'), ('dur', 'dur'), ('proto', 'proto'), ('srca', 'saddr'), ('sport', 'sport'), ('dir', 'dir'), ('dsta', 'daddr'), ('dport', 'dport'), ('state', 'state'), ('totpkts', 'pkts'), ('totbytes', 'bytes'))
+    # (name, default) of the arguments of ConnFlow, in order. The blocks create the flows with positional arguments
+    flow_arguments = [(name, parameter.default) for (name, parameter) in inspect.signature(ConnFlow).parameters.items()]
+
+    def __init__(self, time_converter, separator=','):
+        """ time_converter: function that converts the text of the times to seconds """
+        self.separator = separator
+        self.time_converter = time_converter
+        self.column_idx = None
+        self.min_columns = 0
+        # (key, index, converter) of the columns of the file, defined when we read the header. The converter is
+        # None for the columns that are used as they are
+        self.converters = None
+        self.broken = 0
+
+    @classmethod
+    def find_columns(cls, header: str, separator: str) -> dict:
+        """ Return the index of each field of the flow record in the header of argus """
+        column_idx = {}
+        for index, field in enumerate(header.strip().split(separator)):
+            field = field.lower()
+            for (name, key) in cls.header_columns:
+                if name in field:
+                    column_idx[key] = index
+                    break
+        return column_idx
+
+    def define_columns(self, column_idx: dict):
+        """ Define the columns that are read from their indexes. column_idx: field of the flow record: index of the column """
+        self.column_idx = {key: index for (key, index) in column_idx.items() if key in self.columns}
+        # Lines with less columns than this are broken
+        self.min_columns = max(self.column_idx.values(), default=-1) + 1
+        self.converters = [(key, self.column_idx[key], self.get_converter(key)) for key in self.columns if key in self.column_idx]
+
+    def get_converter(self, key: str):
+        """ The function that converts the text of a column, or None if the text is used as it is """
+        if key in self.time_columns:
+            return self.time_converter
+        if key in self.float_columns:
+            return float
+        if key in self.int_columns:
+            return int
+        return None
+
+    def parse_values(self, values: list) -> ConnFlow:
+        """ Convert the list of values of a line into the flow record. The numbers and times that are not valid, like an empty one, keep the default """
+        fields = {'type': 'argus'}
+        for (key, index, converter) in self.converters:
+            value = values[index]
+            if converter is not None:
+                try:
+                    value = converter(value)
+                except (ValueError, TypeError):
+                    continue
+            fields[key] = value
+        return ConnFlow(**fields)
+
+    def parse(self, line: str):
+        """ Return the flow record of a line. Returns None for the header and the broken lines """
+        return self.parse_lines([line])[0]
+
+    def parse_line(self, line: str):
+        """ Return the flow record of a line after the header, or None if it is broken """
+        values = line.strip().split(self.separator)
+        if len(values) < self.min_columns:
+            self.broken += 1
+            return None
+        return self.parse_values(values)
+
+    def parse_lines(self, lines: list) -> list:
+        """ Return the flow record of each line, or None for the header and the broken lines """
+        flows = []
+        if self.converters is None and lines:
+            # Argus puts the definition of the columns on the first line only
+            self.define_columns(self.find_columns(lines[0], self.separator))
+            flows.append(None)
+            lines = lines[1:]
+        if len(lines) >= self.vectorized_min_lines:
+            vectorized_flows = self.parse_lines_vectorized(lines)
+            if vectorized_flows is not None:
+                flows.extend(vectorized_flows)
+                return flows
+        parse_line = self.parse_line
+        flows.extend([parse_line(line) for line in lines])
+        return flows
+
+    def parse_lines_vectorized(self, lines: list):
+        """
+        Parse a block of lines by column. The block is split at once and each column is a slice of the values.
+        The lines with a different amount of columns, and the lines with a value that is not valid, are parsed alone.
+        Returns None if most lines do not have enough columns, so the block is parsed line by line.
+        """
+        separator = self.separator
+        lines = list(map(str.strip, lines))
+        separators = list(map(str.count, lines, repeat(separator, len(lines))))
+        amounts = Counter(separators)
+        amount_columns = amounts.most_common(1)[0][0] + 1
+        if amount_columns < self.min_columns:
+            return None
+        # Positions of the lines that are parsed alone
+        slow = []
+        table_lines = lines
+        if len(amounts) > 1:
+            slow = [position for (position, amount) in enumerate(separators) if amount != amount_columns - 1]
+            table_lines = [line for (line, amount) in zip(lines, separators) if amount == amount_columns - 1]
+        values = separator.join(table_lines).split(separator)
+        rows = len(table_lines)
+        columns = []
+        failed = set()
+        for (name, default) in self.flow_arguments:
+            if name == 'type':
+                columns.append(repeat('argus', rows))
+            elif name not in self.column_idx:
+                columns.append(repeat(default, rows))
+            else:
+                texts = values[self.column_idx[name]::amount_columns]
+                converter = self.get_converter(name)
+                if converter is not None:
+                    (texts, failed_positions) = self.convert_column(texts, converter)
+                    failed.update(failed_positions)
+                columns.append(texts)
+        flows = list(map(ConnFlow, *columns))
+        for position in failed:
+            flows[position] = self.parse_line(table_lines[position])
+        # Put the lines that were parsed alone back in their place
+        for position in slow:
+            flows.insert(position, self.parse_line(lines[position]))
+        return flows
+
+    @staticmethod
+    def convert_column(texts: list, converter) -> tuple:
+        """
+        Convert the texts of a column. The columns converted with float() are converted at once with numpy when it
+        is installed, because it converts each text as float() does. Returns the values, and the positions of the
+        texts that are not valid. Their value is the text
+        """
+        if converter is float and numpy is not None:
+            try:
+                return (numpy.array(texts, dtype=float).tolist(), ())
+            except (ValueError, TypeError):
+                pass
+        try:
+            return (list(map(converter, texts)), ())
+        except (ValueError, TypeError):
+            pass
+        values = []
+        failed = []
+        for (position, text) in enumerate(texts):
+            try:
+                values.append(converter(text))
+            except (ValueError, TypeError):
+                values.append(text)
+                failed.append(position)
+        return (values, failed)
+
+
+class NfdumpParser(ArgusParser):
+    """
+    Parser of the csv output of nfdump. It has no header, and the columns are always the same.
+    The flows of nfdump are stored as argus flows.
+    """
+    input_type = 'nfdump'
+    # Field of the flow record: index of the column. Direction: ingress=0, egress=1
+    nfdump_columns = {'starttime': 0, 'endtime': 1, 'dur': 2, 'saddr': 3, 'daddr': 4, 'sport': 5, 'dport': 6, 'proto': 7, 'state': 8, 'spkts': 11, 'sbytes': 12, 'dpkts': 13, 'dbytes': 14, 'dir': 22}
+
+    def __init__(self, time_converter, separator=','):
+        ArgusParser.__init__(self, time_converter, separator)
+        self.define_columns(self.nfdump_columns)
+
+
+class ZeekTabsLogParser(object):
+    """
+    Parser of the Zeek logs in TSV format.
+    The header of each log (#path, #fields, #types) is used to create a ZeekTabsParser for the lines of that log.
+    When the input process merges several logs, it adds the #path of the log as the last column of each line.
+    """
+    input_type = 'zeek-tabs'
+
+    def __init__(self, time_converter, separator='\t'):
+        self.header = ZeekTabsHeader(time_converter)
+        # Parsers of the logs, by their #path
+        self.log_parsers = {}
+        # The lines without the #path at the end belong to the last log with a header
+        self.last_parser = None
+        self.broken = 0
+
+    def parse(self, line: str):
+        """ Return the flow record of a line. Returns None for the headers and the broken lines """
+        if line[:1] == '#':
+            parser = self.header.add_line(line)
+            if parser:
+                self.log_parsers[parser.path] = parser
+                self.last_parser = parser
+            return None
+        values = line.rstrip('\r\n').split(self.header.separator)
+        # Is the #path of the log in the last column?
+        parser = self.log_parsers.get(values[-1], self.last_parser)
+        # The lines without the #fields and #types headers before them are ignored
+        flow = parser.parse(values) if parser else None
+        if flow is None:
+            self.broken += 1
+        return flow
+
+    def parse_lines(self, lines: list) -> list:
+        parse = self.parse
+        return [parse(line) for line in lines]
+
+
+class ZeekJSONParser(object):
+    """
+    Parser of the Zeek logs in json, that the input process already decoded into a dict with the path of the log in 'type'.
+    Zeek does not write the fields that are not set, so each field is read with its default. The columns of each log
+    are found from the columns of ZeekTabsParser the first time that the log is seen.
+    """
+    input_type = 'zeek'
+    # Columns that are only in the json logs. Field of the flow record: name of the field in Zeek
+    json_columns = {'conn': {'smac': 'orig_l2_addr', 'dmac': 'resp_l2_addr'}}
+    # Zeek logs that are not added to the profiles yet. Only their type is kept
+    other_logs = ('ssh', 'irc', 'long', 'dhcp', 'dce_rpc', 'dnp3', 'ftp', 'kerberos', 'mysql', 'modbus', 'ntlm', 'rdp', 'sip', 'smb_cmd', 'smb_files', 'smb_mapping', 'smtp', 'socks', 'syslog', 'tunnel')
+
+    def __init__(self, time_converter, separator=None):
+        self.time_converter = time_converter
+        # (type of flow, flow record, columns) of the logs, by their path
+        self.logs = {}
+        self.broken = 0
+
+    def define_log(self, path: str) -> tuple:
+        """ The type of flow, the flow record and the columns (key, field, default) of the log with this path """
+        flow_type = ''
+        for log_type in tuple(ZeekTabsParser.log_columns) + self.other_logs:
+            if log_type in path:
+                flow_type = log_type
+                break
+        record = flow_classes[flow_type] if flow_type in ZeekTabsParser.log_columns else Flow
+        defaults = record()
+        columns = dict(ZeekTabsParser.common_columns)
+        columns.update(ZeekTabsParser.log_columns.get(flow_type, {}))
+        columns.update(self.json_columns.get(flow_type, {}))
+        # The start time is converted apart
+        del columns['starttime']
+        return (flow_type, record, [(key, field, getattr(defaults, key)) for (key, field) in columns.items()])
+
+    def parse(self, line: dict):
+        """ Return the flow record of a line """
+        path = line.get('type', '')
+        log = self.logs.get(path)
+        if log is None:
+            log = self.logs[path] = self.define_log(path)
+        (flow_type, record, columns) = log
+        get = line.get
+        fields = {key: get(field, default) for (key, field, default) in columns}
+        fields['type'] = flow_type
+        ts = get('ts')
+        starttime = fields['starttime'] = self.time_converter(ts) if ts is not None else None
+        if flow_type == 'conn':
+            dur = fields['dur'] = float(get('duration', 0.0))
+            state = fields['state'] = get('conn_state', '')
+            fields['state_hist'] = get('history') or state
+            fields['endtime'] = starttime + dur if starttime is not None else None
+            fields['dir'] = '->'
+        return record(**fields)
+
+    def parse_lines(self, lines: list) -> list:
+        parse = self.parse
+        return [parse(line) for line in lines]
+
+
+class SuricataParser(object):
+    """
+    Parser of the events of a suricata eve.json.
+    The events that are not used are discarded before decoding their json. The columns of each event type are found
+    from the columns below the first time that the event type is seen, and each field is read with its default,
+    because suricata does not write all the fields in every event.
+    """
+    input_type = 'suricata'
+    # Columns of each event type. Field of the flow record: (section of the event, or None for the top level, name of the field)
+    common_columns = {'saddr': (None, 'src_ip'), 'daddr': (None, 'dest_ip')}
+    event_columns = {
+        'flow': {'sport': (None, 'src_port'), 'dport': (None, 'dest_port'), 'proto': (None, 'proto'), 'appproto': (None, 'app_proto'), 'spkts': ('flow', 'pkts_toserver'), 'dpkts': ('flow', 'pkts_toclient'), 'sbytes': ('flow', 'bytes_toserver'), 'dbytes': ('flow', 'bytes_toclient'), 'state': ('flow', 'state')},
+        'http': {'method': ('http', 'http_method'), 'host': ('http', 'hostname'), 'uri': ('http', 'url'), 'user_agent': ('http', 'http_user_agent'), 'status_code': ('http', 'status'), 'httpversion': ('http', 'protocol'), 'response_body_len': ('http', 'length'), 'request_body_len': ('http', 'request_body_len')},
+        # qclass_name, rcode_name and answers can not be found in eve.json
+        'dns': {'query': ('dns', 'rdata'), 'ttls': ('dns', 'ttl'), 'qtype_name': ('dns', 'rrtype')},
+        'tls': {'sslversion': ('tls', 'version'), 'subject': ('tls', 'subject'), 'issuer': ('tls', 'issuerdn'), 'server_name': ('tls', 'sni')},
+    }
+
+    def __init__(self, time_converter, separator=None, used_events=None):
+        self.time_converter = time_converter
+        # Discards the events that we do not use before decoding their json
+        self.event_filter = SuricataEventFilter(used_events)
+        # (flow record, sections, columns) of the events, by their event_type
+        self.events = {}
+        self.broken = 0
+
+    def convert_time(self, text):
+        """ The time in seconds, or None if it is not there or not valid. Suricata writes invalid times like '1900-01-00T00:00:08.511802+0000' """
+        return self.time_converter(text) if text is not None else None
+
+    @staticmethod
+    def convert_date(text):
+        """ The dates of the certificates, like notbefore """
+        return datetime.strptime(text, '%Y-%m-%dT%H:%M:%S') if text is not None else ''
+
+    def define_event(self, event_type: str) -> tuple:
+        """ The flow record, the sections and the columns (key, section, field, default) of the events of this type """
+        record = flow_classes.get(event_type, Flow)
+        defaults = record()
+        columns = dict(self.common_columns)
+        columns.update(self.event_columns.get(event_type, {}))
+        sections = sorted({section for (section, field) in columns.values() if section})
+        return (record, sections, [(key, section, field, getattr(defaults, key)) for (key, (section, field)) in columns.items()])
+
+    def parse_event(self, line: dict):
+        """ Return the flow record of a decoded event """
+        event_type = line.get('event_type', '')
+        event = self.events.get(event_type)
+        if event is None:
+            event = self.events[event_type] = self.define_event(event_type)
+        (record, sections, columns) = event
+        get = line.get
+        # Each section of the event is read once. Some events do not have it. None is the top level
+        values = {section: get(section) or {} for section in sections}
+        values[None] = line
+        fields = {key: values[section].get(field, default) for (key, section, field, default) in columns}
+        fields['type'] = event_type
+        if event_type == 'flow':
+            # The start of the flow is used instead of the time of the event
+            flow = values['flow']
+            start = flow.get('start')
+            starttime = fields['starttime'] = self.convert_time(start if start is not None else get('timestamp'))
+            endtime = fields['endtime'] = self.convert_time(flow.get('end'))
+            fields['dur'] = endtime - starttime if starttime and endtime else 0.0
+            fields['dir'] = '->'
+        else:
+            fields['starttime'] = self.convert_time(get('timestamp'))
+        if event_type == 'tls':
+            fields['notbefore'] = self.convert_date(values['tls'].get('notbefore'))
+            fields['notafter'] = self.convert_date(values['tls'].get('notafter'))
+        # Suricata does not have the uid of zeek. The flow_id is not used as uid
+        return record(**fields)
+
+    def parse(self, line: str):
+        """ Return the flow record of a line. Returns None for the events that are discarded and the broken lines """
+        if not self.event_filter.accept(line):
+            return None
+        try:
+            return self.parse_event(codec.loads(line))
+        except (ValueError, TypeError, AttributeError):
+            # Not valid json, or fields with the wrong type, like a date of a certificate in another format
+            self.broken += 1
+            return None
+
+    def parse_lines(self, lines: list) -> list:
+        parse = self.parse
+        return [parse(line) for line in lines]
+
+
+# The parser of each type of input, as define_type() of the profiler names them.
+# They are created with (time_converter, separator of the columns)
+parsers = {
+    'zeek': ZeekJSONParser,
+    'zeek-tabs': ZeekTabsLogParser,
+    'suricata': SuricataParser,
+    'argus': ArgusParser,
+    'nfdump': NfdumpParser,
+}
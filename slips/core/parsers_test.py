@@ -0,0 +1,298 @@
+# Tests of the parsers of the profiler. They do not need Redis.
+# Run them with: python -m pytest slips/core/parsers_test.py
+
+from datetime import datetime
+import json
+
+from slips.common.sharding import FlowRouter
+from slips.core.parsers import ZeekTabsLogParser, ArgusParser, NfdumpParser, ZeekJSONParser, SuricataParser
+from slips.core.timestamps import get_parser
+
+
+def zeek_tabs_header(path: str, fields: list, types: list) -> list:
+    return ['#separator \\x09', '#set_separator\t,', '#empty_field\t(empty)', '#unset_field\t-', '#path\t' + path, '#fields\t' + '\t'.join(fields), '#types\t' + '\t'.join(types)]
+
+
+def test_zeek_tabs_columns_in_any_order():
+    """ The columns are found by the #fields header, not by their position """
+    fields = ['uid', 'id.resp_h', 'ts', 'id.orig_h', 'orig_pkts', 'duration', 'proto', 'conn_state']
+    types = ['string', 'addr', 'time', 'addr', 'count', 'interval', 'enum', 'string']
+    parser = ZeekTabsLogParser(get_parser('unixtimestamp'))
+    flows = parser.parse_lines(zeek_tabs_header('conn', fields, types) + ['C1\t10.0.0.2\t1538080852.5\t10.0.0.1\t4\t1.25\ttcp\tS0'])
+    assert flows[:-1] == [None] * 7
+    flow = flows[-1]
+    assert (flow.type, flow.uid, flow.saddr, flow.daddr, flow.proto) == ('conn', 'C1', '10.0.0.1', '10.0.0.2', 'tcp')
+    assert (flow.starttime, flow.dur, flow.endtime, flow.spkts, flow.pkts) == (1538080852.5, 1.25, 1538080853.75, 4, 4)
+    # The history is missing, so the state is used
+    assert (flow.state, flow.state_hist, flow.dir) == ('S0', 'S0', '->')
+
+
+def test_zeek_tabs_unset_and_invalid_values_keep_the_default():
+    fields = ['ts', 'uid', 'id.orig_h', 'id.resp_h', 'duration', 'orig_bytes', 'orig_pkts', 'history']
+    types = ['time', 'string', 'addr', 'addr', 'interval', 'count', 'count', 'string']
+    parser = ZeekTabsLogParser(get_parser('unixtimestamp'))
+    flows = parser.parse_lines(zeek_tabs_header('conn', fields, types) + ['-\tC1\t10.0.0.1\t10.0.0.2\t-\tnot a number\t3\tShA'])
+    flow = flows[-1]
+    assert (flow.starttime, flow.endtime, flow.dur, flow.sbytes, flow.spkts, flow.state_hist) == (None, None, 0.0, 0, 3, 'ShA')
+
+
+def test_zeek_tabs_broken_lines_and_lines_without_header():
+    parser = ZeekTabsLogParser(get_parser('unixtimestamp'))
+    assert parser.parse_lines(['1538080852.5\tC1']) == [None]
+    flows = parser.parse_lines(zeek_tabs_header('dns', ['ts', 'uid', 'id.orig_h', 'id.resp_h', 'query'], ['time', 'string', 'addr', 'addr', 'string']) + ['1538080852.5\tC1'])
+    assert flows[-1] is None
+    assert parser.broken == 2
+
+
+def test_zeek_tabs_merged_logs_use_the_path_in_the_last_column():
+    """ The input process adds the #path of the log at the end of the lines when it merges several logs """
+    parser = ZeekTabsLogParser(get_parser('unixtimestamp'))
+    lines = zeek_tabs_header('conn', ['ts', 'uid', 'id.orig_h', 'id.resp_h', 'duration'], ['time', 'string', 'addr', 'addr', 'interval'])
+    lines += zeek_tabs_header('dns', ['ts', 'uid', 'id.orig_h', 'id.resp_h', 'query'], ['time', 'string', 'addr', 'addr', 'string'])
+    lines += ['1.0\tC1\t10.0.0.1\t10.0.0.2\t2.0\tconn', '2.0\tD1\t10.0.0.1\t10.0.0.3\texample.com\tdns']
+    (conn, dns) = parser.parse_lines(lines)[-2:]
+    assert (conn.type, conn.endtime) == ('conn', 3.0)
+    assert (dns.type, dns.query) == ('dns', 'example.com')
+
+
+argus_header = 'StartTime,Dur,Proto,SrcAddr,Sport,Dir,DstAddr,Dport,State,sTos,dTos,TotPkts,TotBytes,SrcBytes,Label'
+# Times of each format: valid ones with and without fraction, and malformed ones
+argus_times = {
+    '%Y/%m/%d %H:%M:%S.%f': ['2019/04/04 16:23:00.325010', '2019/04/04 16:23:01.5', '2019/04/04 16:59:59.000001', '2019/04/04 17:00:00', '2019/4/4 16:23:00.1', '2019/04/04 16:23:60.000000', '2019/04/04 16:23:00.1234567', '', 'not a time'],
+    '%Y-%m-%dT%H:%M:%S.%f%z': ['2019-04-04T16:23:00.325010+0000', '2019-04-04T16:23:00.5-0300', '2019-04-04T16:23:00.325010+02:00', '2019-04-04T16:23:00+0000', '2019-04-04 16:23:00.1+0000', ''],
+    'unixtimestamp': ['1554394980.325010', '1554394980', '1554394980.5e0', ' 1554394981.25', '', 'nan?', '1;5'],
+}
+
+
+def argus_lines(times: list, amount: int, odd_lines=True) -> list:
+    """ Lines with the times and some empty numbers. With odd_lines, also lines with more or less columns than the header """
+    lines = [argus_header]
+    for number in range(amount):
+        time = times[number % len(times)]
+        pkts = '' if number % 7 == 0 else str(number % 50)
+        lines.append('{},{}.25,tcp,10.0.0.{},{},   ->,10.0.1.1,80,S_,0,0,{},{},70,flow=Background'.format(time, number % 3, number % 250, 1000 + number, pkts, number * 10))
+        if odd_lines and number % 101 == 0:
+            lines.append('{},1.0,udp,10.0.0.1'.format(time))
+        if odd_lines and number % 103 == 0:
+            lines.append(lines[-1] + ',extra')
+    return lines
+
+
+def flows_as_dicts(flows: list) -> list:
+    return [flow.to_dict() if flow is not None else None for flow in flows]
+
+
+def test_argus_vectorized_path_is_the_same_as_the_lines():
+    for (time_format, times) in argus_times.items():
+        lines = argus_lines(times, 2000)
+        by_line = ArgusParser(get_parser(time_format))
+        by_line.vectorized_min_lines = len(lines) + 1
+        vectorized = ArgusParser(get_parser(time_format))
+        vectorized.vectorized_min_lines = 1
+        assert flows_as_dicts(vectorized.parse_lines(lines)) == flows_as_dicts(by_line.parse_lines(lines)), time_format
+        assert vectorized.broken == by_line.broken > 0
+        # The block was parsed by column
+        assert vectorized.parse_lines_vectorized(lines[1:]) is not None
+
+
+def test_argus_times_are_the_ones_of_the_timestamp_parser():
+    """ The valid times are converted by the TimestampParser of the format. The malformed ones keep the default None """
+    for (time_format, times) in argus_times.items():
+        convert = get_parser(time_format)
+        parser = ArgusParser(convert)
+        parser.vectorized_min_lines = 1
+        flows = parser.parse_lines(argus_lines(times, len(times), odd_lines=False))[1:]
+        for (time, flow) in zip(times, flows):
+            try:
+                expected = convert(time)
+            except ValueError:
+                expected = None
+            assert flow.starttime == expected, (time_format, time)
+
+
+def test_argus_columns_and_invalid_numbers():
+    parser = ArgusParser(get_parser('%Y/%m/%d %H:%M:%S.%f'))
+    (header, flow, broken) = parser.parse_lines([argus_header, '2019/04/04 16:23:00.5,x,tcp,10.0.0.1,1000,  <->,10.0.1.1,80,CON,0,0,,140,70,', '2019/04/04 16:23:00.5'])
+    assert header is None and broken is None and parser.broken == 1
+    assert (flow.type, flow.saddr, flow.sport, flow.dir, flow.daddr, flow.dport, flow.state) == ('argus', '10.0.0.1', '1000', '  <->', '10.0.1.1', '80', 'CON')
+    assert flow.starttime == get_parser('%Y/%m/%d %H:%M:%S.%f')('2019/04/04 16:23:00.5')
+    # The duration and the packets are not valid, so they keep the default
+    assert (flow.dur, flow.pkts, flow.bytes) == (0.0, 0, 140)
+
+
+def test_nfdump_vectorized_path_is_the_same_as_the_lines():
+    lines = []
+    for number in range(3000):
+        start = '2019-01-01 10:{:02d}:{:02d}'.format(number // 60 % 60, number % 60)
+        lines.append(','.join([start, start if number % 11 else 'x', '1.000', '10.0.0.1', '10.0.0.2', '50000', '80', 'TCP', '.AP.SF', '0', '0', str(number), '500', '3', '300'] + ['0'] * 7 + ['1'] + ['0'] * 20))
+    by_line = NfdumpParser(get_parser('%Y-%m-%d %H:%M:%S'))
+    by_line.vectorized_min_lines = len(lines) + 1
+    vectorized = NfdumpParser(get_parser('%Y-%m-%d %H:%M:%S'))
+    vectorized.vectorized_min_lines = 1
+    flows = vectorized.parse_lines(lines)
+    assert flows_as_dicts(flows) == flows_as_dicts(by_line.parse_lines(lines))
+    assert (flows[1].spkts, flows[1].dpkts, flows[1].pkts, flows[1].bytes, flows[1].dir) == (1, 3, 4, 800, '1')
+
+
+def test_zeek_json_fields_that_are_not_set_keep_the_default():
+    parser = ZeekJSONParser(get_parser('unixtimestamp'))
+    (conn, empty_conn, dns, ssh) = parser.parse_lines([
+        {'type': 'conn', 'ts': 1538080852.5, 'uid': 'C1', 'id.orig_h': '10.0.0.1', 'id.resp_h': '10.0.0.2', 'duration': 2.5, 'conn_state': 'S0', 'orig_pkts': 3, 'resp_pkts': 4, 'orig_l2_addr': 'aa:bb'},
+        {'type': 'conn'},
+        {'type': 'dns.log', 'ts': 1538080853, 'query': 'example.com'},
+        {'type': 'ssh', 'ts': 1538080854},
+    ])
+    assert (conn.type, conn.uid, conn.saddr, conn.daddr, conn.smac, conn.dmac) == ('conn', 'C1', '10.0.0.1', '10.0.0.2', 'aa:bb', '')
+    assert (conn.starttime, conn.dur, conn.endtime, conn.pkts, conn.state, conn.state_hist, conn.dir) == (1538080852.5, 2.5, 1538080855.0, 7, 'S0', 'S0', '->')
+    assert (empty_conn.starttime, empty_conn.endtime, empty_conn.dur, empty_conn.saddr, empty_conn.pkts) == (None, None, 0.0, '', 0)
+    assert (dns.type, dns.starttime, dns.query, dns.answers) == ('dns', 1538080853.0, 'example.com', '')
+    # The logs that are not added to the profiles only keep their type and the common fields
+    assert (type(ssh).__name__, ssh.type, ssh.starttime) == ('Flow', 'ssh', 1538080854.0)
+
+
+suricata_flow = '{"timestamp":"2019-01-01T10:00:09.000000+0000","flow_id":1,"event_type":"flow","src_ip":"10.0.0.1","src_port":50000,"dest_ip":"10.0.0.2","dest_port":80,"proto":"TCP","app_proto":"http","flow":{"pkts_toserver":3,"pkts_toclient":4,"bytes_toserver":300,"bytes_toclient":400,"start":"2019-01-01T10:00:00.250000+0000","end":"2019-01-01T10:00:05.750000+0000","state":"closed"}}'
+
+
+def test_suricata_events():
+    convert = get_parser('%Y-%m-%dT%H:%M:%S.%f%z')
+    parser = SuricataParser(convert, used_events=('flow', 'dns', 'tls'))
+    (flow, dns, tls, alert) = parser.parse_lines([
+        suricata_flow,
+        '{"timestamp":"2019-01-01T10:00:01.500000+0000","event_type":"dns","src_ip":"10.0.0.1","dest_ip":"8.8.8.8","dns":{"rrname":"example.com","rdata":"1.2.3.4","rrtype":"A","ttl":60}}',
+        '{"timestamp":"2019-01-01T10:00:02.000000+0000","event_type":"tls","src_ip":"10.0.0.1","dest_ip":"10.0.0.3","tls":{"sni":"example.com","version":"TLS 1.2","notbefore":"2019-01-01T00:00:00","notafter":"2020-01-01T00:00:00"}}',
+        '{"timestamp":"2019-01-01T10:00:03.000000+0000","event_type":"alert","src_ip":"10.0.0.1"}',
+    ])
+    assert (flow.type, flow.saddr, flow.sport, flow.daddr, flow.dport, flow.proto, flow.appproto, flow.state, flow.dir) == ('flow', '10.0.0.1', 50000, '10.0.0.2', 80, 'TCP', 'http', 'closed', '->')
+    # The start and end of the flow are used, not the time of the event
+    assert (flow.starttime, flow.endtime, flow.dur) == (convert('2019-01-01T10:00:00.250000+0000'), convert('2019-01-01T10:00:05.750000+0000'), 5.5)
+    assert (flow.spkts, flow.dpkts, flow.pkts, flow.sbytes, flow.dbytes, flow.bytes) == (3, 4, 7, 300, 400, 700)
+    assert (dns.type, dns.starttime, dns.query, dns.qtype_name, dns.ttls) == ('dns', convert('2019-01-01T10:00:01.500000+0000'), '1.2.3.4', 'A', 60)
+    assert (tls.server_name, tls.sslversion, tls.notbefore.year, tls.notafter.year) == ('example.com', 'TLS 1.2', 2019, 2020)
+    assert alert is None
+    assert (parser.event_filter.get_skipped(), parser.broken) == (1, 0)
+
+
+def test_suricata_broken_events():
+    parser = SuricataParser(get_parser('%Y-%m-%dT%H:%M:%S.%f%z'), used_events=('flow', 'dns', 'tls'))
+    flows = parser.parse_lines([
+        'not json',
+        '{"event_type":"flow","flow":"not a section"}',
+        '{"timestamp":"2019-01-01T10:00:02.000000+0000","event_type":"tls","tls":{"notbefore":"01/01/2019"}}',
+        '{"event_type":"dns","dns":null,"src_ip":"10.0.0.1"}',
+    ])
+    assert flows[:3] == [None, None, None]
+    assert parser.broken == 3
+    # An event without its section keeps the defaults
+    assert (flows[3].saddr, flows[3].query, flows[3].starttime) == ('10.0.0.1', '', None)
+
+
+# The flows of each input as the baseline profiler read them into its column_values dict, before the flows were records.
+# The baseline kept the numbers of argus and nfdump as text, and left False in the columns that the input does not have.
+# Here the numbers are the converted ones and the missing columns have the defaults of the records. The baseline also
+# summed the packets and bytes of nfdump as text ('5' + '4' = '54'); here they are added.
+def local_time(text: str, time_format: str) -> float:
+    """ The baseline converted the times without zone as local times """
+    return datetime.strptime(text, time_format).timestamp()
+
+
+def fields(flow, expected: dict) -> dict:
+    return {name: getattr(flow, name) for name in expected}
+
+
+def test_argus_and_nfdump_flows_are_the_ones_of_the_baseline():
+    (_, ipv4, ipv6) = ArgusParser(get_parser('%Y/%m/%d %H:%M:%S.%f'), ',').parse_lines([
+        argus_header,
+        '2019/04/04 16:23:00.325010,0.020371,udp,10.8.0.69,48427,  <->,8.8.8.8,53,CON,0,0,2,142,63,flow=From-Normal',
+        '2019/04/04 16:23:01.5,1.5,tcp,2001:db8::1,443,   ->,2001:db8::2,51000,FSPA_FSPA,0,0,10,1500,700,',
+    ])
+    expected = {'type': 'argus', 'starttime': local_time('2019/04/04 16:23:00.325010', '%Y/%m/%d %H:%M:%S.%f'), 'uid': None, 'saddr': '10.8.0.69', 'daddr': '8.8.8.8', 'dur': 0.020371, 'endtime': None, 'proto': 'udp', 'appproto': '', 'sport': '48427', 'dport': '53', 'dir': '  <->', 'state': 'CON', 'pkts': 2, 'bytes': 142}
+    assert fields(ipv4, expected) == expected
+    expected = {'type': 'argus', 'starttime': local_time('2019/04/04 16:23:01.5', '%Y/%m/%d %H:%M:%S.%f'), 'saddr': '2001:db8::1', 'daddr': '2001:db8::2', 'dur': 1.5, 'proto': 'tcp', 'sport': '443', 'dport': '51000', 'dir': '   ->', 'state': 'FSPA_FSPA', 'pkts': 10, 'bytes': 1500}
+    assert fields(ipv6, expected) == expected
+    (ipv4, ipv6) = NfdumpParser(get_parser('%Y-%m-%d %H:%M:%S'), ',').parse_lines([
+        ','.join(['2019-04-04 16:23:00', '2019-04-04 16:23:02', '2.000', '10.0.0.1', '10.0.0.2', '1234', '80', 'TCP', '.AP.SF', '0', '0', '5', '600', '4', '300'] + ['0'] * 7 + ['1'] + ['0'] * 25),
+        ','.join(['2019-04-04 16:23:03', '2019-04-04 16:23:03', '0.000', '2001:db8::1', '2001:db8::2', '53', '5353', 'UDP', '......', '0', '0', '1', '60', '0', '0'] + ['0'] * 33),
+    ])
+    expected = {'type': 'argus', 'starttime': local_time('2019-04-04 16:23:00', '%Y-%m-%d %H:%M:%S'), 'endtime': local_time('2019-04-04 16:23:02', '%Y-%m-%d %H:%M:%S'), 'saddr': '10.0.0.1', 'daddr': '10.0.0.2', 'dur': 2.0, 'proto': 'TCP', 'appproto': '', 'sport': '1234', 'dport': '80', 'dir': '1', 'state': '.AP.SF', 'pkts': 9, 'spkts': 5, 'dpkts': 4, 'bytes': 900, 'sbytes': 600, 'dbytes': 300}
+    assert fields(ipv4, expected) == expected
+    expected = {'saddr': '2001:db8::1', 'daddr': '2001:db8::2', 'dur': 0.0, 'proto': 'UDP', 'sport': '53', 'dport': '5353', 'dir': '0', 'state': '......', 'pkts': 1, 'spkts': 1, 'dpkts': 0, 'bytes': 60, 'sbytes': 60, 'dbytes': 0}
+    assert fields(ipv6, expected) == expected
+
+
+def test_zeek_flows_are_the_ones_of_the_baseline():
+    conn_json = {'ts': 1538080852.403669, 'uid': 'Cewh6D2USNVtfcLxZe', 'id.orig_h': '192.168.2.12', 'id.orig_p': 56343, 'id.resp_h': '192.168.2.1', 'id.resp_p': 53, 'proto': 'udp', 'service': 'dns', 'duration': 0.008364, 'orig_bytes': 30, 'resp_bytes': 94, 'conn_state': 'SF', 'missed_bytes': 0, 'history': 'Dd', 'orig_pkts': 1, 'orig_ip_bytes': 58, 'resp_pkts': 1, 'resp_ip_bytes': 122, 'orig_l2_addr': 'b8:27:eb:6a:47:b8', 'resp_l2_addr': 'a6:d1:8c:1f:ce:64', 'type': './zeek_files/conn'}
+    (conn, ipv6_conn, dns, http, ssl) = ZeekJSONParser(get_parser('unixtimestamp')).parse_lines([
+        conn_json,
+        {'ts': 1538080853.5, 'uid': 'C2', 'id.orig_h': 'fe80::1', 'id.orig_p': 5353, 'id.resp_h': 'ff02::fb', 'id.resp_p': 5353, 'proto': 'udp', 'conn_state': 'S0', 'orig_bytes': 10, 'resp_bytes': 0, 'orig_pkts': 1, 'resp_pkts': 0, 'type': './zeek_files/conn'},
+        {'ts': 1538080852.5, 'uid': 'D1', 'id.orig_h': '192.168.2.12', 'id.resp_h': '192.168.2.1', 'query': 'example.com', 'qclass_name': 'C_INTERNET', 'qtype_name': 'A', 'rcode_name': 'NOERROR', 'answers': ['93.184.216.34'], 'TTLs': [300.0], 'type': './zeek_files/dns'},
+        {'ts': 1538080854.0, 'uid': 'H1', 'id.orig_h': '192.168.2.12', 'id.resp_h': '93.184.216.34', 'method': 'GET', 'host': 'example.com', 'uri': '/', 'version': '1.1', 'user_agent': 'curl', 'request_body_len': 0, 'response_body_len': 1256, 'status_code': 200, 'status_msg': 'OK', 'resp_mime_types': ['text/html'], 'resp_fuids': ['F1'], 'type': './zeek_files/http'},
+        {'ts': 1538080855.0, 'uid': 'S1', 'id.orig_h': '192.168.2.12', 'id.resp_h': '93.184.216.34', 'version': 'TLSv12', 'cipher': 'TLS_ECDHE', 'resumed': False, 'established': True, 'cert_chain_fuids': ['F2'], 'client_cert_chain_fuids': [], 'subject': 'CN=example.com', 'issuer': 'CN=CA', 'validation_status': 'ok', 'curve': 'x25519', 'server_name': 'example.com', 'type': './zeek_files/ssl'},
+    ])
+    expected_conn = {'type': 'conn', 'starttime': 1538080852.403669, 'uid': 'Cewh6D2USNVtfcLxZe', 'saddr': '192.168.2.12', 'daddr': '192.168.2.1', 'dur': 0.008364, 'endtime': 1538080852.403669 + 0.008364, 'proto': 'udp', 'appproto': 'dns', 'sport': 56343, 'dport': 53, 'dir': '->', 'state': 'SF', 'pkts': 2, 'spkts': 1, 'dpkts': 1, 'bytes': 124, 'sbytes': 30, 'dbytes': 94}
+    assert fields(conn, expected_conn) == expected_conn
+    expected = {'starttime': 1538080853.5, 'saddr': 'fe80::1', 'daddr': 'ff02::fb', 'dur': 0.0, 'endtime': 1538080853.5, 'appproto': '', 'sport': 5353, 'dport': 5353, 'state': 'S0', 'pkts': 1, 'bytes': 10}
+    assert fields(ipv6_conn, expected) == expected
+    expected = {'type': 'dns', 'starttime': 1538080852.5, 'uid': 'D1', 'query': 'example.com', 'qclass_name': 'C_INTERNET', 'qtype_name': 'A', 'rcode_name': 'NOERROR', 'answers': ['93.184.216.34'], 'ttls': [300.0]}
+    assert fields(dns, expected) == expected
+    expected = {'type': 'http', 'uid': 'H1', 'method': 'GET', 'host': 'example.com', 'uri': '/', 'httpversion': '1.1', 'user_agent': 'curl', 'request_body_len': 0, 'response_body_len': 1256, 'status_code': 200, 'status_msg': 'OK', 'resp_mime_types': ['text/html'], 'resp_fuids': ['F1']}
+    assert fields(http, expected) == expected
+    expected = {'type': 'ssl', 'uid': 'S1', 'sslversion': 'TLSv12', 'cipher': 'TLS_ECDHE', 'resumed': False, 'established': True, 'cert_chain_fuids': ['F2'], 'client_cert_chain_fuids': [], 'subject': 'CN=example.com', 'issuer': 'CN=CA', 'validation_status': 'ok', 'curve': 'x25519', 'server_name': 'example.com'}
+    assert fields(ssl, expected) == expected
+    # The same conn flow from a TSV log, with IPv6 addresses. The baseline kept the ports of the TSV logs as text
+    conn_fields = ['ts', 'uid', 'id.orig_h', 'id.orig_p', 'id.resp_h', 'id.resp_p', 'proto', 'service', 'duration', 'orig_bytes', 'resp_bytes', 'conn_state', 'local_orig', 'local_resp', 'missed_bytes', 'history', 'orig_pkts', 'orig_ip_bytes', 'resp_pkts', 'resp_ip_bytes', 'tunnel_parents']
+    conn_types = ['time', 'string', 'addr', 'port', 'addr', 'port', 'enum', 'string', 'interval', 'count', 'count', 'string', 'bool', 'bool', 'count', 'string', 'count', 'count', 'count', 'count', 'set[string]']
+    tsv_conn = ZeekTabsLogParser(get_parser('unixtimestamp')).parse_lines(zeek_tabs_header('conn', conn_fields, conn_types) + ['1538080852.403669\tCewh6D2USNVtfcLxZe\t2001:db8::12\t56343\t2001:db8::1\t53\tudp\tdns\t0.008364\t30\t94\tSF\t-\t-\t0\tDd\t1\t58\t1\t122\t(empty)'])[-1]
+    expected_conn.update({'saddr': '2001:db8::12', 'daddr': '2001:db8::1', 'sport': '56343', 'dport': '53'})
+    assert fields(tsv_conn, expected_conn) == expected_conn
+
+
+def test_suricata_flows_are_the_ones_of_the_baseline():
+    convert = get_parser('%Y-%m-%dT%H:%M:%S.%f%z')
+    (flow, ipv6_flow, http, dns) = SuricataParser(convert, used_events=('flow', 'http', 'dns')).parse_lines([
+        '{"timestamp":"2019-04-04T16:23:05.123456+0000","flow_id":1,"event_type":"flow","src_ip":"10.0.0.1","src_port":1234,"dest_ip":"10.0.0.2","dest_port":80,"proto":"TCP","app_proto":"http","flow":{"pkts_toserver":5,"pkts_toclient":4,"bytes_toserver":600,"bytes_toclient":300,"start":"2019-04-04T16:23:00.000001+0000","end":"2019-04-04T16:23:02.500001+0000","state":"closed"}}',
+        '{"timestamp":"2019-04-04T16:23:06.000000+0000","flow_id":2,"event_type":"flow","src_ip":"2001:db8::1","src_port":53,"dest_ip":"2001:db8::2","dest_port":5353,"proto":"UDP","flow":{"pkts_toserver":1,"bytes_toserver":60,"start":"2019-04-04T16:23:06.000000+0000","end":"2019-04-04T16:23:06.000000+0000","state":"new"}}',
+        '{"timestamp":"2019-04-04T16:23:07.000000+0000","flow_id":3,"event_type":"http","src_ip":"10.0.0.1","src_port":1234,"dest_ip":"10.0.0.2","dest_port":80,"proto":"TCP","http":{"hostname":"example.com","url":"/index.html","http_user_agent":"curl","http_content_type":"text/html","http_method":"GET","protocol":"HTTP/1.1","status":200,"length":1256}}',
+        '{"timestamp":"2019-04-04T16:23:08.000000+0000","flow_id":4,"event_type":"dns","src_ip":"10.0.0.1","src_port":5000,"dest_ip":"8.8.8.8","dest_port":53,"proto":"UDP","dns":{"type":"answer","rrname":"example.com","rrtype":"A","rcode":"NOERROR","rdata":"93.184.216.34","ttl":300}}',
+    ])
+    expected = {'type': 'flow', 'starttime': 1554394980.000001, 'endtime': 1554394982.500001, 'saddr': '10.0.0.1', 'daddr': '10.0.0.2', 'dur': 2.5, 'proto': 'TCP', 'appproto': 'http', 'sport': 1234, 'dport': 80, 'dir': '->', 'state': 'closed', 'pkts': 9, 'spkts': 5, 'dpkts': 4, 'bytes': 900, 'sbytes': 600, 'dbytes': 300}
+    assert fields(flow, expected) == expected
+    expected = {'starttime': 1554394986.0, 'saddr': '2001:db8::1', 'daddr': '2001:db8::2', 'dur': 0.0, 'appproto': '', 'sport': 53, 'dport': 5353, 'state': 'new', 'pkts': 1, 'bytes': 60}
+    assert fields(ipv6_flow, expected) == expected
+    expected = {'type': 'http', 'starttime': 1554394987.0, 'method': 'GET', 'host': 'example.com', 'uri': '/index.html', 'httpversion': 'HTTP/1.1', 'user_agent': 'curl', 'request_body_len': 0, 'response_body_len': 1256, 'status_code': 200, 'status_msg': '', 'resp_mime_types': '', 'resp_fuids': ''}
+    assert fields(http, expected) == expected
+    # The baseline used the answer of the event as the query
+    expected = {'type': 'dns', 'starttime': 1554394988.0, 'saddr': '10.0.0.1', 'daddr': '8.8.8.8', 'query': '93.184.216.34', 'qclass_name': '', 'qtype_name': 'A', 'rcode_name': '', 'answers': '', 'ttls': 300}
+    assert fields(dns, expected) == expected
+
+
+def test_each_profiler_parses_its_lines_like_a_single_profiler():
+    """ With several profilers, each one receives only some lines, but it must get the headers needed to parse them """
+    conn_fields = ['ts', 'uid', 'id.orig_h', 'id.orig_p', 'id.resp_h', 'id.resp_p', 'proto', 'duration', 'orig_pkts']
+    conn_types = ['time', 'string', 'addr', 'port', 'addr', 'port', 'enum', 'interval', 'count']
+    ips = ['10.0.0.{}'.format(number) for number in range(1, 30)] + ['2001:db8::{:x}'.format(number) for number in range(1, 30)]
+    tsv_lines = zeek_tabs_header('conn', conn_fields, conn_types)
+    tsv_lines += ['{}.5\tC{}\t{}\t{}\t{}\t80\ttcp\t1.5\t{}'.format(1538080852 + number, number, ip, 1000 + number, ips[-number], number) for (number, ip) in enumerate(ips)]
+    argus = [argus_header] + ['2019/04/04 16:23:{:02d}.5,1.5,tcp,{},{},   ->,{},80,S_,0,0,3,300,100,'.format(number % 60, ip, 1000 + number, ips[-number]) for (number, ip) in enumerate(ips)]
+    suricata = [json.dumps(dict(json.loads(suricata_flow), src_ip=ip, src_port=1000 + number, dest_ip=ips[-number])) for (number, ip) in enumerate(ips)]
+    inputs = [
+        (lambda: ZeekTabsLogParser(get_parser('unixtimestamp')), tsv_lines),
+        (lambda: ArgusParser(get_parser('%Y/%m/%d %H:%M:%S.%f'), ','), argus),
+        (lambda: SuricataParser(get_parser('%Y-%m-%dT%H:%M:%S.%f%z')), suricata),
+    ]
+    for (create_parser, lines) in inputs:
+        single = {flow['uid'] or (flow['saddr'], flow['sport']): flow for flow in flows_as_dicts(create_parser().parse_lines(lines)) if flow}
+        assert len(single) == len(ips)
+        router = FlowRouter(4)
+        shard_lines = [[], [], [], []]
+        for line in lines:
+            for shard in router.route(line):
+                shard_lines[shard].append(line)
+        parsed = set()
+        for shard in range(4):
+            for flow in flows_as_dicts(create_parser().parse_lines(shard_lines[shard])):
+                if flow:
+                    key = flow['uid'] or (flow['saddr'], flow['sport'])
+                    assert flow == single[key]
+                    parsed.add(key)
+        # Every flow was parsed by some profiler
+        assert parsed == set(single)
@@ -0,0 +1,118 @@
+# Conversion of the times of the flows to seconds since the epoch.
+# datetime.strptime is slow, so the formats that slips detects are parsed by hand. The date and time up to the
+# seconds only change once per second, so their conversion is cached and for each flow we only read the fraction.
+
+from datetime import datetime
+
+# The formats that we can detect, in the order that they are tried
+time_formats = ['%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S.%f']
+# Formats parsed by hand: (has the fraction of the second, has the time zone)
+fast_formats = {
+    '%Y-%m-%dT%H:%M:%S.%f%z': (True, True),
+    '%Y-%m-%d %H:%M:%S.%f': (True, False),
+    '%Y-%m-%d %H:%M:%S': (False, False),
+    '%Y/%m/%d %H:%M:%S.%f': (True, False),
+}
+# When there are more seconds cached than this, the cache starts again
+max_cached_seconds = 10000
+
+
+def detect_time_format(text: str):
+    """ Return the format of this time: 'unixtimestamp', one of time_formats, or None if we do not know it """
+    try:
+        datetime.fromtimestamp(float(text))
+        return 'unixtimestamp'
+    except (ValueError, OverflowError, OSError):
+        pass
+    for time_format in time_formats:
+        try:
+            datetime.strptime(text, time_format)
+            return time_format
+        except ValueError:
+            continue
+    return None
+
+
+class TimestampParser(object):
+    """
+    Converts the times of one format to seconds since the epoch. Use parse(text).
+    The result is the same as datetime.strptime(text, time_format).timestamp(), and the same texts raise ValueError.
+    The texts that do not look exactly like the format (like a different time zone notation) use strptime.
+    """
+    def __init__(self, time_format: str):
+        self.time_format = time_format
+        # Date and time up to the seconds (and the time zone): seconds since the epoch
+        self.cache = {}
+        if time_format == 'unixtimestamp':
+            self.parse = float
+        elif time_format in fast_formats:
+            (self.has_fraction, self.has_zone) = fast_formats[time_format]
+            # The format of the first 19 characters, like '%Y-%m-%d %H:%M:%S'
+            self.prefix_format = time_format[:17]
+            self.date_separator = time_format[2]
+            self.time_separator = time_format[8]
+            self.parse = self.parse_fast
+        else:
+            # A format given in the conf
+            self.parse = self.parse_slowly
+
+    def parse_slowly(self, text: str) -> float:
+        return datetime.strptime(text, self.time_format).timestamp()
+
+    def parse_fast(self, text: str) -> float:
+        zone = ''
+        if self.has_zone:
+            # Suricata writes the zone as +0000
+            zone = text[-5:]
+            if zone[:1] not in ('+', '-') or not zone[1:].isdigit():
+                return self.parse_slowly(text)
+            fraction = text[19:-5]
+        else:
+            fraction = text[19:]
+        if self.has_fraction:
+            digits = fraction[1:]
+            if fraction[:1] != '.' or not 0 < len(digits) <= 6 or not digits.isdigit() or not digits.isascii():
+                return self.parse_slowly(text)
+            microsecond = int(digits) * 10 ** (6 - len(digits))
+        elif fraction:
+            return self.parse_slowly(text)
+        else:
+            microsecond = 0
+        key = text[:19] + zone
+        seconds = self.cache.get(key)
+        if seconds is None:
+            seconds = self.parse_seconds(text[:19], zone)
+            if seconds is None:
+                return self.parse_slowly(text)
+        if self.has_zone:
+            # The same division that datetime does for times with a zone
+            return (seconds * 1000000 + microsecond) / 1000000
+        return seconds + microsecond / 1e6
+
+    def parse_seconds(self, prefix: str, zone: str):
+        """ Convert the date and time up to the seconds, and remember it. Returns None if it is not where we expect """
+        if len(prefix) != 19 or prefix[4] != self.date_separator or prefix[7] != self.date_separator or prefix[10] != self.time_separator or prefix[13] != ':' or prefix[16] != ':':
+            # strptime accepts numbers with less digits, so the fraction would not be where we think
+            return None
+        if zone:
+            seconds = int(datetime.strptime(prefix + zone, self.prefix_format + '%z').timestamp())
+        else:
+            # Local time, as strptime does
+            seconds = int(datetime.strptime(prefix, self.prefix_format).timestamp())
+        if len(self.cache) >= max_cached_seconds:
+            self.cache.clear()
+        self.cache[prefix + zone] = seconds
+        return seconds
+
+
+# Parsers already created, by format
+parsers = {}
+
+
+def get_parser(time_format: str):
+    """ Return the parse function of this format. The parsers are shared, so they also share the cache """
+    try:
+        return parsers[time_format].parse
+    except KeyError:
+        parsers[time_format] = TimestampParser(time_format)
+        return parsers[time_format].parse